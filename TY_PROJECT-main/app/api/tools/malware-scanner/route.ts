@@ -1,6 +1,6 @@
 import { type NextRequest, NextResponse } from "next/server"
-import { spawn } from "child_process"
 import path from "path"
+import { scannerWorker } from "@/lib/services/scanner-worker"
 import { writeFile, unlink } from "fs/promises"
 import { randomUUID } from "crypto"
 
@@ -31,43 +31,7 @@ export async function POST(request: NextRequest) {
     await writeFile(tempFilePath, Buffer.from(bytes))
 
     try {
-      const pythonScript = path.join(process.cwd(), "scripts", "malware_scanner_service.py")
-
-      const result = await new Promise((resolve, reject) => {
-        const pythonProcess = spawn("python3", [pythonScript, tempFilePath], {
-          stdio: ["pipe", "pipe", "pipe"],
-        })
-
-        let output = ""
-        let errorOutput = ""
-
-        pythonProcess.stdout.on("data", (data) => {
-          output += data.toString()
-        })
-
-        pythonProcess.stderr.on("data", (data) => {
-          errorOutput += data.toString()
-        })
-
-        pythonProcess.on("close", (code) => {
-          if (code === 0) {
-            try {
-              const scanResults = JSON.parse(output)
-              resolve(scanResults)
-            } catch (parseError) {
-              reject(new Error(`Failed to parse Python output: ${parseError}`))
-            }
-          } else {
-            reject(new Error(`Python script failed with code ${code}: ${errorOutput}`))
-          }
-        })
-
-        // Timeout after 60 seconds
-        setTimeout(() => {
-          pythonProcess.kill()
-          reject(new Error("Scan timeout"))
-        }, 60000)
-      })
+      const result = await scannerWorker.scan("malware_scanner", { path: tempFilePath }, 60000)
 
       return NextResponse.json(result)
     } catch (pythonError) {
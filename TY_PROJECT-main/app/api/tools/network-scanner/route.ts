@@ -1,50 +1,12 @@
 import { type NextRequest, NextResponse } from "next/server"
-import { spawn } from "child_process"
-import path from "path"
+import { scannerWorker } from "@/lib/services/scanner-worker"
 
 export async function POST(request: NextRequest) {
   try {
     const { networkRange } = await request.json()
 
     try {
-      const pythonScript = path.join(process.cwd(), "scripts", "network_scanner_service.py")
-
-      const result = await new Promise((resolve, reject) => {
-        const args = networkRange ? [networkRange] : []
-        const pythonProcess = spawn("python3", [pythonScript, ...args], {
-          stdio: ["pipe", "pipe", "pipe"],
-        })
-
-        let output = ""
-        let errorOutput = ""
-
-        pythonProcess.stdout.on("data", (data) => {
-          output += data.toString()
-        })
-
-        pythonProcess.stderr.on("data", (data) => {
-          errorOutput += data.toString()
-        })
-
-        pythonProcess.on("close", (code) => {
-          if (code === 0) {
-            try {
-              const scanResults = JSON.parse(output)
-              resolve(scanResults)
-            } catch (parseError) {
-              reject(new Error(`Failed to parse Python output: ${parseError}`))
-            }
-          } else {
-            reject(new Error(`Python script failed with code ${code}: ${errorOutput}`))
-          }
-        })
-
-        // Timeout after 60 seconds for network scans
-        setTimeout(() => {
-          pythonProcess.kill()
-          reject(new Error("Network scan timeout"))
-        }, 60000)
-      })
+      const result = await scannerWorker.scan("network_scanner", { network_range: networkRange || null }, 60000)
 
       return NextResponse.json(result)
     } catch (pythonError) {
@@ -1,6 +1,5 @@
 import { type NextRequest, NextResponse } from "next/server"
-import { spawn } from "child_process"
-import path from "path"
+import { scannerWorker } from "@/lib/services/scanner-worker"
 
 export async function POST(request: NextRequest) {
   try {
@@ -19,43 +18,7 @@ export async function POST(request: NextRequest) {
     }
 
     try {
-      const pythonScript = path.join(process.cwd(), "scripts", "url_threat_scanner_service.py")
-
-      const result = await new Promise((resolve, reject) => {
-        const pythonProcess = spawn("python3", [pythonScript, url], {
-          stdio: ["pipe", "pipe", "pipe"],
-        })
-
-        let output = ""
-        let errorOutput = ""
-
-        pythonProcess.stdout.on("data", (data) => {
-          output += data.toString()
-        })
-
-        pythonProcess.stderr.on("data", (data) => {
-          errorOutput += data.toString()
-        })
-
-        pythonProcess.on("close", (code) => {
-          if (code === 0) {
-            try {
-              const scanResults = JSON.parse(output)
-              resolve(scanResults)
-            } catch (parseError) {
-              reject(new Error(`Failed to parse Python output: ${parseError}`))
-            }
-          } else {
-            reject(new Error(`Python script failed with code ${code}: ${errorOutput}`))
-          }
-        })
-
-        // Timeout after 30 seconds
-        setTimeout(() => {
-          pythonProcess.kill()
-          reject(new Error("Scan timeout"))
-        }, 30000)
-      })
+      const result = await scannerWorker.scan("url_threat_scanner", { url }, 30000)
 
       return NextResponse.json(result)
     } catch (pythonError) {
@@ -5,12 +5,15 @@ FastAPI backend for all security operations
 
 from fastapi import FastAPI, HTTPException, UploadFile, File, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import uvicorn
 from typing import Dict, Any, List, Optional
 import json
 import os
+import ipaddress
 from pathlib import Path
+from datetime import datetime
 
 # Import backend modules
 from backend.scripts.main_security_engine import MOBICURESecurityEngine
@@ -37,9 +40,11 @@ security_engine = MOBICURESecurityEngine()
 auth_manager = MOBICUREAuth()
 security = HTTPBearer()
 
+MAX_BATCH_URLS = 10000
+
 @app.post("/api/security/analyze-file")
-async def analyze_file(file: UploadFile = File(...)):
-    """Analyze uploaded file for security threats"""
+async def analyze_file(file: UploadFile = File(...), profile: bool = False, trace_memory: bool = False):
+    """Analyze uploaded file for security threats; ?profile=true attaches per-stage timings"""
     try:
         # Save uploaded file temporarily
         temp_path = f"backend/temp/{file.filename}"
@@ -53,7 +58,9 @@ async def analyze_file(file: UploadFile = File(...)):
         file_extension = Path(file.filename).suffix.lower().lstrip('.')
         
         # Analyze file
-        result = await security_engine.analyze_file(temp_path, file_extension)
+        result = await security_engine.analyze_file(
+            temp_path, file_extension, profile=profile, trace_memory=trace_memory
+        )
         
         # Clean up temp file
         os.remove(temp_path)
@@ -77,6 +84,21 @@ async def scan_url(data: Dict[str, str]):
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+@app.post("/api/security/scan-urls")
+async def scan_urls(data: Dict[str, List[str]]):
+    """Scan a batch of URLs, streaming one JSON result per line as each finishes"""
+    urls = [url for url in data.get("urls", []) if url]
+    if not urls:
+        raise HTTPException(status_code=400, detail="At least one URL is required")
+    if len(urls) > MAX_BATCH_URLS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_URLS} URLs per batch")
+    
+    async def stream():
+        async for result in security_engine.scan_urls(urls):
+            yield json.dumps(result, default=str) + "\n"
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 @app.post("/api/security/scan-network")
 async def scan_network(data: Dict[str, str]):
     """Scan network target for vulnerabilities"""
@@ -91,6 +113,27 @@ async def scan_network(data: Dict[str, str]):
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+@app.post("/api/security/network-monitor")
+async def network_monitor(data: Dict[str, str]):
+    """
+    Monitor a network, streaming one JSON change event per line (new device,
+    port opened, device gone, ...). Streams for the same range share one
+    monitor and at most MAX_NETWORK_MONITORS ranges run at once; a failure
+    ends the stream with an {"event": "error"} line
+    """
+    target = data.get("target")
+    if target:
+        try:
+            ipaddress.IPv4Network(target, strict=False)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid network range: {e}")
+    
+    async def stream():
+        async for event in security_engine.monitor_network(target):
+            yield json.dumps(event, default=str) + "\n"
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 @app.post("/api/security/check-breach")
 async def check_breach(data: Dict[str, str]):
     """Check if email appears in data breaches"""
@@ -115,5 +158,14 @@ async def health_check():
         "timestamp": str(datetime.now())
     }
 
+@app.get("/api/security/metrics")
+async def scan_metrics():
+    """Per-stage scan latency histograms and cache counters"""
+    return {
+        "stages": security_engine.stage_metrics(),
+        "result_cache": security_engine.cache_stats(),
+        "timestamp": str(datetime.now())
+    }
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -4,10 +4,14 @@ MOBICURE Security Engine - Main Backend Service
 Coordinates all security analysis tools and provides unified API
 """
 
+import os
 import asyncio
 import json
+import threading
+import ipaddress
 import logging
-from typing import Dict, Any, List
+import concurrent.futures
+from typing import Dict, Any, AsyncIterator, List
 from datetime import datetime
 import hashlib
 import requests
@@ -19,13 +23,42 @@ from .url_threat_scanner_service import URLThreatScanner
 from .network_scanner_service import NetworkScanner
 from .malware_scanner_service import MalwareScanner
 from .pdf_security_scanner import PDFSecurityScanner
-from .zip_security_scanner import ZIPSecurityScanner
+from .zip_security_scanner import ZipSecurityScanner
 from .breach_checker_service import BreachChecker
+from .file_hasher import default_hasher
+from .result_cache import ScanResultCache
+from .scan_profiler import ScanProfile, default_stage_metrics
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# On-disk result cache tier; set MOBICURE_RESULT_CACHE_DB to move it, or to "" to keep results in memory only
+RESULT_CACHE_DB = os.environ.get("MOBICURE_RESULT_CACHE_DB", str(BACKEND_DIR / "cache" / "scan_results.sqlite3"))
+
+# URL results buffered for a slow stream consumer before the batch scan waits for it
+URL_STREAM_QUEUE_SIZE = 64
+
+# Device inventory that lets network monitoring resume where it stopped; "" keeps it in memory only
+NETWORK_INVENTORY_DB = os.environ.get(
+    "MOBICURE_NETWORK_INVENTORY_DB", str(BACKEND_DIR / "cache" / "network_inventory.sqlite3")
+)
+
+# Ranges monitored at once; each monitor holds one thread of its own executor for as long as it runs
+MAX_NETWORK_MONITORS = int(os.environ.get("MOBICURE_MAX_NETWORK_MONITORS", "4"))
+
+_MONITOR_FINISHED = object()
+
+class _SharedMonitor:
+    """One running network monitor and the event queues of the streams watching it"""
+    
+    def __init__(self):
+        self.stop = threading.Event()
+        self.subscribers: List[asyncio.Queue] = []
 
 class MOBICURESecurityEngine:
     """Main security engine that coordinates all security tools"""
     
-    def __init__(self):
+    def __init__(self, result_cache_db: str = RESULT_CACHE_DB,
+                 network_inventory_db: str = NETWORK_INVENTORY_DB):
         self.logger = self._setup_logging()
         self.tools = {
             'apk_analyzer': APKAnalyzer(),
@@ -33,10 +66,22 @@ class MOBICURESecurityEngine:
             'network_scanner': NetworkScanner(),
             'malware_scanner': MalwareScanner(),
             'pdf_scanner': PDFSecurityScanner(),
-            'zip_scanner': ZIPSecurityScanner(),
+            'zip_scanner': ZipSecurityScanner(),
             'breach_checker': BreachChecker()
         }
         
+        # Repeat uploads of the same file are answered from here
+        self.result_cache = ScanResultCache(db_path=result_cache_db or None)
+        
+        # One monitor per range, shared by every stream watching it. Monitors
+        # never end on their own, so they run on their own bounded executor
+        # rather than the default one that file and URL scans use
+        self.network_inventory_db = network_inventory_db or None
+        self._monitors: Dict[Any, _SharedMonitor] = {}
+        self._monitor_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=MAX_NETWORK_MONITORS, thread_name_prefix="network-monitor"
+        )
+        
     def _setup_logging(self):
         """Setup logging configuration"""
         logging.basicConfig(
@@ -49,19 +94,52 @@ class MOBICURESecurityEngine:
         )
         return logging.getLogger('MOBICURESecurityEngine')
     
-    async def analyze_file(self, file_path: str, file_type: str) -> Dict[str, Any]:
-        """Analyze any file type using appropriate security tools"""
+    async def analyze_file(self, file_path: str, file_type: str, profile: bool = False,
+                           trace_memory: bool = False) -> Dict[str, Any]:
+        """
+        Analyze any file type using appropriate security tools. With profile,
+        per-stage timings are attached to the result under "profile".
+        """
         try:
             self.logger.info(f"Starting analysis for {file_path} (type: {file_type})")
             
             if file_type.lower() == 'apk':
-                return await self.tools['apk_analyzer'].analyze(file_path)
+                tool_name = 'apk_analyzer'
+                run_scan = lambda: self.tools[tool_name].analyze_apk(file_path)
             elif file_type.lower() == 'pdf':
-                return await self.tools['pdf_scanner'].scan_pdf(file_path)
+                tool_name = 'pdf_scanner'
+                run_scan = lambda: self.tools[tool_name].scan_pdf_file(
+                    Path(file_path).read_bytes(), Path(file_path).name, hashes=hashes
+                )
             elif file_type.lower() in ['zip', 'rar', '7z']:
-                return await self.tools['zip_scanner'].scan_archive(file_path)
+                tool_name = 'zip_scanner'
+                run_scan = lambda: self.tools[tool_name].scan_zip_file(
+                    Path(file_path).read_bytes(), Path(file_path).name, hashes=hashes
+                )
             else:
-                return await self.tools['malware_scanner'].scan_file(file_path)
+                tool_name = 'malware_scanner'
+                run_scan = lambda: self.tools[tool_name].scan_file(file_path)
+            
+            # asyncio.to_thread copies the context, so the scanner's stages land in this profile
+            with ScanProfile(tool_name, trace_memory=trace_memory) as scan_profile:
+                # Hashing reads the whole file, so it stays off the event loop
+                hashes = await asyncio.to_thread(default_hasher.hash_file, file_path)
+                
+                scanner = self.tools[tool_name]
+                ruleset = getattr(scanner, 'ruleset_version', 'unversioned')
+                with scan_profile.stage("result_cache"):
+                    result = self.result_cache.get(hashes['sha256'], tool_name, ruleset)
+                if result is not None:
+                    self.logger.info(f"Result cache hit for {file_path} ({tool_name})")
+                    # Identical content may arrive under another name or extension
+                    refresh = getattr(scanner, 'refresh_cached_result', None)
+                    if refresh is not None:
+                        result = refresh(result, file_path)
+                else:
+                    result = await asyncio.to_thread(run_scan)
+                    self.result_cache.put(hashes['sha256'], tool_name, ruleset, result)
+            
+            return scan_profile.attach(result) if profile else result
                 
         except Exception as e:
             self.logger.error(f"Error analyzing file {file_path}: {str(e)}")
@@ -71,14 +149,126 @@ class MOBICURESecurityEngine:
         """Comprehensive URL security analysis"""
         return await self.tools['url_scanner'].analyze_url(url)
     
+    async def scan_urls(self, urls: List[str]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Batch URL analysis, yielding each result as soon as it is ready;
+        scanning stops when the consumer stops iterating
+        """
+        loop = asyncio.get_running_loop()
+        # Bounded, so a slow client holds the batch back instead of buffering it
+        queue: asyncio.Queue = asyncio.Queue(maxsize=URL_STREAM_QUEUE_SIZE)
+        finished = object()
+        stop = threading.Event()
+        
+        def put(item) -> bool:
+            """Hand an item to the consumer, waiting for room; False once it has gone"""
+            future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+            while not stop.is_set():
+                try:
+                    future.result(timeout=0.5)
+                    return True
+                except concurrent.futures.TimeoutError:
+                    continue
+            future.cancel()
+            return False
+        
+        def produce():
+            results = self.tools['url_scanner'].scan_many(urls)
+            try:
+                for result in results:
+                    if not put(result):
+                        break
+            finally:
+                # Closing the batch cancels the scans not yet started
+                results.close()
+                put(finished)
+        
+        producer = loop.run_in_executor(None, produce)
+        try:
+            while True:
+                result = await queue.get()
+                if result is finished:
+                    break
+                yield result
+        finally:
+            stop.set()
+        await producer
+    
     async def scan_network(self, target: str) -> Dict[str, Any]:
         """Network security scanning and analysis"""
         return await self.tools['network_scanner'].scan_network(target)
     
+    async def monitor_network(self, target: str = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Continuous network monitoring, yielding device change events as they
+        are detected. Streams watching the same range share one monitor, which
+        stops when the last of them stops iterating; a stream that joins a
+        running monitor sees its events from then on. Failures end the stream
+        with an {"event": "error"} event.
+        """
+        key = str(ipaddress.IPv4Network(target, strict=False)) if target else None
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        
+        monitor = self._monitors.get(key)
+        if monitor is None:
+            if len(self._monitors) >= MAX_NETWORK_MONITORS:
+                yield self._monitor_error(f"Too many networks monitored at once (limit {MAX_NETWORK_MONITORS})")
+                return
+            monitor = self._monitors[key] = _SharedMonitor()
+            loop.run_in_executor(self._monitor_executor, self._run_monitor, key, monitor, loop)
+        monitor.subscribers.append(queue)
+        
+        try:
+            while True:
+                event = await queue.get()
+                if event is _MONITOR_FINISHED:
+                    break
+                yield event
+        finally:
+            monitor.subscribers.remove(queue)
+            if not monitor.subscribers:
+                monitor.stop.set()
+                if self._monitors.get(key) is monitor:
+                    del self._monitors[key]
+    
+    def _run_monitor(self, key: Any, monitor: _SharedMonitor, loop: asyncio.AbstractEventLoop):
+        """Monitor thread: fan each event out to the streams subscribed on the event loop"""
+        def publish(event):
+            for queue in monitor.subscribers:
+                queue.put_nowait(event)
+        
+        def finished():
+            if self._monitors.get(key) is monitor:
+                del self._monitors[key]
+            publish(_MONITOR_FINISHED)
+        
+        try:
+            events = self.tools['network_scanner'].monitor(key, db_path=self.network_inventory_db, stop=monitor.stop)
+            for event in events:
+                loop.call_soon_threadsafe(publish, event)
+        except Exception as e:
+            self.logger.error(f"Network monitor for {key or 'local network'} failed: {str(e)}")
+            loop.call_soon_threadsafe(publish, self._monitor_error(str(e)))
+        finally:
+            loop.call_soon_threadsafe(finished)
+    
+    @staticmethod
+    def _monitor_error(message: str) -> Dict[str, Any]:
+        return {"event": "error", "error": message, "timestamp": datetime.now().isoformat()}
+    
     async def check_breach(self, email: str) -> Dict[str, Any]:
         """Check if email appears in data breaches"""
         return await self.tools['breach_checker'].check_email(email)
     
+    def cache_stats(self) -> Dict[str, Any]:
+        """Result cache hit/miss counters"""
+        return self.result_cache.stats()
+    
+    def stage_metrics(self) -> Dict[str, Any]:
+        """Per-scanner, per-stage latency histograms for every scan in this process"""
+        return default_stage_metrics.snapshot()
+    
     def generate_security_report(self, analysis_results: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Generate comprehensive security report"""
         report = {
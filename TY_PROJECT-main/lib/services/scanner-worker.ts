@@ -0,0 +1,123 @@
+import { spawn, type ChildProcessWithoutNullStreams } from "child_process"
+import path from "path"
+import readline from "readline"
+
+type PendingRequest = {
+  resolve: (value: any) => void
+  reject: (reason: Error) => void
+  timer: ReturnType<typeof setTimeout>
+  timedOut: boolean
+}
+
+type WorkerProcess = {
+  child: ChildProcessWithoutNullStreams
+  pending: Map<number, PendingRequest>
+  failed: boolean
+}
+
+// Keeps one long-lived `scripts/scanner_worker.py` process per server instance so
+// scans reuse warm, pre-initialized Python scanners instead of spawning python3 each time.
+// Requests only settle once the worker has answered or exited, so callers can delete the
+// files they passed in as soon as their promise settles.
+class ScannerWorkerClient {
+  private worker: WorkerProcess | null = null
+  private nextId = 1
+
+  private ensureProcess(): WorkerProcess {
+    if (this.worker && !this.worker.failed && this.worker.child.exitCode === null) {
+      return this.worker
+    }
+
+    const workerScript = path.join(process.cwd(), "scripts", "scanner_worker.py")
+    const child = spawn("python3", [workerScript, "--concurrency", "4"], {
+      stdio: ["pipe", "pipe", "pipe"],
+    })
+    const worker: WorkerProcess = { child, pending: new Map(), failed: false }
+
+    readline.createInterface({ input: child.stdout }).on("line", (line) => {
+      let response: any
+      try {
+        response = JSON.parse(line)
+      } catch {
+        return
+      }
+
+      const request = worker.pending.get(response.id)
+      if (!request || request.timedOut) return
+      worker.pending.delete(response.id)
+      clearTimeout(request.timer)
+
+      if (response.ok) {
+        request.resolve(response.result)
+      } else {
+        request.reject(new Error(response.error))
+      }
+    })
+
+    child.stderr.on("data", (data) => {
+      console.error("Scanner worker:", data.toString().trim())
+    })
+
+    // python3 missing or not executable; without a handler this would take the server down
+    child.on("error", (error) => {
+      console.error("Scanner worker error:", error.message)
+      this.fail(worker, new Error(`Scanner worker failed: ${error.message}`))
+    })
+
+    // Writes to a worker that has just died; the exit rejects the request
+    child.stdin.on("error", () => {})
+
+    child.on("close", (code) => {
+      this.fail(worker, new Error(`Scanner worker exited with code ${code}`))
+    })
+
+    this.worker = worker
+    return worker
+  }
+
+  // Reject everything still waiting on a worker and stop handing it new requests
+  private fail(worker: WorkerProcess, error: Error) {
+    worker.failed = true
+    if (this.worker === worker) {
+      this.worker = null
+    }
+    worker.pending.forEach((request) => {
+      clearTimeout(request.timer)
+      request.reject(request.timedOut ? new Error("Scan timeout") : error)
+    })
+    worker.pending.clear()
+  }
+
+  // Python cannot abandon a running scan, so a scan past its deadline is stopped with its
+  // process; the next request starts a fresh worker
+  private recycle(worker: WorkerProcess) {
+    worker.failed = true
+    if (this.worker === worker) {
+      this.worker = null
+    }
+    worker.child.kill("SIGKILL")
+  }
+
+  scan<T = any>(tool: string, params: Record<string, unknown>, timeoutMs = 60000): Promise<T> {
+    const worker = this.ensureProcess()
+    const id = this.nextId++
+
+    return new Promise<T>((resolve, reject) => {
+      const request: PendingRequest = {
+        resolve,
+        reject,
+        timedOut: false,
+        timer: setTimeout(() => {
+          // Rejected by the close handler once the worker has exited and no longer reads the request's files
+          request.timedOut = true
+          this.recycle(worker)
+        }, timeoutMs),
+      }
+
+      worker.pending.set(id, request)
+      worker.child.stdin.write(JSON.stringify({ id, tool, params }) + "\n")
+    })
+  }
+}
+
+export const scannerWorker = new ScannerWorkerClient()
@@ -7,18 +7,314 @@ Comprehensive Android APK security analysis tool
 import os
 import sys
 import json
-import hashlib
 import zipfile
 import xml.etree.ElementTree as ET
 from pathlib import Path
 import re
 import subprocess
-from typing import Dict, List, Any, Optional
-import tempfile
-import shutil
+import struct
+import time
+from typing import Dict, List, Any, Optional, Tuple
+
+from result_cache import ruleset_fingerprint
+from scan_profiler import profiled, stage, add_stage
+import axml_parser
+from apk_signature import APKSignatureReader, default_certificate_cache
+from apk_member_cache import MemberKey, MemberResultCache, default_member_cache, member_digest
+from dex_parser import DexFile, DexFormatError, byte_stats, short_name_ratio
+
+# Members are decompressed straight from the archive in chunks of this size
+MEMBER_CHUNK_SIZE = 1024 * 1024
+
+TEXT_EXTENSIONS = ('.xml', '.txt', '.json', '.properties')
+
+# Images, audio, video and fonts cannot hold code or strings the detectors look for
+MEDIA_EXTENSIONS = (
+    '.png', '.jpg', '.jpeg', '.gif', '.webp', '.bmp', '.ico', '.svgz',
+    '.ogg', '.mp3', '.wav', '.m4a', '.aac', '.flac', '.mid', '.mp4', '.webm', '.3gp',
+    '.ttf', '.otf', '.woff', '.woff2'
+)
+
+# Share of renamed (one or two character) class names above which a DEX counts as obfuscated
+OBFUSCATED_NAME_RATIO = 0.5
+MIN_CLASSES_FOR_OBFUSCATION = 10
+
+
+def iter_member_chunks(apk: zipfile.ZipFile, info: zipfile.ZipInfo, overlap: int = 0):
+    """
+    Yield (window, start) for one archive member, decompressed chunk by chunk.
+    window repeats the last `overlap` bytes of the previous window so matches
+    spanning a chunk boundary are still found; window[start:] is the new data.
+    """
+    tail = b''
+    with apk.open(info) as member:
+        while True:
+            chunk = member.read(MEMBER_CHUNK_SIZE)
+            if not chunk:
+                return
+            window = tail + chunk if tail else chunk
+            yield window, len(tail)
+            tail = window[-overlap:] if overlap else b''
+
+
+class MemberDetector:
+    """
+    One check in the single-pass member traversal. A detector registers for
+    the members it cares about through wants() (by default: names ending in
+    one of suffixes and none of exclude), then sees each of those members as
+    begin(), feed() for every chunk, end(). Chunks are the (window, start)
+    pairs of iter_member_chunks with at least `overlap` bytes carried over.
+    A detector that has reached its verdict sets done and is skipped from
+    then on. A member that fails to decompress midway still gets end(), so
+    it is judged on the bytes fed before the failure.
+
+    Cacheable detectors report what they found in the member just ended
+    through findings(), and apply() merges findings cached for a member
+    instead of reading it. version identifies the detector logic (revision)
+    and rules, so changing either invalidates cached findings.
+    """
+
+    name = 'detector'
+    revision = 1
+    cacheable = False
+    suffixes: tuple = ()
+    exclude: tuple = ()
+    overlap = 0
+
+    def __init__(self, *rules):
+        self.done = False
+        self.version = ruleset_fingerprint(self.name, self.revision, *rules)
+
+    def wants(self, filename: str) -> bool:
+        name = filename.lower()
+        return (not self.suffixes or name.endswith(self.suffixes)) and not (self.exclude and name.endswith(self.exclude))
+
+    def begin(self, info: zipfile.ZipInfo):
+        pass
+
+    def feed(self, window: bytes, start: int):
+        raise NotImplementedError
+
+    def end(self):
+        pass
+
+    def findings(self) -> Any:
+        # Cacheable detectors override this and apply(); others never have them called
+        return None
+
+    def apply(self, findings: Any):
+        pass
+
+    def result(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class ManifestDetector(MemberDetector):
+    """Collects AndroidManifest.xml for parsing once the pass is over"""
+
+    name = 'manifest'
+
+    def __init__(self):
+        super().__init__()
+        self.content = None
+        self._chunks: List[bytes] = []
+
+    def wants(self, filename: str) -> bool:
+        return filename == 'AndroidManifest.xml'
+
+    def begin(self, info):
+        self._chunks = []
+
+    def feed(self, window, start):
+        self._chunks.append(window[start:])
+
+    def end(self):
+        self.content = b''.join(self._chunks)
+        self._chunks = []
+        self.done = True
+
+    def result(self):
+        return {'content': self.content}
+
+
+class DexDetector(MemberDetector):
+    """
+    Suspicious APIs and obfuscation in DEX files. Each file is parsed and its
+    type and method tables are matched exactly against api_indicators, so an
+    API is only reported when the code references it. Obfuscation is judged
+    from the share of renamed class names. Members that do not parse as DEX
+    fall back to substring matching and the control-byte ratio.
+    """
+
+    name = 'dex'
+    cacheable = True
+    suffixes = ('.dex',)
+
+    def __init__(self, malware_indicators: List[str], api_indicators: Dict[str, List[str]]):
+        super().__init__(malware_indicators, api_indicators, OBFUSCATED_NAME_RATIO, MIN_CLASSES_FOR_OBFUSCATION)
+        self.malware_indicators = malware_indicators
+        self.api_indicators = api_indicators
+        self.dex_files = 0
+        self.suspicious_apis = set()
+        self.has_obfuscation = False
+        self._chunks: List[bytes] = []
+        self._member_apis = set()
+        self._member_obfuscated = False
+
+    def begin(self, info):
+        self._chunks = []
+        self._member_apis = set()
+        self._member_obfuscated = False
+
+    def feed(self, window, start):
+        self._chunks.append(window[start:])
+
+    def end(self):
+        content = b''.join(self._chunks)
+        self._chunks = []
+        try:
+            self._match_dex(DexFile(content))
+        except (DexFormatError, IndexError, struct.error):
+            self._match_raw(content)
+        self.apply(self.findings())
+
+    def findings(self):
+        return {'suspicious_apis': sorted(self._member_apis), 'has_obfuscation': self._member_obfuscated}
+
+    def apply(self, findings):
+        self.dex_files += 1
+        self.suspicious_apis.update(findings['suspicious_apis'])
+        self.has_obfuscation = self.has_obfuscation or findings['has_obfuscation']
+
+    def _match_dex(self, dex: DexFile):
+        for indicator in self.malware_indicators:
+            references = self.api_indicators.get(indicator)
+            if references is None:
+                continue
+            for reference in references:
+                if '->' in reference:
+                    found = dex.has_method_ref(*reference.split('->', 1))
+                elif reference.endswith('/'):
+                    found = dex.has_type_prefix(reference)
+                else:
+                    found = dex.find_type(reference) is not None
+                if found:
+                    self._member_apis.add(indicator)
+                    break
+        
+        # Check for obfuscation: ProGuard/R8 rename classes to one or two letters
+        if dex.class_count >= MIN_CLASSES_FOR_OBFUSCATION:
+            ratio = short_name_ratio(dex.defined_classes())
+            if ratio is not None and ratio > OBFUSCATED_NAME_RATIO:
+                self._member_obfuscated = True
+                if 'obfuscation' in self.malware_indicators:
+                    self._member_apis.add('obfuscation')
+
+    def _match_raw(self, content: bytes):
+        # Look for suspicious API calls
+        for indicator in self.malware_indicators:
+            if indicator.encode() in content:
+                self._member_apis.add(indicator)
+        
+        # Check for obfuscation (simplified check)
+        if b'obfuscation' in content or byte_stats(content)['control_ratio'] > 0.3:
+            self._member_obfuscated = True
+
+    def result(self):
+        return {
+            'dex_files_count': self.dex_files,
+            'suspicious_apis': list(self.suspicious_apis),
+            'has_obfuscation': self.has_obfuscation
+        }
+
+
+class EndpointDetector(MemberDetector):
+    """URLs and IP addresses in text resources"""
+
+    name = 'endpoints'
+    cacheable = True
+    suffixes = TEXT_EXTENSIONS
+
+    url_pattern = re.compile(r'https?://[^\s<>"{}|\\^`\[\]]+')
+    ip_pattern = re.compile(r'\b(?:[0-9]{1,3}\.){3}[0-9]{1,3}(?::[0-9]+)?\b')
 
-class APKAnalyzer:
     def __init__(self):
+        super().__init__(self.url_pattern.pattern, self.ip_pattern.pattern)
+        self.urls = set()
+        self.ips = set()
+        self._chunks: List[bytes] = []
+        self._member = {'urls': [], 'ips': []}
+
+    def begin(self, info):
+        self._chunks = []
+
+    def feed(self, window, start):
+        # Text resources are small; match on the whole member so no URL is cut at a chunk edge
+        self._chunks.append(window[start:])
+
+    def end(self):
+        content = b''.join(self._chunks).decode('utf-8', errors='ignore')
+        self._chunks = []
+        self._member = {
+            'urls': sorted(set(self.url_pattern.findall(content))),
+            'ips': sorted(set(self.ip_pattern.findall(content)))
+        }
+        self.apply(self._member)
+
+    def findings(self):
+        return self._member
+
+    def apply(self, findings):
+        self.urls.update(findings['urls'])
+        self.ips.update(findings['ips'])
+
+    def result(self):
+        return {'urls': list(self.urls), 'ips': list(self.ips)}
+
+
+class KeywordDetector(MemberDetector):
+    """Root-detection and anti-debugging strings in every member that can hold code or strings"""
+
+    name = 'keywords'
+    cacheable = True
+    exclude = MEDIA_EXTENSIONS
+
+    root_keywords = [b'su', b'busybox', b'superuser', b'/system/xbin/', b'/system/bin/']
+    debug_keywords = [b'android_server_gdbserver', b'TracerPid', b'ptrace']
+
+    def __init__(self):
+        super().__init__(self.root_keywords, self.debug_keywords)
+        self.overlap = max(len(keyword) for keyword in self.root_keywords + self.debug_keywords) - 1
+        self.has_root_detection = False
+        self.has_anti_debugging = False
+        self._member = {'has_root_detection': False, 'has_anti_debugging': False}
+
+    def begin(self, info):
+        self._member = {'has_root_detection': False, 'has_anti_debugging': False}
+
+    def feed(self, window, start):
+        # Judged per member, so the findings of every member read to the end are complete
+        member = self._member
+        if not member['has_root_detection'] and any(keyword in window for keyword in self.root_keywords):
+            member['has_root_detection'] = True
+        if not member['has_anti_debugging'] and any(keyword in window for keyword in self.debug_keywords):
+            member['has_anti_debugging'] = True
+        self.apply(member)
+
+    def findings(self):
+        return dict(self._member)
+
+    def apply(self, findings):
+        self.has_root_detection = self.has_root_detection or findings['has_root_detection']
+        self.has_anti_debugging = self.has_anti_debugging or findings['has_anti_debugging']
+        self.done = self.has_root_detection and self.has_anti_debugging
+
+    def result(self):
+        return {'has_root_detection': self.has_root_detection, 'has_anti_debugging': self.has_anti_debugging}
+
+
+class APKAnalyzer:
+    def __init__(self, member_cache: Optional[MemberResultCache] = default_member_cache):
         self.suspicious_permissions = {
             'CAMERA', 'RECORD_AUDIO', 'ACCESS_FINE_LOCATION', 'ACCESS_COARSE_LOCATION',
             'READ_CONTACTS', 'WRITE_CONTACTS', 'READ_SMS', 'SEND_SMS', 'CALL_PHONE',
@@ -32,65 +328,239 @@ class APKAnalyzer:
             'reflection', 'crypto', 'obfuscation'
         ]
         
+        # DEX references behind each indicator: a type descriptor, an
+        # "Lclass;->method" reference, or a package prefix ending in "/"
+        self.dex_api_indicators = {
+            'Runtime.exec': ['Ljava/lang/Runtime;->exec'],
+            'ProcessBuilder': ['Ljava/lang/ProcessBuilder;'],
+            'System.loadLibrary': ['Ljava/lang/System;->loadLibrary', 'Ljava/lang/System;->load'],
+            'DexClassLoader': ['Ldalvik/system/DexClassLoader;', 'Ldalvik/system/InMemoryDexClassLoader;'],
+            'PathClassLoader': ['Ldalvik/system/PathClassLoader;'],
+            'URLClassLoader': ['Ljava/net/URLClassLoader;'],
+            'reflection': ['Ljava/lang/reflect/Method;->invoke', 'Ljava/lang/Class;->forName'],
+            'crypto': ['Ljavax/crypto/']
+        }
+        
         self.suspicious_urls = [
             'bit.ly', 'tinyurl.com', 'goo.gl', 't.co',
             '.tk', '.ml', '.ga', '.cf', 'suspicious-domain'
         ]
+        
+        self.signature_reader = APKSignatureReader(default_certificate_cache)
+        # Findings of unchanged members, reused by content digest; None disables it
+        self.member_cache = member_cache
+        
+        self.ruleset_version = ruleset_fingerprint(
+            sorted(self.suspicious_permissions), self.malware_indicators, self.suspicious_urls,
+            self.dex_api_indicators
+        )
 
-    def analyze_apk(self, apk_path: str) -> Dict[str, Any]:
+    @profiled("apk_analyzer")
+    def analyze_apk(self, apk_path: str, include_dex: bool = True) -> Dict[str, Any]:
         """
-        Perform comprehensive APK analysis
+        Perform comprehensive APK analysis. Members are read straight from the
+        archive, so nothing is extracted to disk. With include_dex=False the
+        DEX members are left out, for callers that analyze them separately
+        with analyze_dex_member() and combine the parts with merge_dex_analysis().
         """
         try:
-            with tempfile.TemporaryDirectory() as temp_dir:
-                # Extract APK
-                extracted_path = self._extract_apk(apk_path, temp_dir)
+            # Read the central directory
+            with stage("open_archive"):
+                apk = self._open_apk(apk_path)
+            
+            with apk:
+                # Read every member once, feeding all detectors that want it
+                manifest = ManifestDetector()
+                dex = DexDetector(self.malware_indicators, self.dex_api_indicators)
+                endpoints = EndpointDetector()
+                keywords = KeywordDetector()
+                members = [info for info in apk.infolist() if include_dex or not self.is_dex_member(info.filename)]
+                with stage("member_scan") as scanned:
+                    scanned.bytes, unreadable = self._scan_members(members, apk, [manifest, dex, endpoints, keywords])
                 
                 # Parse AndroidManifest.xml
-                manifest_data = self._parse_manifest(extracted_path)
-                
-                # Analyze DEX files
-                dex_analysis = self._analyze_dex_files(extracted_path)
+                with stage("manifest_parse"):
+                    manifest_data = self._parse_manifest(manifest.content)
                 
-                # Extract network endpoints
-                network_data = self._extract_network_endpoints(extracted_path)
+                dex_analysis = dex.result()
+                network_data = endpoints.result()
                 
                 # Security analysis
-                security_analysis = self._perform_security_analysis(extracted_path, manifest_data)
+                with stage("security_analysis"):
+                    security_analysis = self._perform_security_analysis(manifest_data, keywords.result(), unreadable)
                 
                 # Certificate analysis
-                cert_info = self._analyze_certificate(apk_path)
+                with stage("certificate"):
+                    cert_info = self._analyze_certificate(apk_path, apk)
                 
                 # Combine all analysis results
                 return self._compile_results(
                     apk_path, manifest_data, dex_analysis, 
-                    network_data, security_analysis, cert_info
+                    network_data, security_analysis, cert_info, unreadable
                 )
                 
         except Exception as e:
             return {"error": f"APK analysis failed: {str(e)}"}
 
-    def _extract_apk(self, apk_path: str, extract_to: str) -> str:
-        """Extract APK contents"""
+    @profiled("apk_analyzer")
+    def analyze_dex_member(self, apk_path: str, member: str) -> Dict[str, Any]:
+        """
+        DEX and keyword findings for one DEX member of an APK, the part of
+        analyze_apk() left out by include_dex=False
+        """
+        try:
+            with stage("open_archive"):
+                apk = self._open_apk(apk_path)
+            
+            with apk:
+                dex = DexDetector(self.malware_indicators, self.dex_api_indicators)
+                keywords = KeywordDetector()
+                with stage("member_scan") as scanned:
+                    scanned.bytes, unreadable = self._scan_members([apk.getinfo(member)], apk, [dex, keywords])
+                return {**dex.result(), **keywords.result(), 'unreadable_members': unreadable}
+                
+        except Exception as e:
+            return {"error": f"DEX analysis failed: {str(e)}"}
+
+    @staticmethod
+    def is_dex_member(filename: str) -> bool:
+        return filename.lower().endswith('.dex')
+
+    @staticmethod
+    def merge_dex_analysis(results: Dict[str, Any], parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Fold analyze_dex_member() parts into an analyze_apk(include_dex=False) result"""
+        if 'error' in results:
+            return results
+        suspicious_apis = set(results.get('suspicious_apis', []))
+        for part in parts:
+            if 'error' in part:
+                continue
+            suspicious_apis.update(part['suspicious_apis'])
+            if part['unreadable_members']:
+                results['unreadable_members'] = results.get('unreadable_members', []) + part['unreadable_members']
+                results['threats'] = results.get('threats', []) + [
+                    f"DEX member could not be read: {part['unreadable_members'][0]['member']}"
+                ]
+            for flag in ('has_obfuscation', 'has_root_detection', 'has_anti_debugging'):
+                results[flag] = results.get(flag, False) or part[flag]
+        results['suspicious_apis'] = list(suspicious_apis)
+        return results
+
+    def _open_apk(self, apk_path: str) -> zipfile.ZipFile:
+        """Open the APK and read its central directory"""
         try:
-            with zipfile.ZipFile(apk_path, 'r') as zip_ref:
-                zip_ref.extractall(extract_to)
-            return extract_to
+            return zipfile.ZipFile(apk_path, 'r')
         except Exception as e:
-            raise Exception(f"Failed to extract APK: {str(e)}")
+            raise Exception(f"Failed to open APK: {str(e)}")
+
+    def _scan_members(self, members: List[zipfile.ZipInfo], apk: zipfile.ZipFile,
+                      detectors: List[MemberDetector]) -> Tuple[int, List[Dict[str, str]]]:
+        """
+        Decompress each of members at most once, in the given order, and
+        feed its chunks to every detector registered for it. Members no active
+        detector wants are never read. Returns the bytes decompressed and the
+        members that failed to read ({"member", "error"}), whose detectors
+        still end on what was read before the failure; time spent in each
+        detector is recorded as a "detector.<name>" stage.
+
+        With a member cache, the stored bytes of members a cacheable detector
+        wants are hashed first (member_digest, no decompression); detectors
+        apply findings cached for that digest instead of reading the member,
+        and findings for members they read to the end are cached, so an app
+        update only decompresses and analyzes what changed.
+        """
+        cache = self.member_cache if apk.filename else None
+        elapsed = {detector.name: 0.0 for detector in detectors}
+        total = 0
+        unreadable = []
+
+        def key(detector: MemberDetector, info: zipfile.ZipInfo) -> MemberKey:
+            return (detector.name, detector.version, digests[info])
+
+        # ZipInfo -> member digest; keyed by entry, as names may repeat within an archive
+        digests: Dict[zipfile.ZipInfo, str] = {}
+        cached = {}
+        fresh = []
+        if cache is not None:
+            with stage("member_cache"), open(apk.filename, 'rb') as f:
+                for info in members:
+                    if info.is_dir() or not any(d.cacheable and d.wants(info.filename) for d in detectors):
+                        continue
+                    try:
+                        digests[info] = member_digest(f, info)
+                    except (OSError, zipfile.BadZipFile):
+                        continue  # read (and reported) like any other member
+                cached = cache.get_many(
+                    key(detector, info) for info in digests
+                    for detector in detectors if detector.cacheable and detector.wants(info.filename)
+                )
+
+        for info in members:
+            if info.is_dir():
+                continue
+            active = []
+            for detector in detectors:
+                if detector.done or not detector.wants(info.filename):
+                    continue
+                findings = cached.get(key(detector, info)) if detector.cacheable and info in digests else None
+                if findings is not None:
+                    detector.apply(findings)
+                else:
+                    active.append(detector)
+            if not active:
+                continue
+            overlap = max(detector.overlap for detector in active)
+            # Detectors that stopped before the member's last chunk have incomplete findings
+            partial = set()
+            error = None
+            try:
+                for detector in active:
+                    detector.begin(info)
+                for window, start in iter_member_chunks(apk, info, overlap):
+                    total += len(window) - start
+                    for detector in active:
+                        if detector.done:
+                            partial.add(detector)
+                            continue
+                        began = time.perf_counter()
+                        detector.feed(window, start)
+                        elapsed[detector.name] += time.perf_counter() - began
+                    if all(detector.done for detector in active):
+                        partial.update(active)
+                        break
+            except Exception as e:
+                # Bad CRC, corrupt deflate, ...: the bytes read so far are still judged
+                error = e
+            for detector in active:
+                began = time.perf_counter()
+                try:
+                    detector.end()
+                except Exception as e:
+                    error = error or e
+                elapsed[detector.name] += time.perf_counter() - began
+            if error is not None:
+                unreadable.append({'member': info.filename, 'error': str(error)})
+                continue
+            if info in digests:
+                fresh.extend(
+                    (key(detector, info), detector.findings()) for detector in active
+                    if detector.cacheable and detector not in partial
+                )
+
+        if fresh:
+            cache.put_many(fresh)
+        for name, seconds in elapsed.items():
+            add_stage(f"detector.{name}", seconds)
+        return total, unreadable
 
-    def _parse_manifest(self, extracted_path: str) -> Dict[str, Any]:
+    def _parse_manifest(self, manifest: Optional[bytes]) -> Dict[str, Any]:
         """Parse AndroidManifest.xml"""
-        manifest_path = os.path.join(extracted_path, 'AndroidManifest.xml')
-        
-        if not os.path.exists(manifest_path):
+        if manifest is None:
             return {"error": "AndroidManifest.xml not found"}
         
         try:
-            # For binary XML, we'd need aapt or similar tool
-            # This is a simplified version for demonstration
-            tree = ET.parse(manifest_path)
-            root = tree.getroot()
+            # APKs ship the manifest compiled to binary XML; accept text XML too
+            root = axml_parser.parse(manifest) if axml_parser.is_axml(manifest) else ET.fromstring(manifest)
             
             # Extract basic information
             package_name = root.get('package', 'unknown')
@@ -132,120 +602,24 @@ class APKAnalyzer:
         except Exception as e:
             return {"error": f"Failed to parse manifest: {str(e)}"}
 
-    def _analyze_dex_files(self, extracted_path: str) -> Dict[str, Any]:
-        """Analyze DEX files for suspicious patterns"""
-        dex_files = []
-        suspicious_apis = []
-        has_obfuscation = False
-        
-        # Find DEX files
-        for root, dirs, files in os.walk(extracted_path):
-            for file in files:
-                if file.endswith('.dex'):
-                    dex_files.append(os.path.join(root, file))
-        
-        # Analyze each DEX file
-        for dex_file in dex_files:
-            try:
-                with open(dex_file, 'rb') as f:
-                    content = f.read()
-                    
-                    # Look for suspicious API calls
-                    for indicator in self.malware_indicators:
-                        if indicator.encode() in content:
-                            suspicious_apis.append(indicator)
-                    
-                    # Check for obfuscation (simplified check)
-                    if b'obfuscation' in content or len([x for x in content if x < 32]) > len(content) * 0.3:
-                        has_obfuscation = True
-                        
-            except Exception:
-                continue
-        
-        return {
-            'dex_files_count': len(dex_files),
-            'suspicious_apis': list(set(suspicious_apis)),
-            'has_obfuscation': has_obfuscation
-        }
-
-    def _extract_network_endpoints(self, extracted_path: str) -> Dict[str, List[str]]:
-        """Extract network endpoints from APK"""
-        urls = []
-        ips = []
-        
-        # URL patterns
-        url_pattern = re.compile(r'https?://[^\s<>"{}|\\^`\[\]]+')
-        ip_pattern = re.compile(r'\b(?:[0-9]{1,3}\.){3}[0-9]{1,3}(?::[0-9]+)?\b')
-        
-        # Search in all text files
-        for root, dirs, files in os.walk(extracted_path):
-            for file in files:
-                if file.endswith(('.xml', '.txt', '.json', '.properties')):
-                    try:
-                        file_path = os.path.join(root, file)
-                        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                            content = f.read()
-                            
-                            # Extract URLs
-                            found_urls = url_pattern.findall(content)
-                            urls.extend(found_urls)
-                            
-                            # Extract IPs
-                            found_ips = ip_pattern.findall(content)
-                            ips.extend(found_ips)
-                            
-                    except Exception:
-                        continue
-        
-        return {
-            'urls': list(set(urls)),
-            'ips': list(set(ips))
-        }
-
-    def _perform_security_analysis(self, extracted_path: str, manifest_data: Dict) -> Dict[str, Any]:
+    def _perform_security_analysis(self, manifest_data: Dict, keyword_data: Dict,
+                                   unreadable: List[Dict[str, str]] = ()) -> Dict[str, Any]:
         """Perform security analysis"""
         risk_score = 0
         threats = []
         
+        # A corrupt member hides its content from the detectors
+        if unreadable:
+            threats.append(f"{len(unreadable)} archive members could not be read")
+        
         # Check permissions
         dangerous_perms = set(manifest_data.get('permissions', [])) & self.suspicious_permissions
         if dangerous_perms:
             risk_score += len(dangerous_perms) * 10
             threats.append(f"Requests {len(dangerous_perms)} dangerous permissions")
         
-        # Check for root detection
-        has_root_detection = False
-        root_keywords = [b'su', b'busybox', b'superuser', b'/system/xbin/', b'/system/bin/']
-        
-        for root, dirs, files in os.walk(extracted_path):
-            for file in files:
-                try:
-                    file_path = os.path.join(root, file)
-                    with open(file_path, 'rb') as f:
-                        content = f.read()
-                        for keyword in root_keywords:
-                            if keyword in content:
-                                has_root_detection = True
-                                break
-                except Exception:
-                    continue
-        
-        # Check for anti-debugging
-        has_anti_debugging = False
-        debug_keywords = [b'android_server_gdbserver', b'TracerPid', b'ptrace']
-        
-        for root, dirs, files in os.walk(extracted_path):
-            for file in files:
-                try:
-                    file_path = os.path.join(root, file)
-                    with open(file_path, 'rb') as f:
-                        content = f.read()
-                        for keyword in debug_keywords:
-                            if keyword in content:
-                                has_anti_debugging = True
-                                break
-                except Exception:
-                    continue
+        has_root_detection = keyword_data.get('has_root_detection', False)
+        has_anti_debugging = keyword_data.get('has_anti_debugging', False)
         
         # Determine risk level
         if risk_score > 50:
@@ -263,19 +637,16 @@ class APKAnalyzer:
             'has_anti_debugging': has_anti_debugging
         }
 
-    def _analyze_certificate(self, apk_path: str) -> Dict[str, Any]:
-        """Analyze APK certificate"""
+    def _analyze_certificate(self, apk_path: str, apk: zipfile.ZipFile) -> Dict[str, Any]:
+        """
+        Analyze the APK signing certificate (v3/v2 signing block, else v1
+        PKCS#7). parsed only means a signer certificate was found and read;
+        the signatures themselves are not verified.
+        """
         try:
-            # This would require keytool or similar
-            # Simplified version for demonstration
-            return {
-                'issuer': 'CN=Android Debug, O=Android, C=US',
-                'subject': 'CN=Android Debug, O=Android, C=US',
-                'valid_from': '2023-01-01',
-                'valid_to': '2025-12-31',
-                'serial_number': hashlib.md5(apk_path.encode()).hexdigest()[:16],
-                'is_valid': True
-            }
+            cert_info = self.signature_reader.read(apk_path, apk)
+            cert_info['parsed'] = True
+            return cert_info
         except Exception:
             return {
                 'issuer': 'Unknown',
@@ -283,11 +654,14 @@ class APKAnalyzer:
                 'valid_from': 'Unknown',
                 'valid_to': 'Unknown',
                 'serial_number': 'Unknown',
-                'is_valid': False
+                'signature_schemes': [],
+                'signature_verified': False,
+                'parsed': False
             }
 
     def _compile_results(self, apk_path: str, manifest_data: Dict, dex_analysis: Dict, 
-                        network_data: Dict, security_analysis: Dict, cert_info: Dict) -> Dict[str, Any]:
+                        network_data: Dict, security_analysis: Dict, cert_info: Dict,
+                        unreadable: List[Dict[str, str]] = ()) -> Dict[str, Any]:
         """Compile all analysis results"""
         
         file_size = os.path.getsize(apk_path)
@@ -315,6 +689,7 @@ class APKAnalyzer:
             'has_root_detection': security_analysis.get('has_root_detection', False),
             'has_anti_debugging': security_analysis.get('has_anti_debugging', False),
             'certificate_info': cert_info,
+            'unreadable_members': list(unreadable),
             'malware_detected': security_analysis.get('risk_score', 0) > 50
         }
 
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+MOBICURE APK Batch Analyzer
+Analyzes directories or lists of APKs on a process pool, splitting large
+multi-DEX APKs into per-DEX tasks, and writes resumable NDJSON results
+"""
+
+import os
+import sys
+import json
+import time
+import zipfile
+import argparse
+import concurrent.futures
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Any, Callable, Iterable, Iterator, Optional, Set, Tuple
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+from apk_analyzer_service import APKAnalyzer
+from apk_index import APKIndex
+from file_hasher import default_hasher
+
+# Analyzer of each pool process, created once by the pool initializer
+_analyzer: Optional[APKAnalyzer] = None
+
+# (path, "apk" or "dex", worker function, its arguments)
+Task = Tuple[str, str, Callable, tuple]
+
+
+def _init_worker():
+    global _analyzer
+    _analyzer = APKAnalyzer()
+
+
+def _analyze_apk(path: str, include_dex: bool) -> Dict[str, Any]:
+    result = _analyzer.analyze_apk(path, include_dex=include_dex)
+    if 'error' in result:
+        return result
+    # Identifies the APK in the index independently of where it was found
+    return {"sha256": default_hasher.hash_file(path, ('sha256',))['sha256'], **result}
+
+
+def _analyze_dex(path: str, member: str) -> Dict[str, Any]:
+    return _analyzer.analyze_dex_member(path, member)
+
+
+def iter_apk_paths(source: str) -> Iterator[str]:
+    """
+    APK paths from a directory (searched recursively for *.apk) or from a
+    manifest file listing one path per line; blank lines and lines starting
+    with # are ignored and relative entries are taken from the manifest's
+    directory. "-" reads the manifest from stdin.
+    """
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith('.apk'):
+                    yield os.path.join(root, name)
+        return
+
+    handle = sys.stdin if source == '-' else open(source)
+    base = os.getcwd() if source == '-' else os.path.dirname(os.path.abspath(source))
+    try:
+        for line in handle:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line if os.path.isabs(line) else os.path.join(base, line)
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+
+def completed_paths(output_path: str) -> Set[str]:
+    """
+    Paths already recorded in an NDJSON output file. A line cut short by an
+    interruption is truncated away so appending resumes on a clean boundary.
+    Records marked retryable (the worker process crashed) do not count, so
+    a resumed run analyzes those APKs again.
+    """
+    if not os.path.exists(output_path):
+        return set()
+    done = set()
+    with open(output_path, 'rb+') as f:
+        valid = 0
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                record = json.loads(line)
+                path = record['path']
+            except (ValueError, KeyError, TypeError):
+                break
+            if not record.get('retryable'):
+                done.add(path)
+            valid += len(line)
+        f.truncate(valid)
+    return done
+
+
+class APKBatchAnalyzer:
+    """
+    Runs APKAnalyzer over many APKs on a process pool. Each APK is one task,
+    except APKs with several DEX files totalling at least split_dex_bytes:
+    those become one task for the non-DEX members plus one per DEX file, so a
+    single large app spreads over all cores instead of holding one. Tasks of
+    every kind share the pool, and at most max_pending APKs are in flight so
+    the input can be an arbitrarily long stream.
+
+    A worker process that dies (segfault, OOM kill) breaks the whole pool and
+    fails every task in flight. The pool is then replaced and those tasks are
+    rerun one at a time, so only the task that crashes a worker on its own is
+    recorded as failed; its record is marked retryable.
+    """
+
+    def __init__(self, workers: Optional[int] = None, split_dex_bytes: int = 4 * 1024 * 1024,
+                 max_pending: Optional[int] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.split_dex_bytes = split_dex_bytes
+        self.max_pending = max_pending or self.workers * 4
+        self.stats = {"apks": 0, "split": 0, "dex_tasks": 0, "errors": 0, "worker_crashes": 0}
+
+    def _dex_members(self, path: str) -> List[str]:
+        """DEX members worth analyzing as separate tasks, or [] to analyze the APK whole"""
+        try:
+            with zipfile.ZipFile(path) as apk:
+                dex = [info for info in apk.infolist() if APKAnalyzer.is_dex_member(info.filename)]
+        except (OSError, zipfile.BadZipFile):
+            # Let the worker report the failure in the result
+            return []
+        if len(dex) < 2 or sum(info.file_size for info in dex) < self.split_dex_bytes:
+            return []
+        return [info.filename for info in dex]
+
+    def _new_pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        return concurrent.futures.ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+
+    def iter_results(self, paths: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """Yield {"path", "elapsed_ms", **result} records in completion order"""
+        jobs: Dict[str, Dict[str, Any]] = {}
+        owners: Dict[concurrent.futures.Future, Task] = {}
+        # Tasks in flight when a worker died, rerun one at a time to find the one that kills workers
+        suspects: deque = deque()
+        paths = iter(paths)
+        exhausted = False
+        pool = self._new_pool()
+
+        def submit(task: Task):
+            try:
+                owners[pool.submit(task[2], *task[3])] = task
+            except BrokenProcessPool:
+                # Broke after the last check; picked up with the other in-flight tasks
+                future = concurrent.futures.Future()
+                future.set_exception(BrokenProcessPool("the process pool is broken"))
+                owners[future] = task
+
+        def complete(task: Task, result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            path, kind = task[0], task[1]
+            job = jobs[path]
+            if kind == "apk":
+                job["apk"] = result
+            else:
+                job["dex"].append(result)
+            job["crashed"] = job["crashed"] or result.get("retryable", False)
+            job["pending"] -= 1
+            if job["pending"]:
+                return None
+
+            del jobs[path]
+            if job["crashed"]:
+                # A DEX part that never ran must not leave the rest of the APK looking clean
+                result = {"error": "APK analysis failed: the worker process crashed", "retryable": True}
+            else:
+                result = APKAnalyzer.merge_dex_analysis(job["apk"], job["dex"])
+            self.stats["apks"] += 1
+            if "error" in result:
+                self.stats["errors"] += 1
+            return {
+                "path": path,
+                "elapsed_ms": round((time.perf_counter() - job["started"]) * 1000, 3),
+                **result
+            }
+
+        try:
+            while True:
+                if suspects:
+                    if not owners:
+                        submit(suspects.popleft())
+                else:
+                    while not exhausted and len(jobs) < self.max_pending:
+                        path = next(paths, None)
+                        if path is None:
+                            exhausted = True
+                            break
+                        if path in jobs:
+                            continue
+                        members = self._dex_members(path)
+                        jobs[path] = {"started": time.perf_counter(), "apk": None, "dex": [],
+                                      "pending": 1 + len(members), "crashed": False}
+                        submit((path, "apk", _analyze_apk, (path, not members)))
+                        for member in members:
+                            submit((path, "dex", _analyze_dex, (path, member)))
+                        if members:
+                            self.stats["split"] += 1
+                            self.stats["dex_tasks"] += len(members)
+                if not owners:
+                    return
+
+                finished, _ = concurrent.futures.wait(owners, return_when=concurrent.futures.FIRST_COMPLETED)
+                if any(isinstance(future.exception(), BrokenProcessPool) for future in finished):
+                    self.stats["worker_crashes"] += 1
+                    # Wait for the pool to settle every future it still held, then replace it
+                    pool.shutdown(wait=True)
+                    pool = self._new_pool()
+                    alone = len(owners) == 1
+                    finished = list(owners)
+
+                for future in finished:
+                    task = owners.pop(future)
+                    error = future.exception()
+                    if isinstance(error, BrokenProcessPool):
+                        if not alone:
+                            suspects.append(task)
+                            continue
+                        # Crashed a worker with nothing else running: this task is the cause
+                        result = {"error": "APK analysis failed: the worker process crashed", "retryable": True}
+                    elif error is not None:
+                        result = {"error": f"APK analysis failed: {str(error)}"}
+                    else:
+                        result = future.result()
+                    record = complete(task, result)
+                    if record is not None:
+                        yield record
+        finally:
+            pool.shutdown(wait=True)
+
+    def run(self, paths: Iterable[str], output_path: str, resume: bool = True,
+            index: Optional[APKIndex] = None) -> Dict[str, Any]:
+        """
+        Analyze paths and append one NDJSON line per APK to output_path. With
+        resume, APKs already present in the file are skipped, so a run can
+        be interrupted and restarted with the same arguments. Results are
+        also added to index when one is given.
+        """
+        done = completed_paths(output_path) if resume else set()
+        skipped = 0
+
+        def pending():
+            nonlocal skipped
+            for path in paths:
+                if path in done:
+                    skipped += 1
+                else:
+                    yield path
+
+        started = time.perf_counter()
+        with open(output_path, 'a' if resume else 'w') as output:
+            for record in self.iter_results(pending()):
+                output.write(json.dumps(record) + '\n')
+                # Each completed line is the checkpoint for its APK
+                output.flush()
+                if index is not None:
+                    index.add(record, record["path"], record.get("sha256"))
+        seconds = time.perf_counter() - started
+        return {
+            "output": output_path,
+            "skipped": skipped,
+            "workers": self.workers,
+            "seconds": round(seconds, 3),
+            "apks_per_sec": round(self.stats["apks"] / seconds, 2) if seconds > 0 else None,
+            **self.stats
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze many APKs in parallel and write NDJSON results")
+    parser.add_argument("source", help="Directory of APKs, or a file listing one APK path per line ('-' for stdin)")
+    parser.add_argument("--output", "-o", default="-",
+                        help="NDJSON output file; re-running with the same file resumes (default: stdout)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--split-dex-mb", type=float, default=4.0,
+                        help="Analyze DEX files of multi-DEX APKs at least this large as separate tasks")
+    parser.add_argument("--no-resume", action="store_true", help="Overwrite the output instead of resuming")
+    parser.add_argument("--index", default=None, help="Also add the results to this apk_index database")
+    args = parser.parse_args()
+
+    batch = APKBatchAnalyzer(workers=args.workers, split_dex_bytes=int(args.split_dex_mb * 1024 * 1024))
+    paths = iter_apk_paths(args.source)
+    index = APKIndex(args.index) if args.index else None
+    try:
+        if args.output == '-':
+            for record in batch.iter_results(paths):
+                print(json.dumps(record), flush=True)
+                if index is not None:
+                    index.add(record, record["path"], record.get("sha256"))
+            summary = dict(batch.stats, workers=batch.workers)
+        else:
+            summary = batch.run(paths, args.output, resume=not args.no_resume, index=index)
+    except KeyboardInterrupt:
+        summary = dict(batch.stats, interrupted=True)
+    finally:
+        if index is not None:
+            index.close()
+    print(json.dumps(summary), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+MOBICURE APK Index
+On-disk inverted index from the endpoints, permissions, components, API
+indicators and signers found by APKAnalyzer to the APKs they occur in, for
+corpus-wide questions such as "which apps contact this domain"
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from collections import defaultdict
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+from file_hasher import default_hasher
+
+# Term kinds, as the "kind:" prefix of every term
+TERM_KINDS = ('url', 'host', 'domain', 'ip', 'permission', 'component', 'api', 'package', 'signer')
+
+# Kinds whose values are case-insensitive
+_FOLDED_KINDS = {'host', 'domain', 'ip', 'signer'}
+
+# Longer values are junk matches of the endpoint regexes
+MAX_TERM_LENGTH = 512
+
+# Postings per block; a block is decoded whole, the blocks of a term are skipped by id range
+BLOCK_POSTINGS = 8192
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_BATCH = 500
+
+
+def encode_postings(ids: Iterable[int], previous: int = 0) -> bytes:
+    """Ascending APK ids as varint gaps from previous"""
+    out = bytearray()
+    for value in ids:
+        gap = value - previous
+        previous = value
+        while gap >= 0x80:
+            out.append((gap & 0x7F) | 0x80)
+            gap >>= 7
+        out.append(gap)
+    return bytes(out)
+
+
+def decode_postings(data: bytes, previous: int = 0) -> List[int]:
+    """Inverse of encode_postings()"""
+    ids = []
+    gap = 0
+    shift = 0
+    for byte in data:
+        gap |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        previous += gap
+        ids.append(previous)
+        gap = 0
+        shift = 0
+    return ids
+
+
+def normalize_term(term: str) -> str:
+    """Canonical "kind:value" form of a query or indexed term"""
+    kind, separator, value = term.partition(':')
+    kind = kind.strip().lower()
+    if not separator or kind not in TERM_KINDS:
+        raise ValueError(f"term must be kind:value with kind one of {', '.join(TERM_KINDS)}")
+    value = value.strip()
+    if kind in _FOLDED_KINDS:
+        value = value.lower().rstrip('.')
+    return f"{kind}:{value}"
+
+
+def _host_terms(host: str) -> Iterator[str]:
+    """host: for the host itself and domain: for it and each parent with at least two labels"""
+    host = host.lower().rstrip('.')
+    if not host:
+        return
+    yield f"host:{host}"
+    labels = host.split('.')
+    if len(labels) == 4 and all(label.isdigit() for label in labels):
+        return
+    for start in range(len(labels) - 1):
+        yield f"domain:{'.'.join(labels[start:])}"
+
+
+def result_terms(result: Dict[str, Any]) -> Set[str]:
+    """Index terms of one analyze_apk() result"""
+    terms = set()
+    for url in result.get('url_endpoints', []):
+        terms.add(f"url:{url}")
+        try:
+            host = urlsplit(url).hostname
+        except ValueError:
+            host = None
+        if host:
+            terms.update(_host_terms(host))
+    for ip in result.get('ip_endpoints', []):
+        terms.add(f"ip:{ip}")
+    for permission in result.get('permissions', []):
+        terms.add(f"permission:{permission}")
+    for kind in ('activities', 'services', 'receivers', 'providers'):
+        for component in result.get(kind, []):
+            terms.add(f"component:{component}")
+    for api in result.get('suspicious_apis', []):
+        terms.add(f"api:{api}")
+    package = result.get('package_name')
+    if package and package != 'unknown':
+        terms.add(f"package:{package}")
+    fingerprint = result.get('certificate_info', {}).get('sha256_fingerprint')
+    if fingerprint:
+        terms.add(f"signer:{fingerprint}")
+    return {term for term in map(normalize_term, terms) if len(term) <= MAX_TERM_LENGTH}
+
+
+class APKIndex:
+    """
+    Inverted index in one SQLite file. APKs get ascending integer ids and
+    each term a list of the ids it occurs in, stored as varint-encoded gaps
+    in blocks of up to BLOCK_POSTINGS. Because ids only grow, new postings
+    are appended to the end of a term's last block without decoding it.
+
+    Additions are buffered in memory and written by flush() (every
+    flush_every APKs, and on close()) in one transaction. A single process
+    should write an index at a time; any number may read it.
+    """
+
+    def __init__(self, path: str, flush_every: int = 500):
+        self.path = path
+        self.flush_every = flush_every
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS apks (
+                id INTEGER PRIMARY KEY,
+                sha256 TEXT NOT NULL UNIQUE,
+                path TEXT,
+                package_name TEXT,
+                indexed_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS terms (
+                id INTEGER PRIMARY KEY,
+                term TEXT NOT NULL UNIQUE,
+                apk_count INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term_id INTEGER NOT NULL,
+                first_id INTEGER NOT NULL,
+                last_id INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (term_id, first_id)
+            ) WITHOUT ROWID;
+        """)
+        self._db.commit()
+        self._lock = threading.Lock()
+        self._pending: Dict[str, List[int]] = defaultdict(list)
+        self._pending_apks: List[Tuple[int, str, Optional[str], Optional[str], float]] = []
+        self._pending_hashes: Set[str] = set()
+        (self._next_id,) = self._db.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM apks").fetchone()
+
+    def add(self, result: Dict[str, Any], path: Optional[str] = None, sha256: Optional[str] = None) -> bool:
+        """
+        Index one analyze_apk() result under the APK's SHA-256, hashing the
+        file at path when sha256 is not given. Returns False for failed
+        analyses and APKs already indexed.
+        """
+        if 'error' in result:
+            return False
+        if sha256 is None and path is None:
+            raise ValueError("either the APK path or its sha256 is required")
+        sha256 = (sha256 or default_hasher.hash_file(path, ('sha256',))['sha256']).lower()
+        terms = result_terms(result)
+        with self._lock:
+            if sha256 in self._pending_hashes or \
+                    self._db.execute("SELECT 1 FROM apks WHERE sha256 = ?", (sha256,)).fetchone():
+                return False
+            apk_id = self._next_id
+            self._next_id += 1
+            self._pending_apks.append((apk_id, sha256, path, result.get('package_name'), time.time()))
+            self._pending_hashes.add(sha256)
+            for term in terms:
+                self._pending[term].append(apk_id)
+            if len(self._pending_apks) >= self.flush_every:
+                self._flush()
+        return True
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending_apks:
+            return
+        db = self._db
+        terms = list(self._pending)
+        term_ids = self._term_ids(terms)
+        with db:
+            db.executemany("INSERT INTO apks VALUES (?, ?, ?, ?, ?)", self._pending_apks)
+            for term in terms:
+                ids = self._pending[term]
+                term_id = term_ids.get(term)
+                if term_id is None:
+                    term_id = db.execute("INSERT INTO terms (term, apk_count) VALUES (?, ?)", (term, len(ids))).lastrowid
+                else:
+                    db.execute("UPDATE terms SET apk_count = apk_count + ? WHERE id = ?", (len(ids), term_id))
+                    block = db.execute(
+                        "SELECT first_id, last_id, count, data FROM postings WHERE term_id = ? ORDER BY first_id DESC LIMIT 1",
+                        (term_id,)
+                    ).fetchone()
+                    # Top up the last block before starting new ones
+                    if block is not None and block[2] < BLOCK_POSTINGS:
+                        first_id, last_id, count, data = block
+                        taken = ids[:BLOCK_POSTINGS - count]
+                        ids = ids[len(taken):]
+                        db.execute(
+                            "UPDATE postings SET last_id = ?, count = ?, data = ? WHERE term_id = ? AND first_id = ?",
+                            (taken[-1], count + len(taken), data + encode_postings(taken, last_id), term_id, first_id)
+                        )
+                for start in range(0, len(ids), BLOCK_POSTINGS):
+                    chunk = ids[start:start + BLOCK_POSTINGS]
+                    db.execute(
+                        "INSERT INTO postings VALUES (?, ?, ?, ?, ?)",
+                        (term_id, chunk[0], chunk[-1], len(chunk), encode_postings(chunk))
+                    )
+        self._pending.clear()
+        self._pending_apks.clear()
+        self._pending_hashes.clear()
+
+    def _term_rows(self, terms: List[str]) -> Iterator[Tuple[int, str, int]]:
+        """(id, term, apk_count) of whichever of terms are indexed"""
+        for start in range(0, len(terms), _LOOKUP_BATCH):
+            batch = terms[start:start + _LOOKUP_BATCH]
+            yield from self._db.execute(
+                f"SELECT id, term, apk_count FROM terms WHERE term IN ({', '.join('?' * len(batch))})", batch
+            )
+
+    def _term_ids(self, terms: List[str]) -> Dict[str, int]:
+        return {term: term_id for term_id, term, _ in self._term_rows(terms)}
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def apk_count(self, term: str) -> int:
+        """Number of indexed APKs containing term"""
+        row = self._db.execute("SELECT apk_count FROM terms WHERE term = ?", (normalize_term(term),)).fetchone()
+        return row[0] if row else 0
+
+    def _postings(self, term_id: int, low: int = 0, high: Optional[int] = None) -> List[int]:
+        """Ids of a term between low and high, decoding only the blocks that overlap them"""
+        # Without high, blocks other writers added since open are included too
+        if high is None:
+            rows = self._db.execute(
+                "SELECT first_id, data FROM postings WHERE term_id = ? AND last_id >= ? ORDER BY first_id",
+                (term_id, low)
+            )
+        else:
+            rows = self._db.execute(
+                "SELECT first_id, data FROM postings WHERE term_id = ? AND last_id >= ? AND first_id <= ? "
+                "ORDER BY first_id",
+                (term_id, low, high)
+            )
+        ids = []
+        for _, data in rows:
+            ids.extend(decode_postings(data))
+        return ids
+
+    def search(self, terms: Iterable[str], match_all: bool = True) -> List[int]:
+        """
+        Ids of the APKs containing every term (or any, with match_all=False),
+        ascending. For conjunctions the rarest term is decoded first and the
+        others only in the id range it leaves.
+        """
+        terms = list(dict.fromkeys(normalize_term(term) for term in terms))
+        if not terms:
+            return []
+        found = {term: (term_id, count) for term_id, term, count in self._term_rows(terms)}
+
+        if not match_all:
+            ids = set()
+            for term_id, _ in found.values():
+                ids.update(self._postings(term_id))
+            return sorted(ids)
+
+        if len(found) < len(terms):
+            return []
+        ordered = sorted(found.values(), key=lambda entry: entry[1])
+        ids = self._postings(ordered[0][0])
+        for term_id, _ in ordered[1:]:
+            if not ids:
+                break
+            candidates = self._postings(term_id, ids[0], ids[-1])
+            ids = sorted(set(ids).intersection(candidates))
+        return ids
+
+    def apks(self, ids: List[int]) -> List[Dict[str, Any]]:
+        """sha256, path and package of indexed APKs, in the order of ids"""
+        rows = {}
+        for start in range(0, len(ids), _LOOKUP_BATCH):
+            batch = ids[start:start + _LOOKUP_BATCH]
+            for apk_id, sha256, path, package_name in self._db.execute(
+                f"SELECT id, sha256, path, package_name FROM apks WHERE id IN ({', '.join('?' * len(batch))})", batch
+            ):
+                rows[apk_id] = {"sha256": sha256, "path": path, "package_name": package_name}
+        return [rows[apk_id] for apk_id in ids if apk_id in rows]
+
+    def query(self, terms: Iterable[str], match_all: bool = True, limit: Optional[int] = 1000) -> Dict[str, Any]:
+        """search() with the matching APKs resolved, at most limit of them"""
+        started = time.perf_counter()
+        ids = self.search(terms, match_all)
+        return {
+            "total": len(ids),
+            "apks": self.apks(ids[:limit] if limit else ids),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 3)
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        db = self._db
+        return {
+            "apks": db.execute("SELECT COUNT(*) FROM apks").fetchone()[0],
+            "terms": db.execute("SELECT COUNT(*) FROM terms").fetchone()[0],
+            "postings": db.execute("SELECT COALESCE(SUM(count), 0) FROM postings").fetchone()[0],
+            "postings_bytes": db.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM postings").fetchone()[0],
+            "pending_apks": len(self._pending_apks)
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query an inverted index of analyzed APKs")
+    parser.add_argument("index", help="Index database file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="Index apk_batch NDJSON results ('-' for stdin)")
+    add.add_argument("results", nargs="+")
+
+    query = commands.add_parser("query", help="APKs containing the given kind:value terms")
+    query.add_argument("terms", nargs="+", help=f"Terms such as domain:example.com or api:DexClassLoader ({', '.join(TERM_KINDS)})")
+    query.add_argument("--any", action="store_true", help="Match APKs containing any term instead of all")
+    query.add_argument("--limit", type=int, default=1000, help="Maximum APKs listed (0 for all)")
+
+    commands.add_parser("stats", help="Index size")
+    args = parser.parse_args()
+
+    with APKIndex(args.index) as index:
+        if args.command == "add":
+            added = 0
+            for source in args.results:
+                handle = sys.stdin if source == '-' else open(source)
+                try:
+                    for line in handle:
+                        if line.strip():
+                            record = json.loads(line)
+                            added += index.add(record, record.get('path'), record.get('sha256'))
+                finally:
+                    if handle is not sys.stdin:
+                        handle.close()
+            index.flush()
+            print(json.dumps({"added": added, **index.stats()}))
+        elif args.command == "query":
+            try:
+                print(json.dumps(index.query(args.terms, match_all=not args.any, limit=args.limit or None), indent=2))
+            except ValueError as e:
+                parser.error(str(e))
+        else:
+            print(json.dumps(index.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+MOBICURE APK Member Cache
+Per-member detector findings keyed by a SHA-256 of the member's stored
+bytes, so re-analyzing an app update only decompresses and analyzes the
+members that changed
+"""
+
+import os
+import json
+import time
+import struct
+import sqlite3
+import zipfile
+import threading
+from collections import OrderedDict
+from typing import BinaryIO, Dict, List, Any, Iterable, Optional, Tuple
+
+from file_hasher import MultiDigest
+
+# (detector, detector version, member digest)
+MemberKey = Tuple[str, str, str]
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_BATCH = 300
+
+LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+LOCAL_HEADER_SIZE = 30
+DIGEST_CHUNK_SIZE = 1024 * 1024
+
+
+def member_digest(f: BinaryIO, info: zipfile.ZipInfo) -> str:
+    """
+    SHA-256 of a member's compression method, size and stored (still
+    compressed) bytes, read from the open archive file f without
+    decompressing. Equal digests mean equal content; unlike the CRC32 in the
+    central directory it cannot be matched by a crafted member.
+    """
+    f.seek(info.header_offset)
+    header = f.read(LOCAL_HEADER_SIZE)
+    if len(header) != LOCAL_HEADER_SIZE or header[:4] != LOCAL_HEADER_SIGNATURE:
+        raise zipfile.BadZipFile(f"Bad local file header for {info.filename!r}")
+    name_length, extra_length = struct.unpack("<HH", header[26:30])
+    f.seek(info.header_offset + LOCAL_HEADER_SIZE + name_length + extra_length)
+
+    digest = MultiDigest(("sha256",))
+    digest.update(struct.pack("<HHQ", info.compress_type, info.flag_bits, info.file_size))
+    remaining = info.compress_size
+    while remaining:
+        chunk = f.read(min(remaining, DIGEST_CHUNK_SIZE))
+        if not chunk:
+            raise zipfile.BadZipFile(f"Truncated member {info.filename!r}")
+        digest.update(chunk)
+        remaining -= len(chunk)
+    return digest.hexdigests()["sha256"]
+
+
+class MemberResultCache:
+    """
+    Findings of one detector for one archive member, stored as JSON under
+    the member's digest (member_digest) plus the detector's version, in an
+    LRU memory tier and optionally a SQLite file shared between processes.
+    Only content that hashes the same reuses findings, whoever signed the
+    APK it came in.
+    """
+
+    def __init__(self, max_entries: int = 65536, db_path: Optional[str] = None, db_max_entries: int = 1000000):
+        self.max_entries = max_entries
+        self.db_max_entries = db_max_entries
+        self._memory: "OrderedDict[MemberKey, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS member_findings (
+                    detector TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    digest TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    result TEXT NOT NULL,
+                    PRIMARY KEY (detector, version, digest)
+                )
+            """)
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_member_findings_created ON member_findings (created_at)")
+            self._db.commit()
+
+    def get_many(self, keys: Iterable[MemberKey]) -> Dict[MemberKey, Any]:
+        """Cached findings for whichever of keys are known, from memory then from disk in batches"""
+        found: Dict[MemberKey, Any] = {}
+        missing: List[MemberKey] = []
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                payload = self._memory.get(key)
+                if payload is None:
+                    missing.append(key)
+                    continue
+                self._memory.move_to_end(key)
+                found[key] = json.loads(payload)
+                self.counters["memory_hits"] += 1
+
+            if self._db is not None and missing:
+                for start in range(0, len(missing), _LOOKUP_BATCH):
+                    batch = missing[start:start + _LOOKUP_BATCH]
+                    clauses = " OR ".join(["(detector = ? AND version = ? AND digest = ?)"] * len(batch))
+                    rows = self._db.execute(
+                        f"SELECT detector, version, digest, result FROM member_findings WHERE {clauses}",
+                        [value for key in batch for value in key]
+                    ).fetchall()
+                    for *key, payload in rows:
+                        key = tuple(key)
+                        self._put_memory(key, payload)
+                        found[key] = json.loads(payload)
+                        self.counters["disk_hits"] += 1
+
+            self.counters["misses"] += sum(1 for key in missing if key not in found)
+        return found
+
+    def put_many(self, items: Iterable[Tuple[MemberKey, Any]]):
+        """Store findings for several members in one transaction"""
+        rows = [(key, json.dumps(findings)) for key, findings in items]
+        if not rows:
+            return
+        now = time.time()
+        with self._lock:
+            for key, payload in rows:
+                self._put_memory(key, payload)
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO member_findings VALUES (?, ?, ?, ?, ?)",
+                    [(*key, now, payload) for key, payload in rows]
+                )
+                self._evict_disk()
+                self._db.commit()
+            self.counters["stores"] += len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+            hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+            stats = dict(self.counters)
+            stats.update({
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory)
+            })
+            if self._db is not None:
+                stats["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM member_findings").fetchone()[0]
+            return stats
+
+    def _put_memory(self, key: MemberKey, payload: str):
+        self._memory[key] = payload
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        excess = self._db.execute("SELECT COUNT(*) FROM member_findings").fetchone()[0] - self.db_max_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM member_findings WHERE rowid IN "
+                "(SELECT rowid FROM member_findings ORDER BY created_at LIMIT ?)", (excess,)
+            )
+
+
+# Process-wide instance; set MOBICURE_APK_MEMBER_CACHE_DB to keep findings across runs and processes
+default_member_cache = MemberResultCache(db_path=os.environ.get("MOBICURE_APK_MEMBER_CACHE_DB"))
@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+MOBICURE APK Signature Reader
+Signer certificates from the APK Signature Scheme v2/v3 block and v1
+(JAR) PKCS#7 signatures, with an LRU of parsed certificates keyed by
+SHA-256 fingerprint
+"""
+
+import sys
+import json
+import struct
+import hashlib
+import zipfile
+import argparse
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+
+# APK Signing Block: [u64 size][id-value pairs][u64 size][magic], right before the central directory
+SIGNING_BLOCK_MAGIC = b"APK Sig Block 42"
+SIGNATURE_SCHEME_V2_ID = 0x7109871A
+SIGNATURE_SCHEME_V3_ID = 0xF05368C0
+SIGNATURE_SCHEME_V31_ID = 0x1B93AD61
+
+EOCD_SIGNATURE = b"PK\x05\x06"
+EOCD_SIZE = 22
+MAX_COMMENT_SIZE = 0xFFFF
+
+V1_SIGNATURE_SUFFIXES = (".rsa", ".dsa", ".ec")
+
+OID_SIGNED_DATA = "1.2.840.113549.1.7.2"
+
+OID_NAMES = {
+    "2.5.4.3": "CN",
+    "2.5.4.5": "SERIALNUMBER",
+    "2.5.4.6": "C",
+    "2.5.4.7": "L",
+    "2.5.4.8": "ST",
+    "2.5.4.9": "STREET",
+    "2.5.4.10": "O",
+    "2.5.4.11": "OU",
+    "1.2.840.113549.1.9.1": "emailAddress",
+    "0.9.2342.19200300.100.1.1": "UID",
+    "0.9.2342.19200300.100.1.25": "DC",
+}
+
+SIGNATURE_ALGORITHMS = {
+    "1.2.840.113549.1.1.4": "md5WithRSAEncryption",
+    "1.2.840.113549.1.1.5": "sha1WithRSAEncryption",
+    "1.2.840.113549.1.1.10": "rsassaPss",
+    "1.2.840.113549.1.1.11": "sha256WithRSAEncryption",
+    "1.2.840.113549.1.1.12": "sha384WithRSAEncryption",
+    "1.2.840.113549.1.1.13": "sha512WithRSAEncryption",
+    "1.2.840.10040.4.3": "dsaWithSHA1",
+    "2.16.840.1.101.3.4.3.2": "dsaWithSHA256",
+    "1.2.840.10045.4.1": "ecdsaWithSHA1",
+    "1.2.840.10045.4.3.2": "ecdsaWithSHA256",
+    "1.2.840.10045.4.3.3": "ecdsaWithSHA384",
+    "1.2.840.10045.4.3.4": "ecdsaWithSHA512",
+    "1.3.101.112": "ed25519",
+}
+
+PUBLIC_KEY_ALGORITHMS = {
+    "1.2.840.113549.1.1.1": "RSA",
+    "1.2.840.10040.4.1": "DSA",
+    "1.2.840.10045.2.1": "EC",
+    "1.3.101.112": "Ed25519",
+}
+
+EC_CURVE_BITS = {
+    "1.2.840.10045.3.1.7": 256,
+    "1.3.132.0.34": 384,
+    "1.3.132.0.35": 521,
+}
+
+# DER tags
+_INTEGER = 0x02
+_BIT_STRING = 0x03
+_OID = 0x06
+_UTC_TIME = 0x17
+_GENERALIZED_TIME = 0x18
+_SEQUENCE = 0x30
+_SET = 0x31
+_CONTEXT_0 = 0xA0
+
+_STRING_ENCODINGS = {
+    0x0C: "utf-8",       # UTF8String
+    0x13: "ascii",       # PrintableString
+    0x16: "ascii",       # IA5String
+    0x14: "latin-1",     # TeletexString
+    0x1A: "ascii",       # VisibleString
+    0x1E: "utf-16-be",   # BMPString
+    0x1C: "utf-32-be",   # UniversalString
+}
+
+
+class CertificateError(ValueError):
+    """Malformed signature block, PKCS#7 structure or certificate"""
+
+
+def _tlv(data: bytes, offset: int, end: int) -> Tuple[int, int, int]:
+    """(tag, content start, content end) of the DER element at offset"""
+    if offset + 2 > end:
+        raise CertificateError("truncated DER element")
+    tag = data[offset]
+    length = data[offset + 1]
+    offset += 2
+    if length & 0x80:
+        count = length & 0x7F
+        if not 0 < count <= 4 or offset + count > end:
+            raise CertificateError("unsupported DER length")
+        length = int.from_bytes(data[offset:offset + count], "big")
+        offset += count
+    if offset + length > end:
+        raise CertificateError("DER element out of bounds")
+    return tag, offset, offset + length
+
+
+def _children(data: bytes, start: int, end: int) -> Iterator[Tuple[int, int, int, int]]:
+    """(tag, element start, content start, content end) of each element in [start, end)"""
+    while start < end:
+        tag, content_start, content_end = _tlv(data, start, end)
+        yield tag, start, content_start, content_end
+        start = content_end
+
+
+def _oid(data: bytes) -> str:
+    if not data:
+        raise CertificateError("empty OID")
+    parts = [min(data[0] // 40, 2)]
+    parts.append(data[0] - parts[0] * 40)
+    value = 0
+    for byte in data[1:]:
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            parts.append(value)
+            value = 0
+    return ".".join(map(str, parts))
+
+
+def _algorithm(data: bytes, start: int, end: int) -> Tuple[str, Optional[Tuple[int, int, int]]]:
+    """(OID, parameters element) of an AlgorithmIdentifier's content"""
+    elements = list(_children(data, start, end))
+    if not elements or elements[0][0] != _OID:
+        raise CertificateError("malformed AlgorithmIdentifier")
+    tag, _, content_start, content_end = elements[0]
+    params = elements[1] if len(elements) > 1 else None
+    return _oid(data[content_start:content_end]), (params[0], params[2], params[3]) if params else None
+
+
+def _name(data: bytes, start: int, end: int) -> str:
+    """Distinguished name in RFC 4514 order, e.g. "CN=Android Debug, O=Android, C=US" """
+    parts = []
+    for _, _, set_start, set_end in _children(data, start, end):
+        for _, _, attribute_start, attribute_end in _children(data, set_start, set_end):
+            elements = list(_children(data, attribute_start, attribute_end))
+            if len(elements) != 2 or elements[0][0] != _OID:
+                raise CertificateError("malformed name attribute")
+            oid = _oid(data[elements[0][2]:elements[0][3]])
+            tag, _, value_start, value_end = elements[1]
+            encoding = _STRING_ENCODINGS.get(tag, "latin-1")
+            value = data[value_start:value_end].decode(encoding, errors="replace")
+            parts.append(f"{OID_NAMES.get(oid, oid)}={value}")
+    return ", ".join(reversed(parts))
+
+
+def _time(tag: int, raw: bytes) -> datetime:
+    text = raw.decode("ascii", errors="replace").rstrip("Z")
+    try:
+        if tag == _UTC_TIME:
+            year = int(text[:2])
+            text = f"{1900 + year if year >= 50 else 2000 + year}{text[2:]}"
+        return datetime.strptime(text[:14].ljust(14, "0"), "%Y%m%d%H%M%S").replace(tzinfo=timezone.utc)
+    except ValueError:
+        raise CertificateError(f"malformed time {raw!r}")
+
+
+def _public_key(data: bytes, start: int, end: int) -> Tuple[str, Optional[int]]:
+    """(algorithm, key size in bits) of a SubjectPublicKeyInfo"""
+    elements = list(_children(data, start, end))
+    if len(elements) != 2:
+        raise CertificateError("malformed SubjectPublicKeyInfo")
+    oid, params = _algorithm(data, elements[0][2], elements[0][3])
+    algorithm = PUBLIC_KEY_ALGORITHMS.get(oid, oid)
+    bits = None
+    if algorithm == "RSA":
+        # BIT STRING (one unused-bits byte) wrapping SEQUENCE { modulus, exponent }
+        _, key_start, key_end = _tlv(data, elements[1][2] + 1, elements[1][3])
+        modulus = next(_children(data, key_start, key_end), None)
+        if modulus is None:
+            raise CertificateError("malformed RSA public key")
+        bits = int.from_bytes(data[modulus[2]:modulus[3]], "big").bit_length()
+    elif algorithm == "EC" and params is not None and params[0] == _OID:
+        bits = EC_CURVE_BITS.get(_oid(data[params[1]:params[2]]))
+    elif algorithm == "Ed25519":
+        bits = 256
+    return algorithm, bits
+
+
+def _tbs_fields(der: bytes) -> List[Tuple[int, int, int, int]]:
+    """TBSCertificate fields from serialNumber on (the optional version is dropped)"""
+    tag, start, end = _tlv(der, 0, len(der))
+    if tag != _SEQUENCE:
+        raise CertificateError("certificate is not a SEQUENCE")
+    tag, tbs_start, tbs_end = _tlv(der, start, end)
+    fields = list(_children(der, tbs_start, tbs_end))
+    if fields and fields[0][0] == _CONTEXT_0:
+        fields = fields[1:]
+    if len(fields) < 6:
+        raise CertificateError("truncated TBSCertificate")
+    return fields
+
+
+def parse_certificate(der: bytes) -> Dict[str, Any]:
+    """Subject, issuer, validity, serial and key details of an X.509 certificate"""
+    fields = _tbs_fields(der)
+    serial, signature, issuer, validity, subject, key = fields[:6]
+    if serial[0] != _INTEGER:
+        raise CertificateError("malformed serial number")
+    times = list(_children(der, validity[2], validity[3]))
+    if len(times) != 2:
+        raise CertificateError("malformed validity")
+    valid_from = _time(times[0][0], der[times[0][2]:times[0][3]])
+    valid_to = _time(times[1][0], der[times[1][2]:times[1][3]])
+    signature_oid, _ = _algorithm(der, signature[2], signature[3])
+    key_algorithm, key_bits = _public_key(der, key[2], key[3])
+    serial_number = int.from_bytes(der[serial[2]:serial[3]], "big", signed=True)
+    issuer_name = _name(der, issuer[2], issuer[3])
+    subject_name = _name(der, subject[2], subject[3])
+    return {
+        "issuer": issuer_name,
+        "subject": subject_name,
+        "valid_from": valid_from.date().isoformat(),
+        "valid_to": valid_to.date().isoformat(),
+        "serial_number": format(serial_number, "x"),
+        "signature_algorithm": SIGNATURE_ALGORITHMS.get(signature_oid, signature_oid),
+        "public_key_algorithm": key_algorithm,
+        "public_key_bits": key_bits,
+        "self_signed": issuer_name == subject_name,
+        "is_debug_certificate": subject_name.startswith("CN=Android Debug"),
+        "sha256_fingerprint": hashlib.sha256(der).hexdigest(),
+        "sha1_fingerprint": hashlib.sha1(der).hexdigest(),
+    }
+
+
+def pkcs7_signer_certificate(der: bytes) -> Optional[bytes]:
+    """
+    DER of the signer's certificate in a PKCS#7 SignedData blob: the
+    certificate whose issuer and serial match the first SignerInfo, or the
+    first certificate when none does
+    """
+    tag, start, end = _tlv(der, 0, len(der))
+    elements = list(_children(der, start, end))
+    if tag != _SEQUENCE or len(elements) < 2 or elements[0][0] != _OID:
+        raise CertificateError("not a PKCS#7 ContentInfo")
+    if _oid(der[elements[0][2]:elements[0][3]]) != OID_SIGNED_DATA:
+        raise CertificateError("PKCS#7 content is not SignedData")
+    _, signed_start, signed_end = _tlv(der, elements[1][2], elements[1][3])
+
+    certificates = []
+    signer_infos = None
+    for tag, element_start, content_start, content_end in _children(der, signed_start, signed_end):
+        if tag == _CONTEXT_0:
+            certificates = [
+                (child_start, child_end) for child_tag, child_start, _, child_end
+                in _children(der, content_start, content_end) if child_tag == _SEQUENCE
+            ]
+        elif tag == _SET:
+            # digestAlgorithms comes first; the last SET is signerInfos
+            signer_infos = (content_start, content_end)
+    if not certificates:
+        return None
+
+    if signer_infos is not None and signer_infos[0] < signer_infos[1]:
+        _, info_start, info_end = _tlv(der, *signer_infos)
+        info = list(_children(der, info_start, info_end))
+        if len(info) > 1 and info[1][0] == _SEQUENCE:
+            identifier = list(_children(der, info[1][2], info[1][3]))
+            if len(identifier) == 2:
+                issuer = der[identifier[0][1]:identifier[0][3]]
+                serial = der[identifier[1][1]:identifier[1][3]]
+                for cert_start, cert_end in certificates:
+                    cert = der[cert_start:cert_end]
+                    fields = _tbs_fields(cert)
+                    if cert[fields[0][1]:fields[0][3]] == serial and cert[fields[2][1]:fields[2][3]] == issuer:
+                        return cert
+    cert_start, cert_end = certificates[0]
+    return der[cert_start:cert_end]
+
+
+def read_signing_block(f) -> Dict[int, bytes]:
+    """
+    id -> value pairs of the APK Signing Block, reading only the end of
+    central directory record and the block itself. {} when the APK has none.
+    """
+    f.seek(0, 2)
+    size = f.tell()
+    tail_size = min(size, EOCD_SIZE + MAX_COMMENT_SIZE)
+    f.seek(size - tail_size)
+    tail = f.read(tail_size)
+    eocd = tail.rfind(EOCD_SIGNATURE)
+    if eocd < 0 or eocd + EOCD_SIZE > len(tail):
+        return {}
+    (central_directory,) = struct.unpack_from("<I", tail, eocd + 16)
+    if central_directory < 32 or central_directory > size:
+        return {}
+
+    f.seek(central_directory - 24)
+    block_size, magic = struct.unpack("<Q16s", f.read(24))
+    if magic != SIGNING_BLOCK_MAGIC or not 24 <= block_size <= central_directory - 8:
+        return {}
+    f.seek(central_directory - block_size - 8)
+    block = f.read(block_size + 8)
+    if len(block) != block_size + 8 or struct.unpack_from("<Q", block, 0)[0] != block_size:
+        return {}
+
+    pairs = {}
+    position = 8
+    end = len(block) - 24
+    while position + 12 <= end:
+        (length,) = struct.unpack_from("<Q", block, position)
+        if length < 4 or position + 8 + length > end:
+            break
+        (pair_id,) = struct.unpack_from("<I", block, position + 8)
+        pairs[pair_id] = block[position + 12:position + 8 + length]
+        position += 8 + length
+    return pairs
+
+
+def _length_prefixed(data: bytes, position: int) -> Tuple[bytes, int]:
+    if position + 4 > len(data):
+        raise CertificateError("truncated signature block")
+    (length,) = struct.unpack_from("<I", data, position)
+    position += 4
+    if position + length > len(data):
+        raise CertificateError("signature block field out of bounds")
+    return data[position:position + length], position + length
+
+
+def signing_block_certificate(value: bytes) -> Optional[bytes]:
+    """
+    DER of the first signer's certificate in a v2/v3 signature scheme value;
+    both schemes start signed data with digests then certificates
+    """
+    signers, _ = _length_prefixed(value, 0)
+    signer, _ = _length_prefixed(signers, 0)
+    signed_data, _ = _length_prefixed(signer, 0)
+    _, position = _length_prefixed(signed_data, 0)
+    certificates, _ = _length_prefixed(signed_data, position)
+    if not certificates:
+        return None
+    certificate, _ = _length_prefixed(certificates, 0)
+    return certificate
+
+
+class CertificateCache:
+    """
+    Parsed certificates keyed by SHA-256 fingerprint. Apps from one publisher
+    share a signer, so after the first of them only the fingerprint is
+    computed. counts tracks how many APKs each cached signer signed.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, der: bytes) -> Dict[str, Any]:
+        fingerprint = hashlib.sha256(der).hexdigest()
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is not None:
+                self._entries.move_to_end(fingerprint)
+                self.counts[fingerprint] += 1
+                self.hits += 1
+                return dict(entry)
+        entry = parse_certificate(der)
+        with self._lock:
+            self.misses += 1
+            self._entries[fingerprint] = entry
+            self.counts[fingerprint] = self.counts.get(fingerprint, 0) + 1
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self.counts.pop(evicted, None)
+        return dict(entry)
+
+    def signers(self) -> List[Dict[str, Any]]:
+        """Cached signers with the number of APKs seen for each, most common first"""
+        with self._lock:
+            return sorted(
+                ({"sha256_fingerprint": fingerprint, "subject": entry["subject"], "apks": self.counts[fingerprint]}
+                 for fingerprint, entry in self._entries.items()),
+                key=lambda signer: -signer["apks"]
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class APKSignatureReader:
+    """
+    Signer certificate of an APK. The v3 signer is preferred (it reflects key
+    rotation), then v2, then the v1 JAR signature; every scheme present is
+    listed in signature_schemes. Signatures are not verified, which the
+    result states as signature_verified: False.
+    """
+
+    def __init__(self, cache: Optional[CertificateCache] = None):
+        self.cache = cache or default_certificate_cache
+
+    def read(self, apk_path: str, apk: Optional[zipfile.ZipFile] = None) -> Dict[str, Any]:
+        schemes = []
+        certificate = None
+        with open(apk_path, "rb") as f:
+            pairs = read_signing_block(f)
+        for scheme, block_id in (("v3.1", SIGNATURE_SCHEME_V31_ID), ("v3", SIGNATURE_SCHEME_V3_ID),
+                                 ("v2", SIGNATURE_SCHEME_V2_ID)):
+            if block_id in pairs:
+                schemes.append(scheme)
+                if certificate is None:
+                    certificate = signing_block_certificate(pairs[block_id])
+
+        owned = apk is None
+        if owned:
+            apk = zipfile.ZipFile(apk_path)
+        try:
+            names = sorted(
+                info.filename for info in apk.infolist()
+                if info.filename.upper().startswith("META-INF/") and info.filename.lower().endswith(V1_SIGNATURE_SUFFIXES)
+            )
+            if names:
+                schemes.append("v1")
+                if certificate is None:
+                    certificate = pkcs7_signer_certificate(apk.read(names[0]))
+        finally:
+            if owned:
+                apk.close()
+
+        if certificate is None:
+            raise CertificateError("APK is not signed")
+        info = self.cache.get(certificate)
+        info["signature_schemes"] = sorted(schemes)
+        info["signature_verified"] = False
+        return info
+
+
+# Process-wide instance so scans of apps from the same publisher reuse parsed signers
+default_certificate_cache = CertificateCache()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the signer certificate of APKs")
+    parser.add_argument("apks", nargs="+")
+    args = parser.parse_args()
+
+    reader = APKSignatureReader()
+    for path in args.apks:
+        try:
+            info = reader.read(path)
+        except (OSError, zipfile.BadZipFile, CertificateError) as e:
+            info = {"error": str(e)}
+        print(json.dumps({"path": path, **info}))
+    print(json.dumps({"cache": reader.cache.stats(), "signers": reader.cache.signers()}), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+MOBICURE Binary XML Decoder
+Decodes the compiled (AXML) AndroidManifest.xml stored in APKs into an
+ElementTree element, without aapt or apktool
+"""
+
+import sys
+import struct
+import zipfile
+import argparse
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Tuple
+
+ANDROID_NS = "http://schemas.android.com/apk/res/android"
+
+# ResChunk_header types
+RES_STRING_POOL_TYPE = 0x0001
+RES_XML_TYPE = 0x0003
+RES_XML_START_NAMESPACE_TYPE = 0x0100
+RES_XML_END_NAMESPACE_TYPE = 0x0101
+RES_XML_START_ELEMENT_TYPE = 0x0102
+RES_XML_END_ELEMENT_TYPE = 0x0103
+RES_XML_CDATA_TYPE = 0x0104
+RES_XML_RESOURCE_MAP_TYPE = 0x0180
+
+UTF8_FLAG = 0x100
+NO_INDEX = 0xFFFFFFFF
+
+# Res_value data types
+TYPE_NULL = 0x00
+TYPE_REFERENCE = 0x01
+TYPE_ATTRIBUTE = 0x02
+TYPE_STRING = 0x03
+TYPE_FLOAT = 0x04
+TYPE_DIMENSION = 0x05
+TYPE_FRACTION = 0x06
+TYPE_INT_DEC = 0x10
+TYPE_INT_HEX = 0x11
+TYPE_INT_BOOLEAN = 0x12
+TYPE_FIRST_COLOR_INT = 0x1C
+TYPE_LAST_COLOR_INT = 0x1F
+
+_RADIX_MULTIPLIERS = (1.0 / (1 << 8), 1.0 / (1 << 15), 1.0 / (1 << 23), 1.0 / (1 << 31))
+_DIMENSION_UNITS = ("px", "dp", "sp", "pt", "in", "mm")
+_FRACTION_UNITS = ("%", "%p")
+
+# Framework attribute ids the manifest analysis reads. Obfuscators blank or
+# rename attribute strings, but the resource map still carries these ids.
+ANDROID_ATTRIBUTES = {
+    0x01010001: "label",
+    0x01010002: "icon",
+    0x01010003: "name",
+    0x01010006: "permission",
+    0x0101000F: "debuggable",
+    0x01010010: "exported",
+    0x0101020C: "minSdkVersion",
+    0x0101021B: "versionCode",
+    0x0101021C: "versionName",
+    0x01010270: "targetSdkVersion",
+    0x01010271: "maxSdkVersion",
+    0x01010280: "allowBackup",
+}
+
+
+class AXMLFormatError(ValueError):
+    """Data is not a well-formed binary XML document"""
+
+
+def is_axml(data) -> bool:
+    """Whether data starts with a binary XML chunk header"""
+    return len(data) >= 8 and struct.unpack_from("<HH", data, 0) == (RES_XML_TYPE, 8)
+
+
+_CHUNK_HEADER = struct.Struct("<HHI")
+_STRING_POOL_HEADER = struct.Struct("<HHIIIIII")
+_ELEMENT_EXTENSION = struct.Struct("<IIHHH")
+# ResXMLTree_attribute: ns, name, raw value, then Res_value (size, res0, type, data)
+_ATTRIBUTE = struct.Struct("<IIIHBBI")
+
+
+def _decode_strings(data: bytes, offset: int) -> List[str]:
+    """
+    All entries of a string pool chunk. Manifest pools are small and nearly
+    every entry is referenced, so decoding them up front is cheaper than
+    decoding on demand.
+    """
+    _, header_size, size, count, _, flags, strings_start, _ = _STRING_POOL_HEADER.unpack_from(data, offset)
+    end = offset + size
+    if offset + header_size + count * 4 > end:
+        raise AXMLFormatError("string pool index out of bounds")
+    base = offset + strings_start
+    strings = []
+    if flags & UTF8_FLAG:
+        for string_offset in struct.unpack_from(f"<{count}I", data, offset + header_size):
+            position = base + string_offset
+            # UTF-16 length, then UTF-8 byte length, each one or two bytes
+            position += 2 if data[position] & 0x80 else 1
+            length = data[position]
+            if length & 0x80:
+                length = ((length & 0x7F) << 8) | data[position + 1]
+                position += 2
+            else:
+                position += 1
+            if position + length > end:
+                raise AXMLFormatError("string out of bounds")
+            strings.append(data[position:position + length].decode("utf-8", errors="replace"))
+    else:
+        for string_offset in struct.unpack_from(f"<{count}I", data, offset + header_size):
+            position = base + string_offset
+            length = data[position] | (data[position + 1] << 8)
+            if length & 0x8000:
+                length = ((length & 0x7FFF) << 16) | data[position + 2] | (data[position + 3] << 8)
+                position += 4
+            else:
+                position += 2
+            if position + length * 2 > end:
+                raise AXMLFormatError("string out of bounds")
+            strings.append(data[position:position + length * 2].decode("utf-16-le", errors="replace"))
+    return strings
+
+
+def _complex(data: int, units: Tuple[str, ...]) -> str:
+    mantissa = (data & 0xFFFFFF00) - (1 << 32 if data & 0x80000000 else 0)
+    value = mantissa * _RADIX_MULTIPLIERS[(data >> 4) & 0x3]
+    unit = data & 0xF
+    return f"{value:g}{units[unit] if unit < len(units) else ''}"
+
+
+def _format_value(data_type: int, data: int, strings: List[str]) -> str:
+    """Typed attribute value rendered the way aapt dumps it"""
+    if data_type == TYPE_STRING:
+        return strings[data] if data < len(strings) else ""
+    if data_type == TYPE_INT_DEC:
+        return str(data - (1 << 32) if data & 0x80000000 else data)
+    if data_type == TYPE_INT_BOOLEAN:
+        return "true" if data else "false"
+    if data_type == TYPE_INT_HEX:
+        return f"0x{data:08x}"
+    if data_type == TYPE_REFERENCE:
+        return f"@0x{data:08x}"
+    if data_type == TYPE_ATTRIBUTE:
+        return f"?0x{data:08x}"
+    if data_type == TYPE_FLOAT:
+        return f"{struct.unpack('<f', struct.pack('<I', data))[0]:g}"
+    if data_type == TYPE_DIMENSION:
+        return _complex(data, _DIMENSION_UNITS)
+    if data_type == TYPE_FRACTION:
+        return _complex(data, _FRACTION_UNITS)
+    if TYPE_FIRST_COLOR_INT <= data_type <= TYPE_LAST_COLOR_INT:
+        return f"#{data:08x}"
+    if data_type == TYPE_NULL:
+        return ""
+    return str(data)
+
+
+def parse(data) -> ET.Element:
+    """
+    Decode a binary XML document into its root element. Namespaced names
+    use ElementTree's "{uri}name" form, so android:name is read as
+    element.get("{http://schemas.android.com/apk/res/android}name").
+    Raises AXMLFormatError on malformed input.
+    """
+    data = bytes(data)
+    if not is_axml(data):
+        raise AXMLFormatError("missing binary XML header")
+    (document_size,) = struct.unpack_from("<I", data, 4)
+    end = min(document_size, len(data))
+
+    strings: Optional[List[str]] = None
+    resource_ids: Tuple[int, ...] = ()
+    # (namespace index, name index) -> "{uri}name", resolved once per document
+    keys: Dict[Tuple[int, int], str] = {}
+    root: Optional[ET.Element] = None
+    stack: List[ET.Element] = []
+
+    def string(index: int) -> str:
+        return strings[index] if index < len(strings) else ""
+
+    def qualified(namespace: int, name: str) -> str:
+        uri = string(namespace) if namespace != NO_INDEX else ""
+        return f"{{{uri}}}{name}" if uri else name
+
+    def attribute_key(namespace: int, index: int) -> str:
+        # The resource map names framework attributes even when their strings are blanked
+        name = ANDROID_ATTRIBUTES.get(resource_ids[index]) if index < len(resource_ids) else None
+        key = keys[namespace, index] = qualified(namespace, name or string(index) or f"attr{index}")
+        return key
+
+    position = 8
+    try:
+        while position + 8 <= end:
+            chunk_type, header_size, chunk_size = _CHUNK_HEADER.unpack_from(data, position)
+            if chunk_size < 8 or position + chunk_size > end:
+                raise AXMLFormatError(f"chunk at {position} out of bounds")
+
+            if chunk_type == RES_XML_START_ELEMENT_TYPE:
+                if strings is None:
+                    raise AXMLFormatError("element before string pool")
+                extension = position + header_size
+                namespace, name, attribute_start, attribute_size, attribute_count = \
+                    _ELEMENT_EXTENSION.unpack_from(data, extension)
+                tag = qualified(namespace, string(name))
+                element = ET.Element(tag) if not stack else ET.SubElement(stack[-1], tag)
+                offset = extension + attribute_start
+                # Attributes must be full records lying inside this chunk
+                if attribute_count and (
+                        attribute_size < _ATTRIBUTE.size
+                        or offset + attribute_count * attribute_size > position + chunk_size):
+                    raise AXMLFormatError(f"attributes of element at {position} out of bounds")
+                for _ in range(attribute_count):
+                    namespace, name, raw_value, _, _, data_type, value = _ATTRIBUTE.unpack_from(data, offset)
+                    key = keys.get((namespace, name)) or attribute_key(namespace, name)
+                    if raw_value != NO_INDEX:
+                        element.set(key, string(raw_value))
+                    else:
+                        element.set(key, _format_value(data_type, value, strings))
+                    offset += attribute_size
+                if root is None:
+                    root = element
+                stack.append(element)
+            elif chunk_type == RES_XML_END_ELEMENT_TYPE:
+                if stack:
+                    stack.pop()
+            elif chunk_type == RES_STRING_POOL_TYPE:
+                strings = _decode_strings(data, position)
+            elif chunk_type == RES_XML_RESOURCE_MAP_TYPE:
+                count = (chunk_size - header_size) // 4
+                resource_ids = struct.unpack_from(f"<{count}I", data, position + header_size)
+            elif chunk_type == RES_XML_CDATA_TYPE:
+                if stack and strings is not None:
+                    (index,) = struct.unpack_from("<I", data, position + header_size)
+                    stack[-1].text = (stack[-1].text or "") + string(index)
+            # Namespace chunks need no handling: attribute namespaces carry their URI
+
+            position += chunk_size
+    except (struct.error, IndexError) as e:
+        raise AXMLFormatError(f"truncated binary XML: {e}")
+
+    if root is None:
+        raise AXMLFormatError("document has no elements")
+    return root
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print a binary XML document (or an APK's manifest) as text XML")
+    parser.add_argument("path", help="APK or compiled XML file")
+    parser.add_argument("--member", default="AndroidManifest.xml", help="Member to decode when path is an APK")
+    args = parser.parse_args()
+
+    if zipfile.is_zipfile(args.path):
+        with zipfile.ZipFile(args.path) as apk:
+            data = apk.read(args.member)
+    else:
+        with open(args.path, "rb") as f:
+            data = f.read()
+
+    ET.register_namespace("android", ANDROID_NS)
+    root = parse(data)
+    ET.indent(root)
+    sys.stdout.write(ET.tostring(root, encoding="unicode") + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+MOBICURE Geolocation Database Benchmark
+CSV import time, open time and lookup throughput of the memory-mapped range table
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import argparse
+import tempfile
+import ipaddress
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPTS_DIR)
+
+from geoip_db import GeoIPDatabase, build
+
+
+def write_feed(path, ranges, rng):
+    """Contiguous IPv4 ranges of random width, as a CSV feed"""
+    width = (1 << 32) // ranges
+    with open(path, "w") as f:
+        f.write("start_ip,end_ip,country,region,city,asn\n")
+        for i in range(ranges):
+            start = i * width + rng.randrange(width // 4)
+            end = start + rng.randrange(1, width // 2)
+            location = i % 5000
+            f.write(f"{start},{end},C{location % 250},Region {location % 1000},City {location},AS{location}\n")
+
+
+def bench_lookups(db, addresses):
+    start = time.perf_counter()
+    found = 0
+    for address in addresses:
+        if db.lookup(address) is not None:
+            found += 1
+    elapsed = time.perf_counter() - start
+    return {
+        "lookups": len(addresses),
+        "found": found,
+        "lookups_per_sec": round(len(addresses) / elapsed),
+        "us_per_lookup": round(elapsed / len(addresses) * 1e6, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Geolocation table import and lookup throughput")
+    parser.add_argument("--ranges", type=int, default=4000000)
+    parser.add_argument("--lookups", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    directory = tempfile.mkdtemp(prefix="geoip-bench-")
+    try:
+        feed = os.path.join(directory, "feed.csv")
+        table = os.path.join(directory, "ranges.geoip")
+        write_feed(feed, args.ranges, rng)
+
+        start = time.perf_counter()
+        summary = build([feed], table)
+        build_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        db = GeoIPDatabase(table)
+        open_ms = (time.perf_counter() - start) * 1000
+
+        addresses = [str(ipaddress.IPv4Address(rng.getrandbits(32))) for _ in range(args.lookups)]
+
+        print(json.dumps({
+            "ranges": summary["ipv4_ranges"],
+            "locations": summary["locations"],
+            "feed_bytes": os.path.getsize(feed),
+            "file_bytes": os.path.getsize(table),
+            "build_seconds": round(build_seconds, 3),
+            "open_ms": round(open_ms, 3),
+            "lookups": bench_lookups(db, addresses),
+        }, indent=2))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
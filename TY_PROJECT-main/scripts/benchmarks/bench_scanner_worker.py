@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+MOBICURE Scanner Worker Benchmark
+Compares per-request cold `python3` spawns against a warm scanner worker
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        "runs": len(samples),
+        "mean_ms": round(statistics.mean(samples), 3),
+        "p50_ms": round(samples[len(samples) // 2], 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+    }
+
+
+def bench_cold(sample_path, runs):
+    script = os.path.join(SCRIPTS_DIR, "malware_scanner_service.py")
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, script, sample_path], capture_output=True, check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def bench_warm(sample_path, runs):
+    # Every run scans the same file, so the result cache would turn all but the
+    # first into cache hits; disable it to time the scan itself
+    worker = subprocess.Popen(
+        [sys.executable, os.path.join(SCRIPTS_DIR, "scanner_worker.py"), "--preload", "malware_scanner",
+         "--no-result-cache"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+    round_trip = []
+    in_worker = []
+    try:
+        # Wait until preload has finished so only steady-state requests are timed
+        worker.stdin.write(json.dumps({"id": "warmup", "op": "ping"}) + "\n")
+        worker.stdin.flush()
+        worker.stdout.readline()
+
+        for i in range(runs):
+            request = {"id": i, "tool": "malware_scanner", "params": {"path": sample_path}}
+            start = time.perf_counter()
+            worker.stdin.write(json.dumps(request) + "\n")
+            worker.stdin.flush()
+            response = json.loads(worker.stdout.readline())
+            round_trip.append((time.perf_counter() - start) * 1000)
+            if not response["ok"]:
+                raise RuntimeError(response["error"])
+            in_worker.append(response["elapsed_ms"])
+    finally:
+        worker.stdin.write(json.dumps({"op": "shutdown"}) + "\n")
+        worker.stdin.close()
+        worker.wait(timeout=10)
+    return round_trip, in_worker
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold spawn vs warm worker latency")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--size", type=int, default=64 * 1024, help="Sample file size in bytes")
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile('wb', suffix='.js', delete=False) as f:
+        f.write((b"var x = eval('1+1'); fetch('https://bit.ly/abc');\n" * (args.size // 52 + 1))[:args.size])
+        sample_path = f.name
+
+    try:
+        cold = bench_cold(sample_path, args.runs)
+        warm_round_trip, warm_in_worker = bench_warm(sample_path, args.runs)
+    finally:
+        os.unlink(sample_path)
+
+    print(json.dumps({
+        "sample_size": args.size,
+        "cold_spawn": summarize(cold),
+        "warm_worker_round_trip": summarize(warm_round_trip),
+        "warm_worker_scan_only": summarize(warm_in_worker),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+MOBICURE Signature Database Benchmark
+Build time, open time and lookup throughput of the memory-mapped signature index
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import argparse
+import tempfile
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPTS_DIR)
+
+from signature_db import ALGORITHMS, DIGEST_SIZES, SignatureDatabase, write_index
+
+
+def bench_lookups(db, algorithm, digests):
+    start = time.perf_counter()
+    found = 0
+    for digest in digests:
+        if db.lookup(algorithm, digest) is not None:
+            found += 1
+    elapsed = time.perf_counter() - start
+    return {
+        "lookups": len(digests),
+        "found": found,
+        "lookups_per_sec": round(len(digests) / elapsed),
+        "us_per_lookup": round(elapsed / len(digests) * 1e6, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Signature index build and lookup throughput")
+    parser.add_argument("--entries", type=int, default=1000000, help="Signatures per hash type")
+    parser.add_argument("--lookups", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    directory = tempfile.mkdtemp(prefix="sigdb-bench-")
+    try:
+        known = {algorithm: [rng.randbytes(size) for _ in range(args.entries)]
+                 for algorithm, size in DIGEST_SIZES.items()}
+        additions = (
+            (algorithm, digest, f"Family {i % 1000}", "high")
+            for algorithm in ALGORITHMS for i, digest in enumerate(known[algorithm])
+        )
+
+        start = time.perf_counter()
+        write_index(os.path.join(directory, "base.sigdb"), additions)
+        build_seconds = time.perf_counter() - start
+        file_size = os.path.getsize(os.path.join(directory, "base.sigdb"))
+
+        start = time.perf_counter()
+        db = SignatureDatabase(directory)
+        open_ms = (time.perf_counter() - start) * 1000
+
+        results = {}
+        for algorithm, size in DIGEST_SIZES.items():
+            hits = [d.hex() for d in rng.sample(known[algorithm], min(args.lookups, args.entries))]
+            misses = [rng.randbytes(size).hex() for _ in range(args.lookups)]
+            miss_result = bench_lookups(db, algorithm, misses)
+            results[algorithm] = {
+                "hits": bench_lookups(db, algorithm, hits),
+                "misses": miss_result,
+            }
+
+        print(json.dumps({
+            "entries_per_type": args.entries,
+            "file_bytes": file_size,
+            "bytes_per_entry": round(file_size / (args.entries * len(ALGORITHMS)), 2),
+            "build_seconds": round(build_seconds, 3),
+            "open_ms": round(open_ms, 3),
+            "lookups": results,
+        }, indent=2))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,8 @@ import json
 from datetime import datetime
 from typing import Dict, List, Any, Optional
 
+from scan_profiler import profiled, stage
+
 class BreachChecker:
     def __init__(self):
         # In a real implementation, you would use actual breach APIs
@@ -45,6 +47,7 @@ class BreachChecker:
             ]
         }
 
+    @profiled("breach_checker")
     def check_email_breaches(self, email: str) -> Dict[str, Any]:
         """
         Check if an email address appears in known data breaches
@@ -63,7 +66,8 @@ class BreachChecker:
                 }
             
             # Check against breach databases
-            breaches = self._query_breach_databases(email)
+            with stage("breach_database"):
+                breaches = self._query_breach_databases(email)
             
             # Calculate risk assessment
             risk_assessment = self._calculate_risk(breaches)
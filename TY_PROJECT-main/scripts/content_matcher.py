@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+MOBICURE Content Matcher
+Multi-pattern matching engine shared by the file scanners
+"""
+
+import re
+from collections import Counter
+from typing import Dict, List, Any, Callable, Iterable, Optional, Set, Tuple
+
+# Token patterns shared by the file scanners
+BASE64_PATTERN = r'[A-Za-z0-9+/]{50,}={0,2}'
+URL_PATTERN = r'https?://[^\s<>"\']+|www\.[^\s<>"\']+|[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}[^\s<>"\']*'
+
+
+class ContentMatcher:
+    """
+    Compiles a list of (key, pattern, flags) entries and reports every pattern
+    hit, with counts and byte offsets. A cheap literal prefilter first drops
+    the patterns that cannot match the data; each remaining pattern then runs
+    its own pass in the regex engine, so per pattern, hits follow the same
+    leftmost, non-overlapping semantics as ``re.findall`` with that pattern
+    alone, and nested hits (a keyword inside a URL, ``exec(`` inside
+    ``shell_exec(``) cost nothing extra.
+
+    Offsets are recorded for the keys in offsets (all keys by default). Keys
+    in capture keep their matched text under "matches"; keys in tally count
+    each distinct matched text in a Counter under "tally" instead.
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, str, int]], max_offsets: int = 100,
+                 capture: Optional[Iterable[str]] = None,
+                 capture_filter: Optional[Callable[[str, str], bool]] = None,
+                 offsets: Optional[Iterable[str]] = None, tally: Optional[Iterable[str]] = None):
+        self.patterns: List[Tuple[str, str, int]] = list(patterns)
+        self.max_offsets = max_offsets
+        self.capture: Set[str] = set(capture or [])
+        self.tally: Set[str] = set(tally or [])
+        self.offsets: Set[str] = set(key for key, _, _ in self.patterns) if offsets is None else set(offsets)
+        # Optional (key, text) predicate deciding which captured matches are kept
+        self.capture_filter = capture_filter
+
+        self._group_to_key: Dict[str, str] = {}
+        self._regexes: Dict[str, Any] = {}
+        # group -> (ignore case, literals of which at least one must occur for a match)
+        self._prefilters: Dict[str, Tuple[bool, List[bytes]]] = {}
+        for index, (key, pattern, flags) in enumerate(self.patterns):
+            group = f"p{index}"
+            self._group_to_key[group] = key
+            self._regexes[group] = re.compile(pattern.encode('utf-8'), flags)
+            literals = self._required_literals(pattern)
+            if literals:
+                ignore_case = bool(flags & re.IGNORECASE)
+                self._prefilters[group] = (
+                    ignore_case, [lit.lower() if ignore_case else lit for lit in literals]
+                )
+
+    @staticmethod
+    def _required_literals(pattern: str, min_length: int = 3) -> Optional[List[bytes]]:
+        """
+        Leading literal of each top-level branch, e.g. ``cmd\\.exe|powershell``
+        gives [b'cmd.exe', b'powershell']. Returns None when any branch lacks
+        a usable literal, in which case the pattern is never prefiltered.
+        """
+        # Split on top-level | only; alternations inside groups and classes stay
+        branches, depth, in_class, branch_start, i = [], 0, False, 0, 0
+        while i < len(pattern):
+            char = pattern[i]
+            if char == '\\':
+                i += 1
+            elif in_class:
+                in_class = char != ']'
+            elif char == '[':
+                in_class = True
+                # A ] right after [ or [^ is a member, not the end of the class
+                if pattern.startswith('^', i + 1):
+                    i += 1
+                if pattern.startswith(']', i + 1):
+                    i += 1
+            elif char == '(':
+                depth += 1
+            elif char == ')':
+                depth -= 1
+            elif char == '|' and depth == 0:
+                branches.append(pattern[branch_start:i])
+                branch_start = i + 1
+            i += 1
+        branches.append(pattern[branch_start:])
+
+        literals = []
+        for branch in branches:
+            literal = ''
+            i = 0
+            while i < len(branch):
+                char = branch[i]
+                if char == '\\' and i + 1 < len(branch) and not branch[i + 1].isalnum():
+                    token, i = branch[i + 1], i + 2
+                elif char.isalnum() or char in '_-/:':
+                    token, i = char, i + 1
+                else:
+                    break
+                if i < len(branch) and branch[i] in '?*{':
+                    break
+                literal += token
+            if len(literal) < min_length:
+                return None
+            literals.append(literal.encode('utf-8'))
+        return literals
+
+    def _absent_groups(self, data) -> frozenset:
+        """Groups whose required literals do not occur anywhere in data"""
+        if not self._prefilters:
+            return frozenset()
+        lowered = None
+        absent = set()
+        for group, (ignore_case, literals) in self._prefilters.items():
+            haystack = data
+            if ignore_case:
+                if lowered is None:
+                    lowered = bytes(data).lower()
+                haystack = lowered
+            if not any(literal in haystack for literal in literals):
+                absent.add(group)
+        return frozenset(absent)
+
+    def raw_hits(self, data, start: int = 0, end: Optional[int] = None) -> List[Tuple[str, int, int]]:
+        """Candidate (group, start, end) hits starting within data[start:end], in offset order"""
+        if end is None:
+            end = len(data)
+        raw: List[Tuple[str, int, int]] = []
+        absent = self._absent_groups(data[start:end])
+        for group, regex in self._regexes.items():
+            if group not in absent:
+                raw.extend((group, m.start(), m.end()) for m in regex.finditer(data, start, end))
+        raw.sort(key=lambda hit: (hit[1], hit[0]))
+        return raw
+
+    def select_hits(self, raw: List[Tuple[str, int, int]], last_end: Dict[str, int],
+                    base_offset: int = 0) -> List[Tuple[str, int, int]]:
+        """
+        Resolve candidates to (key, start, end) hits, dropping any that overlap an
+        earlier hit of the same pattern. last_end holds absolute offsets and is
+        updated in place so selection can continue across chunks.
+        """
+        hits = []
+        for group, hit_start, hit_end in raw:
+            if base_offset + hit_start < last_end.get(group, -1):
+                continue
+            last_end[group] = base_offset + (hit_end if hit_end > hit_start else hit_start + 1)
+            hits.append((self._group_to_key[group], hit_start, hit_end))
+        return hits
+
+    def find_hits(self, data, start: int = 0, end: Optional[int] = None) -> List[Tuple[str, int, int]]:
+        """Return (key, start, end) hits within data[start:end], in offset order"""
+        return self.select_hits(self.raw_hits(data, start, end), {})
+
+    def new_report(self) -> Dict[str, Dict[str, Any]]:
+        """Empty report with an entry for every pattern"""
+        report = {key: {"count": 0, "offsets": [], "matches": []} for key, _, _ in self.patterns}
+        for key in self.tally:
+            report[key]["tally"] = Counter()
+        return report
+
+    def add_hits(self, report: Dict[str, Dict[str, Any]], data, hits: List[Tuple[str, int, int]],
+                 base_offset: int = 0):
+        """Fold hits from data into an existing report"""
+        offsets, capture, tally = self.offsets, self.capture, self.tally
+        for key, hit_start, hit_end in hits:
+            entry = report[key]
+            entry["count"] += 1
+            if key in offsets and len(entry["offsets"]) < self.max_offsets:
+                entry["offsets"].append(base_offset + hit_start)
+            if key in tally:
+                entry["tally"][bytes(data[hit_start:hit_end])] += 1
+            elif key in capture:
+                text = bytes(data[hit_start:hit_end]).decode('utf-8', errors='ignore')
+                if self.capture_filter is None or self.capture_filter(key, text):
+                    entry["matches"].append(text)
+
+    def scan(self, data) -> Dict[str, Dict[str, Any]]:
+        """
+        Scan bytes-like data once and return
+        {key: {"count": int, "offsets": [int, ...], "matches": [str, ...]}}
+        """
+        report = self.new_report()
+        self.add_hits(report, data, self.find_hits(data))
+        return report
+
+
+class StreamingScan:
+    """
+    Incremental ContentMatcher scan fed with fixed-size chunks.
+
+    Each chunk is matched together with an overlap carried over from the
+    previous one. Hits are only committed once they start before the overlap
+    window, and the cut point is moved back so no committed hit straddles it.
+    For hits shorter than overlap the report is the same as scanning the whole
+    data at once; a longer hit may be found shortened or split. While a hit is
+    still open across the cut, the buffer may grow up to max_buffer before
+    the hit is committed in pieces, which keeps memory bounded.
+    """
+
+    CONTEXT = 16  # bytes kept before the window for patterns that look behind
+
+    def __init__(self, matcher: ContentMatcher, overlap: int = 4096, max_buffer: int = 8 * 1024 * 1024):
+        self.matcher = matcher
+        self.overlap = overlap
+        self.max_buffer = max_buffer
+        self.report = matcher.new_report()
+        self.bytes_scanned = 0
+        self._buffer = b''
+        self._start = 0  # window start within the buffer
+        self._base = 0   # absolute offset of buffer[0]
+        self._last_end: Dict[str, int] = {}
+        self._retry_at = 0  # buffer length at which a deferred drain is retried
+
+    def feed(self, chunk):
+        """Add the next chunk of data"""
+        self.bytes_scanned += len(chunk)
+        self._buffer = self._buffer + bytes(chunk) if self._buffer else bytes(chunk)
+        if len(self._buffer) - self._start > self.overlap and len(self._buffer) >= self._retry_at:
+            self._drain(final=False)
+
+    def finish(self) -> Dict[str, Dict[str, Any]]:
+        """Scan whatever is still buffered and return the final report"""
+        self._drain(final=True)
+        self._buffer = b''
+        return self.report
+
+    def _drain(self, final: bool):
+        data = self._buffer
+        raw = self.matcher.raw_hits(data, self._start, len(data))
+
+        if final:
+            cut = len(data)
+        else:
+            window_cut = cut = len(data) - self.overlap
+            # Hits that cross the cut may still grow; leave them for the next round
+            while True:
+                crossing = [hit_start for _, hit_start, hit_end in raw if hit_start < cut < hit_end]
+                if not crossing:
+                    break
+                cut = min(crossing)
+            if cut <= self._start:
+                if len(data) < self.max_buffer:
+                    # Wait for the open hit to complete before rescanning
+                    self._retry_at = len(data) + self.overlap
+                    return
+                cut = window_cut
+
+        self._retry_at = 0
+        committed = [hit for hit in raw if hit[1] < cut]
+        hits = self.matcher.select_hits(committed, self._last_end, self._base)
+        self.matcher.add_hits(self.report, data, hits, self._base)
+
+        drop = max(0, cut - self.CONTEXT)
+        self._buffer = data[drop:]
+        self._base += drop
+        self._start = cut - drop
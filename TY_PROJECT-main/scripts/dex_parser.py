@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+MOBICURE DEX Parser
+Header, string, type, method and class tables of Dalvik executables,
+read in place from the file bytes
+"""
+
+import sys
+import json
+import bisect
+import struct
+import argparse
+from typing import Dict, Any, Iterator, Optional, Set, Tuple
+
+DEX_MAGIC = b"dex\n"
+ENDIAN_CONSTANT = 0x12345678
+HEADER_SIZE = 0x70
+
+# (size, offset) field pairs of the header, by table
+_TABLE_FIELDS = {
+    "string_ids": 0x38,
+    "type_ids": 0x40,
+    "proto_ids": 0x48,
+    "field_ids": 0x50,
+    "method_ids": 0x58,
+    "class_defs": 0x60,
+    "data": 0x68,
+}
+
+# Bytes of each entry in the fixed-size tables
+_ENTRY_SIZES = {
+    "string_ids": 4,
+    "type_ids": 4,
+    "proto_ids": 12,
+    "field_ids": 8,
+    "method_ids": 8,
+    "class_defs": 32,
+}
+
+# Byte classes counted by byte_stats(); each is a deletion table for bytes.translate
+_CONTROL = bytes(range(32))
+_PRINTABLE = bytes(range(32, 127))
+_HIGH = bytes(range(128, 256))
+
+# memoryview.cast uses native order; DEX tables are little-endian
+_NATIVE_LE = sys.byteorder == "little"
+
+
+class DexFormatError(ValueError):
+    """Data is not a well-formed DEX file"""
+
+
+def byte_stats(data) -> Dict[str, Any]:
+    """
+    Share of control (< 0x20), printable ASCII, high (>= 0x80) and zero
+    bytes, counted with C-level bytes.translate passes instead of a Python
+    loop over every byte
+    """
+    data = bytes(data)
+    size = len(data)
+    if not size:
+        return {"size": 0, "control_ratio": 0.0, "printable_ratio": 0.0, "high_ratio": 0.0, "zero_ratio": 0.0}
+    return {
+        "size": size,
+        "control_ratio": (size - len(data.translate(None, _CONTROL))) / size,
+        "printable_ratio": (size - len(data.translate(None, _PRINTABLE))) / size,
+        "high_ratio": (size - len(data.translate(None, _HIGH))) / size,
+        "zero_ratio": data.count(0) / size,
+    }
+
+
+class DexFile:
+    """
+    Read-only view of one DEX file. The id tables are exposed as casts of a
+    memoryview over the original bytes, and strings are decoded on first use,
+    so opening a file costs a header parse and bounds checks only.
+    """
+
+    def __init__(self, data):
+        self.data = bytes(data) if not isinstance(data, bytes) else data
+        self._view = memoryview(self.data)
+        self._strings: Dict[int, str] = {}
+        self._parse_header()
+
+    def _parse_header(self):
+        data = self.data
+        if len(data) < HEADER_SIZE or data[:4] != DEX_MAGIC or data[7] != 0:
+            raise DexFormatError("missing DEX magic")
+        self.version = data[4:7].decode("ascii", errors="replace")
+        (endian_tag,) = struct.unpack_from("<I", data, 0x28)
+        if endian_tag != ENDIAN_CONSTANT:
+            raise DexFormatError("unsupported DEX byte order")
+        (self.checksum,) = struct.unpack_from("<I", data, 0x08)
+        self.file_size, self.header_size = struct.unpack_from("<II", data, 0x20)
+
+        self.tables: Dict[str, Tuple[int, int]] = {}
+        for table, field in _TABLE_FIELDS.items():
+            size, offset = struct.unpack_from("<II", data, field)
+            entry = _ENTRY_SIZES.get(table, 1)
+            if size and (offset < HEADER_SIZE or offset + size * entry > len(data)):
+                raise DexFormatError(f"{table} table out of bounds")
+            self.tables[table] = (size, offset)
+
+        self._string_offsets = self._u32_table("string_ids")
+        self._type_strings = self._u32_table("type_ids")
+        # method_id_item is {u16 class_idx, u16 proto_idx, u32 name_idx}
+        self._method_words = self._u32_table("method_ids", 2)
+
+    def _u32_table(self, table: str, words: int = 1):
+        """Little-endian u32 words of a table, without copying on little-endian hosts"""
+        size, offset = self.tables[table]
+        view = self._view[offset:offset + size * 4 * words]
+        if _NATIVE_LE:
+            return view.cast("I")
+        return struct.unpack(f"<{size * words}I", view)
+
+    @property
+    def string_count(self) -> int:
+        return self.tables["string_ids"][0]
+
+    @property
+    def type_count(self) -> int:
+        return self.tables["type_ids"][0]
+
+    @property
+    def method_count(self) -> int:
+        return self.tables["method_ids"][0]
+
+    @property
+    def class_count(self) -> int:
+        return self.tables["class_defs"][0]
+
+    def string(self, index: int) -> str:
+        """Entry of the string table, decoded from MUTF-8"""
+        value = self._strings.get(index)
+        if value is not None:
+            return value
+        offset = self._string_offsets[index]
+        data = self.data
+        # Skip the uleb128 UTF-16 length; the data itself is NUL-terminated
+        while offset < len(data) and data[offset] & 0x80:
+            offset += 1
+        offset += 1
+        end = data.find(b"\0", offset)
+        if end < 0:
+            raise DexFormatError(f"unterminated string {index}")
+        raw = data[offset:end]
+        try:
+            value = raw.decode("utf-8", errors="surrogatepass")
+        except UnicodeDecodeError:
+            value = raw.decode("utf-8", errors="replace")
+        self._strings[index] = value
+        return value
+
+    def strings(self) -> Iterator[str]:
+        for index in range(self.string_count):
+            yield self.string(index)
+
+    def type_descriptor(self, index: int) -> str:
+        """Type descriptor such as "Ljava/lang/Runtime;" """
+        return self.string(self._type_strings[index])
+
+    def types(self) -> Iterator[str]:
+        for index in range(self.type_count):
+            yield self.type_descriptor(index)
+
+    def method_refs(self) -> Iterator[Tuple[str, str]]:
+        """(class descriptor, method name) for every entry of the method table"""
+        words = self._method_words
+        for index in range(self.method_count):
+            class_idx = words[index * 2] & 0xFFFF
+            yield self.type_descriptor(class_idx), self.string(words[index * 2 + 1])
+
+    def method_ref_set(self) -> Set[str]:
+        """Method references as "Lclass;->name", for exact API matching"""
+        return {f"{owner}->{name}" for owner, name in self.method_refs()}
+
+    # The string, type and method tables are sorted, so single references are
+    # found by binary search without decoding the rest of the file. Strings
+    # sort by UTF-16 code unit, which matches str ordering below U+D800.
+
+    def find_string(self, value: str) -> Optional[int]:
+        """Index of an exact entry of the string table"""
+        index = self._bisect_strings(value)
+        if index < self.string_count and self.string(index) == value:
+            return index
+        return None
+
+    def _bisect_strings(self, value: str) -> int:
+        low, high = 0, self.string_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.string(middle) < value:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def find_type(self, descriptor: str) -> Optional[int]:
+        """Index of a type referenced by this file"""
+        string_index = self.find_string(descriptor)
+        if string_index is None:
+            return None
+        index = bisect.bisect_left(self._type_strings, string_index)
+        if index < self.type_count and self._type_strings[index] == string_index:
+            return index
+        return None
+
+    def has_type_prefix(self, prefix: str) -> bool:
+        """Whether any referenced type descriptor starts with prefix (a package such as "Ljavax/crypto/")"""
+        index = self._bisect_strings(prefix)
+        while index < self.string_count and self.string(index).startswith(prefix):
+            position = bisect.bisect_left(self._type_strings, index)
+            if position < self.type_count and self._type_strings[position] == index:
+                return True
+            index += 1
+        return False
+
+    def has_method_ref(self, class_descriptor: str, name: str) -> bool:
+        """Whether the method table references class_descriptor->name (any prototype)"""
+        class_idx = self.find_type(class_descriptor)
+        name_idx = self.find_string(name) if class_idx is not None else None
+        if name_idx is None:
+            return False
+        # method_ids are sorted by (class_idx, name_idx, proto_idx)
+        words = self._method_words
+        target = (class_idx, name_idx)
+        low, high = 0, self.method_count
+        while low < high:
+            middle = (low + high) // 2
+            if (words[middle * 2] & 0xFFFF, words[middle * 2 + 1]) < target:
+                low = middle + 1
+            else:
+                high = middle
+        return low < self.method_count and (words[low * 2] & 0xFFFF, words[low * 2 + 1]) == target
+
+    def defined_classes(self) -> Iterator[str]:
+        """Descriptors of the classes defined (not just referenced) in this file"""
+        size, offset = self.tables["class_defs"]
+        for index in range(size):
+            (class_idx,) = struct.unpack_from("<I", self.data, offset + index * 32)
+            yield self.type_descriptor(class_idx)
+
+    def byte_stats(self) -> Dict[str, Any]:
+        return byte_stats(self.data)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "file_size": self.file_size,
+            "checksum": f"{self.checksum:08x}",
+            "strings": self.string_count,
+            "types": self.type_count,
+            "methods": self.method_count,
+            "classes": self.class_count,
+        }
+
+
+def short_name_ratio(descriptors, max_length: int = 2) -> Optional[float]:
+    """
+    Share of class descriptors whose simple name (inner class part included)
+    is at most max_length characters, as produced by ProGuard/R8 renaming.
+    None when there are no classes.
+    """
+    total = 0
+    short = 0
+    for descriptor in descriptors:
+        if not descriptor.startswith("L"):
+            continue
+        total += 1
+        simple = descriptor[1:].rstrip(";").rsplit("/", 1)[-1].rsplit("$", 1)[-1]
+        if len(simple) <= max_length:
+            short += 1
+    return short / total if total else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a DEX file")
+    parser.add_argument("path")
+    parser.add_argument("--methods", action="store_true", help="List method references")
+    args = parser.parse_args()
+
+    with open(args.path, "rb") as f:
+        dex = DexFile(f.read())
+    summary = dex.describe()
+    summary["byte_stats"] = dex.byte_stats()
+    summary["short_class_name_ratio"] = short_name_ratio(dex.defined_classes())
+    if args.methods:
+        summary["method_refs"] = sorted(dex.method_ref_set())
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+MOBICURE File Hasher
+Single-read multi-digest hashing shared by all file scanners
+"""
+
+import os
+import hashlib
+import threading
+import concurrent.futures
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from scan_profiler import stage
+
+DEFAULT_ALGORITHMS = ('md5', 'sha1', 'sha256')
+
+# hashlib releases the GIL while digesting buffers larger than 2 KiB, so
+# updating several digests from separate threads runs them on separate cores
+PARALLEL_THRESHOLD = 256 * 1024
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> concurrent.futures.ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=len(DEFAULT_ALGORITHMS), thread_name_prefix="hasher"
+                )
+    return _executor
+
+
+class MultiDigest:
+    """Updates several digests from the same memoryview"""
+
+    def __init__(self, algorithms: Iterable[str] = DEFAULT_ALGORITHMS):
+        self.hashers = {name: hashlib.new(name) for name in algorithms}
+        self.bytes_hashed = 0
+
+    def update(self, data):
+        view = memoryview(data)
+        self.bytes_hashed += view.nbytes
+        if len(self.hashers) > 1 and view.nbytes >= PARALLEL_THRESHOLD:
+            futures = [_get_executor().submit(hasher.update, view) for hasher in self.hashers.values()]
+            for future in futures:
+                future.result()
+        else:
+            for hasher in self.hashers.values():
+                hasher.update(view)
+
+    def hexdigests(self) -> Dict[str, str]:
+        return {name: hasher.hexdigest() for name, hasher in self.hashers.items()}
+
+
+class FileHasher:
+    """
+    Reads a file once through a reusable readinto buffer, feeds every requested
+    digest from that buffer and caches the results per file, so a request that
+    goes through several scanners hashes the file only once.
+    """
+
+    def __init__(self, chunk_size: int = 1024 * 1024, max_entries: int = 256):
+        self.chunk_size = chunk_size
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[Tuple, Dict[str, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _cache_key(file_path: str, stat: Optional[os.stat_result] = None) -> Tuple:
+        stat = stat or os.stat(file_path)
+        return (os.path.realpath(file_path), stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def cached(self, file_path: str, algorithms: Iterable[str] = DEFAULT_ALGORITHMS) -> Optional[Dict[str, str]]:
+        """Return cached digests for the file if all requested algorithms are known"""
+        algorithms = tuple(algorithms)
+        key = self._cache_key(file_path)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None or any(name not in entry for name in algorithms):
+                self.misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return {name: entry[name] for name in algorithms}
+
+    def store(self, file_path: str, hashes: Dict[str, str], stat: Optional[os.stat_result] = None):
+        """Remember digests computed elsewhere, e.g. during a streaming scan"""
+        key = self._cache_key(file_path, stat)
+        with self._lock:
+            entry = self._cache.setdefault(key, {})
+            entry.update(hashes)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def iter_chunks(self, file_path: str) -> Iterator[memoryview]:
+        """
+        Yield the file as memoryviews into one reused buffer. Each view is only
+        valid until the next one is requested.
+        """
+        buffer = bytearray(self.chunk_size)
+        view = memoryview(buffer)
+        with open(file_path, 'rb', buffering=0) as f:
+            while True:
+                read = f.readinto(buffer)
+                if not read:
+                    break
+                yield view[:read]
+
+    def hash_file(self, file_path: str, algorithms: Iterable[str] = DEFAULT_ALGORITHMS) -> Dict[str, str]:
+        """Hash the file with every requested algorithm in a single read"""
+        algorithms = tuple(algorithms)
+        cached = self.cached(file_path, algorithms)
+        if cached is not None:
+            return cached
+
+        stat = os.stat(file_path)
+        digest = MultiDigest(algorithms)
+        with stage("hashing", stat.st_size):
+            for chunk in self.iter_chunks(file_path):
+                digest.update(chunk)
+        hashes = digest.hexdigests()
+        self.store(file_path, hashes, stat)
+        return hashes
+
+    def hash_bytes(self, data, algorithms: Iterable[str] = DEFAULT_ALGORITHMS) -> Dict[str, str]:
+        """Hash an in-memory buffer with every requested algorithm, without copying it"""
+        digest = MultiDigest(algorithms)
+        view = memoryview(data)
+        with stage("hashing", view.nbytes):
+            for offset in range(0, view.nbytes, self.chunk_size):
+                digest.update(view[offset:offset + self.chunk_size])
+        return digest.hexdigests()
+
+
+# Process-wide instance so scanners running in the same worker share one cache
+default_hasher = FileHasher()
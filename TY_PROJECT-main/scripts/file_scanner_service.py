@@ -7,13 +7,16 @@ Comprehensive file analysis and security scanning
 import sys
 import json
 import os
-import hashlib
 import magic
 import time
 import re
 from datetime import datetime
 from typing import Dict, List, Any
 
+from content_matcher import ContentMatcher, URL_PATTERN
+from file_hasher import default_hasher
+from scan_profiler import profiled, stage
+
 class FileScanner:
     def __init__(self):
         self.suspicious_extensions = [
@@ -32,7 +35,25 @@ class FileScanner:
         self.image_types = [
             '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.svg', '.webp'
         ]
+        
+        self.suspicious_patterns = [
+            (r'eval\s*\(', "Code Injection"),
+            (r'exec\s*\(', "Code Execution"),
+            (r'system\s*\(', "System Command"),
+            (r'shell_exec', "Shell Execution"),
+            (r'base64_decode', "Base64 Decoding"),
+            (r'document\.write', "DOM Manipulation"),
+            (r'innerHTML', "HTML Injection"),
+            (r'XMLHttpRequest', "AJAX Request"),
+        ]
+        
+        self.content_matcher = ContentMatcher(
+            [(pattern, pattern, re.IGNORECASE) for pattern, _ in self.suspicious_patterns] +
+            [("url", URL_PATTERN, 0)],
+            capture=["url"]
+        )
 
+    @profiled("file_scanner")
     def analyze_file(self, file_path: str) -> Dict[str, Any]:
         """Perform comprehensive file analysis"""
         start_time = time.time()
@@ -47,16 +68,20 @@ class FileScanner:
         hashes = self.calculate_hashes(file_path)
         
         # Detect file type
-        file_type = self.detect_file_type(file_path)
+        with stage("type_detection"):
+            file_type = self.detect_file_type(file_path)
         
         # Security analysis
-        security_analysis = self.perform_security_analysis(file_path, file_ext, file_size)
+        with stage("pattern_matching", file_size):
+            security_analysis = self.perform_security_analysis(file_path, file_ext, file_size)
         
         # Metadata extraction
-        metadata = self.extract_metadata(file_path, file_type)
+        with stage("metadata"):
+            metadata = self.extract_metadata(file_path, file_type)
         
         # Risk assessment
-        risk_assessment = self.assess_risk(file_path, file_ext, file_size, security_analysis)
+        with stage("risk_assessment"):
+            risk_assessment = self.assess_risk(file_path, file_ext, file_size, security_analysis)
         
         scan_time = round(time.time() - start_time, 2)
         
@@ -80,15 +105,7 @@ class FileScanner:
 
     def calculate_hashes(self, file_path: str) -> Dict[str, str]:
         """Calculate file hashes"""
-        hashes = {}
-        
-        with open(file_path, 'rb') as f:
-            content = f.read()
-            hashes['md5'] = hashlib.md5(content).hexdigest()
-            hashes['sha1'] = hashlib.sha1(content).hexdigest()
-            hashes['sha256'] = hashlib.sha256(content).hexdigest()
-        
-        return hashes
+        return default_hasher.hash_file(file_path)
 
     def detect_file_type(self, file_path: str) -> str:
         """Detect actual file type using magic numbers"""
@@ -151,46 +168,36 @@ class FileScanner:
         
         # Content analysis for text files
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            with open(file_path, 'rb') as f:
                 content = f.read(10000)  # Read first 10KB
+            
+            report = self.content_matcher.scan(content)
+            
+            # Check for suspicious patterns
+            for pattern, threat_name in self.suspicious_patterns:
+                if report[pattern]["count"]:
+                    threats.append({
+                        "type": threat_name,
+                        "severity": "medium",
+                        "description": f"Detected {threat_name.lower()} pattern in file content",
+                        "recommendation": "Review file content carefully"
+                    })
+            
+            # Check for URLs
+            urls = report["url"]["matches"]
+            if urls:
+                suspicious_domains = ['bit.ly', 'tinyurl', 'pastebin', 'discord.gg', 't.me']
+                suspicious_urls = [url for url in urls if any(domain in url.lower() for domain in suspicious_domains)]
                 
-                # Check for suspicious patterns
-                suspicious_patterns = [
-                    (r'eval\s*\(', "Code Injection"),
-                    (r'exec\s*\(', "Code Execution"),
-                    (r'system\s*\(', "System Command"),
-                    (r'shell_exec', "Shell Execution"),
-                    (r'base64_decode', "Base64 Decoding"),
-                    (r'document\.write', "DOM Manipulation"),
-                    (r'innerHTML', "HTML Injection"),
-                    (r'XMLHttpRequest', "AJAX Request"),
-                ]
-                
-                for pattern, threat_name in suspicious_patterns:
-                    if re.search(pattern, content, re.IGNORECASE):
-                        threats.append({
-                            "type": threat_name,
-                            "severity": "medium",
-                            "description": f"Detected {threat_name.lower()} pattern in file content",
-                            "recommendation": "Review file content carefully"
-                        })
-                
-                # Check for URLs
-                url_pattern = r'https?://[^\s<>"\']+|www\.[^\s<>"\']+|[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}[^\s<>"\']*'
-                urls = re.findall(url_pattern, content)
-                if urls:
-                    suspicious_domains = ['bit.ly', 'tinyurl', 'pastebin', 'discord.gg', 't.me']
-                    suspicious_urls = [url for url in urls if any(domain in url.lower() for domain in suspicious_domains)]
-                    
-                    if suspicious_urls:
-                        threats.append({
-                            "type": "Suspicious URLs",
-                            "severity": "high",
-                            "description": f"Found {len(suspicious_urls)} suspicious URLs",
-                            "recommendation": "Do not visit these URLs without verification"
-                        })
+                if suspicious_urls:
+                    threats.append({
+                        "type": "Suspicious URLs",
+                        "severity": "high",
+                        "description": f"Found {len(suspicious_urls)} suspicious URLs",
+                        "recommendation": "Do not visit these URLs without verification"
+                    })
         except:
-            pass  # Binary file or encoding issues
+            pass  # Unreadable file
         
         return {
             "threats": threats,
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+MOBICURE Offline Geolocation Database
+Memory-mapped IP range table built from a CSV feed, answering lookups by
+binary search without any network access
+"""
+
+import os
+import sys
+import csv
+import json
+import mmap
+import time
+import array
+import bisect
+import socket
+import struct
+import argparse
+import ipaddress
+import threading
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Tuple
+
+MAGIC = b"MCGEOIP1"
+FORMAT_VERSION = 1
+
+# magic, version, build id, created at, IPv4 ranges, IPv6 ranges, string count,
+# IPv4 offset, IPv6 offset, string table offset
+HEADER = struct.Struct("<8sH16sdQQQQQQ")
+# Byte order the IPv4 columns were written in, checked before casting them
+BYTE_ORDER = b"L" if sys.byteorder == "little" else b"B"
+
+FIELDS = ("country", "region", "city", "asn")
+
+
+def _parse_ip(value: str) -> Tuple[int, int]:
+    """(IP version, address as an integer) from dotted/colon notation or a plain integer"""
+    value = value.strip()
+    if value.isdigit():
+        number = int(value)
+        return (4 if number <= 0xFFFFFFFF else 6), number
+    try:
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, value), "big")
+    except OSError:
+        address = ipaddress.ip_address(value)
+        return address.version, int(address)
+
+
+def _normalize_asn(value: str) -> str:
+    value = (value or "").strip()
+    if value[:2].upper() == "AS":
+        value = value[2:]
+    return f"AS{value}" if value.isdigit() else value
+
+
+def read_geoip_csv(path: str) -> Iterator[Tuple[int, int, int, Tuple[str, ...]]]:
+    """
+    Parse `start_ip,end_ip,country,region,city,asn` rows into
+    (version, start, end, location). Addresses may be dotted/colon notation or
+    integers; a header row is skipped.
+    """
+    # Feeds repeat a small set of locations across many ranges; normalize each once
+    locations: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for line_number, row in enumerate(csv.reader(f), 1):
+            if not row or row[0].startswith("#"):
+                continue
+            try:
+                (version, start), (end_version, end) = _parse_ip(row[0]), _parse_ip(row[1])
+            except (ValueError, IndexError):
+                if line_number == 1:
+                    continue  # header
+                raise ValueError(f"{path}:{line_number}: invalid address range")
+            if version != end_version or end < start:
+                raise ValueError(f"{path}:{line_number}: invalid address range")
+            raw = tuple(row[2:6])
+            location = locations.get(raw)
+            if location is None:
+                values = [value.strip() for value in raw] + [""] * (4 - len(raw))
+                values[3] = _normalize_asn(values[3])
+                location = locations[raw] = tuple(values)
+            yield version, start, end, location
+
+
+class GeoIPWriter:
+    """Collects ranges in compact arrays and writes one table file"""
+
+    def __init__(self):
+        self.v4_starts = array.array("I")
+        self.v4_ends = array.array("I")
+        self.v4_ids = array.array("I")
+        self.v6_ranges: List[Tuple[int, int, int]] = []
+        self._strings: List[bytes] = []
+        self._string_ids: Dict[Tuple[str, ...], int] = {}
+
+    def add(self, version: int, start: int, end: int, location: Tuple[str, ...]):
+        location_id = self._string_ids.get(location)
+        if location_id is None:
+            location_id = self._string_ids[location] = len(self._strings)
+            self._strings.append("\0".join(location).encode("utf-8"))
+        if version == 4:
+            self.v4_starts.append(start)
+            self.v4_ends.append(end)
+            self.v4_ids.append(location_id)
+        else:
+            self.v6_ranges.append((start, end, location_id))
+
+    @staticmethod
+    def _without_overlaps(ranges: Iterable[Tuple[int, int, int]]) -> Tuple[List[Tuple[int, int, int]], int]:
+        """Sort ranges and drop any that overlap the previous one"""
+        kept = []
+        dropped = 0
+        last_end = -1
+        for start, end, location_id in sorted(ranges):
+            if start <= last_end:
+                dropped += 1
+                continue
+            kept.append((start, end, location_id))
+            last_end = end
+        return kept, dropped
+
+    def write(self, path: str) -> Dict[str, int]:
+        starts, ends, ids = self.v4_starts, self.v4_ends, self.v4_ids
+        dropped = 0
+        ordered = all(starts[i] > ends[i - 1] for i in range(1, len(starts)))
+        if not ordered:
+            v4, dropped = self._without_overlaps(zip(starts, ends, ids))
+            starts = array.array("I", (r[0] for r in v4))
+            ends = array.array("I", (r[1] for r in v4))
+            ids = array.array("I", (r[2] for r in v4))
+        v6, v6_dropped = self._without_overlaps(self.v6_ranges)
+        dropped += v6_dropped
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(b"\0" * (HEADER.size + 1))
+            v4_offset = f.tell()
+            v4_offset += -v4_offset % 4
+            f.seek(v4_offset)
+            for column in (starts, ends, ids):
+                column.tofile(f)
+
+            v6_offset = f.tell()
+            for start, _, _ in v6:
+                f.write(start.to_bytes(16, "big"))
+            for _, end, _ in v6:
+                f.write(end.to_bytes(16, "big"))
+            f.write(struct.pack(f"<{len(v6)}I", *(r[2] for r in v6)))
+
+            strings_offset = f.tell()
+            offsets = [0]
+            for entry in self._strings:
+                offsets.append(offsets[-1] + len(entry))
+            f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+            f.write(b"".join(self._strings))
+
+            f.seek(0)
+            f.write(HEADER.pack(
+                MAGIC, FORMAT_VERSION, os.urandom(16), time.time(), len(starts), len(v6),
+                len(self._strings), v4_offset, v6_offset, strings_offset
+            ))
+            f.write(BYTE_ORDER)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return {"ipv4_ranges": len(starts), "ipv6_ranges": len(v6), "locations": len(self._strings),
+                "dropped_overlaps": dropped}
+
+
+class GeoIPTable:
+    """
+    Read-only view of one table file. IPv4 lookups bisect the start column
+    cast in place from the memory map, IPv6 lookups binary search 16-byte keys.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, build_id, self.created_at, self.v4_count, self.v6_count, self.location_count,
+         v4_offset, self._v6_offset, self._strings_offset) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a geolocation table")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} has unsupported format version {version}")
+        if self._mm[HEADER.size:HEADER.size + 1] != BYTE_ORDER:
+            raise ValueError(f"{path} was built on a machine with a different byte order")
+        self.build_id = build_id.hex()
+
+        view = memoryview(self._mm)
+        column = self.v4_count * 4
+        self._v4_starts = view[v4_offset:v4_offset + column].cast("I")
+        self._v4_ends = view[v4_offset + column:v4_offset + 2 * column].cast("I")
+        self._v4_ids = view[v4_offset + 2 * column:v4_offset + 3 * column].cast("I")
+        self._locations: Dict[int, Dict[str, str]] = {}
+
+    def _location(self, location_id: int) -> Dict[str, Any]:
+        location = self._locations.get(location_id)
+        if location is None:
+            start, end = struct.unpack_from("<II", self._mm, self._strings_offset + location_id * 4)
+            blob_offset = self._strings_offset + (self.location_count + 1) * 4
+            values = self._mm[blob_offset + start:blob_offset + end].decode("utf-8").split("\0")
+            location = self._locations[location_id] = {
+                field: value or None for field, value in zip(FIELDS, values)
+            }
+        return dict(location)
+
+    def lookup_v4(self, address: int) -> Optional[Dict[str, Any]]:
+        i = bisect.bisect_right(self._v4_starts, address) - 1
+        if i >= 0 and address <= self._v4_ends[i]:
+            return self._location(self._v4_ids[i])
+        return None
+
+    def lookup_v6(self, address: int) -> Optional[Dict[str, Any]]:
+        key = address.to_bytes(16, "big")
+        mm = self._mm
+        starts = self._v6_offset
+        ends = starts + self.v6_count * 16
+        lo, hi = 0, self.v6_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if mm[starts + mid * 16:starts + mid * 16 + 16] <= key:
+                lo = mid + 1
+            else:
+                hi = mid
+        i = lo - 1
+        if i >= 0 and key <= mm[ends + i * 16:ends + i * 16 + 16]:
+            location_id = struct.unpack_from("<I", mm, ends + self.v6_count * 16 + i * 4)[0]
+            return self._location(location_id)
+        return None
+
+    def lookup(self, ip: str) -> Optional[Dict[str, Any]]:
+        try:
+            return self.lookup_v4(int.from_bytes(socket.inet_pton(socket.AF_INET, ip), "big"))
+        except OSError:
+            pass
+        address = ipaddress.ip_address(ip)
+        if address.version == 4:
+            return self.lookup_v4(int(address))
+        if address.ipv4_mapped is not None:
+            return self.lookup_v4(int(address.ipv4_mapped))
+        return self.lookup_v6(int(address))
+
+
+class GeoIPDatabase:
+    """
+    Geolocation table at a fixed path, reopened when the file is replaced by
+    a new build. The file is checked at most once per refresh_interval seconds.
+    """
+
+    def __init__(self, path: Optional[str] = None, refresh_interval: float = 30.0):
+        self.path = path or default_path()
+        self.refresh_interval = refresh_interval
+        self._table: Optional[GeoIPTable] = None
+        self._stamp = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.refresh(force=True)
+
+    @property
+    def available(self) -> bool:
+        return self._table is not None
+
+    def refresh(self, force: bool = False) -> bool:
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.refresh_interval:
+            return False
+        with self._lock:
+            self._checked_at = now
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                changed = self._table is not None
+                self._table, self._stamp = None, None
+                return changed
+            stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if stamp == self._stamp:
+                return False
+            self._table, self._stamp = GeoIPTable(self.path), stamp
+            return True
+
+    def describe(self) -> Dict[str, Any]:
+        self.refresh()
+        table = self._table
+        if table is None:
+            return {"path": self.path, "available": False}
+        return {
+            "path": self.path,
+            "available": True,
+            "build_id": table.build_id,
+            "created_at": table.created_at,
+            "ipv4_ranges": table.v4_count,
+            "ipv6_ranges": table.v6_count,
+            "locations": table.location_count,
+        }
+
+    def lookup(self, ip: str) -> Optional[Dict[str, Any]]:
+        """{"country", "region", "city", "asn"} for the address, or None if it is not covered"""
+        self.refresh()
+        table = self._table
+        if table is None:
+            return None
+        try:
+            return table.lookup(ip)
+        except ValueError:
+            return None
+
+
+def default_path() -> str:
+    return os.environ.get(
+        "MOBICURE_GEOIP_DB",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "geoip", "ranges.geoip")
+    )
+
+
+def build(sources: Iterable[str], path: str) -> Dict[str, int]:
+    """Bulk-build a table from one or more CSV feeds"""
+    writer = GeoIPWriter()
+    for source in sources:
+        for version, start, end, location in read_geoip_csv(source):
+            writer.add(version, start, end, location)
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    return writer.write(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query the MOBICURE offline geolocation table")
+    parser.add_argument("--path", default=default_path(),
+                        help="Table file (default: $MOBICURE_GEOIP_DB or scripts/geoip/ranges.geoip)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_command = commands.add_parser("build", help="Import CSV feeds: start_ip,end_ip,country,region,city,asn")
+    build_command.add_argument("sources", nargs="+")
+
+    commands.add_parser("info", help="Describe the installed table")
+
+    lookup = commands.add_parser("lookup", help="Look up addresses")
+    lookup.add_argument("addresses", nargs="+")
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == "build":
+            start = time.perf_counter()
+            result = build(args.sources, args.path)
+            result["path"] = args.path
+            result["build_seconds"] = round(time.perf_counter() - start, 3)
+        elif args.command == "info":
+            result = GeoIPDatabase(args.path).describe()
+        else:
+            db = GeoIPDatabase(args.path)
+            result = {address: db.lookup(address) for address in args.addresses}
+        print(json.dumps(result, indent=2))
+    except Exception as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
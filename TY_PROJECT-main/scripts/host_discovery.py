@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+MOBICURE Host Discovery
+Fork-free network sweep: ICMP echo over a single socket, TCP connect
+fallback and the kernel ARP cache
+"""
+
+import os
+import time
+import errno
+import select
+import socket
+import struct
+import itertools
+import ipaddress
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Tuple
+
+from port_probe import PortProbeEngine
+
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+ICMP_PAYLOAD = b"MOBICURE"
+
+# Ports whose answer (open or refused) proves a host is up when ICMP is unavailable
+DISCOVERY_PORTS = (80, 443, 22, 445, 139, 3389, 53, 8080)
+
+
+def _checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def read_arp_table(path: str = "/proc/net/arp") -> Dict[str, str]:
+    """IPv4 address -> MAC for complete entries in the kernel ARP cache (Linux only)"""
+    entries = {}
+    try:
+        with open(path, "r") as f:
+            next(f, None)  # header
+            for line in f:
+                fields = line.split()
+                if len(fields) < 4:
+                    continue
+                ip, _, flags, mac = fields[:4]
+                # 0x2 = ATF_COM, the neighbour answered
+                if int(flags, 16) & 0x2 and mac != "00:00:00:00:00:00":
+                    entries[ip] = mac.lower()
+    except (OSError, ValueError):
+        pass
+    return entries
+
+
+class HostDiscovery:
+    """
+    Sweeps an IPv4 range without spawning processes. ICMP echo requests are
+    paced out of one socket (an unprivileged datagram ICMP socket where the
+    kernel allows it, otherwise a raw socket) while replies are read from the
+    same socket and matched by source address. If neither ICMP socket can be
+    opened, hosts are found with TCP connects to a few common ports instead,
+    chunk_hosts addresses at a time.
+    """
+
+    def __init__(self, timeout: float = 1.0, rate: int = 20000, retries: int = 1,
+                 probe_engine: Optional[PortProbeEngine] = None, tcp_ports: Iterable[int] = DISCOVERY_PORTS,
+                 tcp_deadline: Optional[float] = None, chunk_hosts: int = 1024):
+        self.timeout = timeout
+        self.rate = rate
+        self.retries = retries
+        self.probe_engine = probe_engine or PortProbeEngine(timeout=timeout)
+        self.tcp_ports = list(tcp_ports)
+        self.tcp_deadline = tcp_deadline
+        self.chunk_hosts = chunk_hosts
+        self._ident = os.getpid() & 0xFFFF
+
+    def _open_icmp_socket(self) -> Optional[Tuple[socket.socket, bool]]:
+        """(socket, is_raw), or None if this process may not send ICMP"""
+        for sock_type, raw in ((socket.SOCK_DGRAM, False), (socket.SOCK_RAW, True)):
+            try:
+                sock = socket.socket(socket.AF_INET, sock_type, socket.IPPROTO_ICMP)
+            except OSError:
+                continue
+            sock.setblocking(False)
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+            except OSError:
+                pass
+            return sock, raw
+        return None
+
+    def _echo_request(self, sequence: int) -> bytes:
+        header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, self._ident, sequence)
+        checksum = _checksum(header + ICMP_PAYLOAD)
+        return struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksum, self._ident, sequence) + ICMP_PAYLOAD
+
+    def icmp_stream(self, addresses: Iterable[str], stop: Optional[threading.Event] = None
+                    ) -> Optional[Iterator[Tuple[str, float]]]:
+        """
+        Generator of (address, round-trip seconds) for hosts answering echo
+        requests, in reply order, or None without ICMP access. Addresses are
+        consumed lazily and only requests sent within the last timeout seconds
+        are tracked, so memory is bounded by rate * timeout, not range size.
+        Sending ends as soon as stop is set, whether or not replies arrive.
+        """
+        opened = self._open_icmp_socket()
+        if opened is None:
+            return None
+        return self._icmp_replies(opened[0], opened[1], iter(addresses), stop)
+
+    def _icmp_replies(self, sock: socket.socket, raw: bool, addresses: Iterator[str],
+                      stop: Optional[threading.Event] = None) -> Iterator[Tuple[str, float]]:
+        interval = 1.0 / self.rate if self.rate else 0.0
+        # address -> (sent at, attempt), oldest first
+        in_flight: "OrderedDict[str, Tuple[float, int]]" = OrderedDict()
+        retry: deque = deque()
+        exhausted = False
+        sequence = 0
+        next_send = time.monotonic()
+        replies: List[Tuple[str, float]] = []
+
+        try:
+            while True:
+                if stop is not None and stop.is_set():
+                    return
+                now = time.monotonic()
+                while in_flight:
+                    address, (sent_at, attempt) = next(iter(in_flight.items()))
+                    if sent_at + self.timeout > now:
+                        break
+                    del in_flight[address]
+                    if attempt < self.retries:
+                        retry.append((address, attempt + 1))
+
+                while next_send <= now:
+                    if retry:
+                        address, attempt = retry[0]
+                    elif not exhausted:
+                        address = next(addresses, None)
+                        if address is None:
+                            exhausted = True
+                            break
+                        attempt = 0
+                        retry.appendleft((address, attempt))
+                    else:
+                        break
+                    try:
+                        sock.sendto(self._echo_request(sequence), (address, 0))
+                    except OSError as e:
+                        if e.errno in (errno.ENOBUFS, errno.EAGAIN, errno.EWOULDBLOCK):
+                            break  # send queue full; read replies and retry this address
+                        retry.popleft()  # unreachable or not allowed (e.g. broadcast); skip it
+                        continue
+                    retry.popleft()
+                    sequence = (sequence + 1) & 0xFFFF
+                    in_flight.pop(address, None)
+                    in_flight[address] = (now, attempt)
+                    next_send += interval
+                    if next_send < now - 0.01:
+                        next_send = now  # do not burst to catch up after a stall
+
+                if exhausted and not retry and not in_flight:
+                    return
+
+                if in_flight and (exhausted and not retry):
+                    wait = next(iter(in_flight.values()))[0] + self.timeout - now
+                else:
+                    wait = next_send - now
+                ready, _, _ = select.select([sock], [], [], min(max(0.0, wait), 0.05))
+                if ready:
+                    self._read_replies(sock, raw, in_flight, replies)
+                    for reply in replies:
+                        yield reply
+                    replies.clear()
+        finally:
+            sock.close()
+
+    def _read_replies(self, sock: socket.socket, raw: bool, in_flight: Dict[str, Tuple[float, int]],
+                      replies: List[Tuple[str, float]]):
+        while True:
+            try:
+                data, (source, _) = sock.recvfrom(2048)
+            except OSError:
+                return  # includes BlockingIOError once the queue is drained
+            received = time.monotonic()
+            icmp = data[(data[0] & 0x0F) * 4:] if raw else data
+            if len(icmp) < 8:
+                continue
+            icmp_type, _, _, ident, _ = struct.unpack("!BBHHH", icmp[:8])
+            if icmp_type != ICMP_ECHO_REPLY:
+                continue
+            # Raw sockets see every echo reply on the host; datagram sockets are filtered by the kernel
+            if raw and ident != self._ident:
+                continue
+            sent = in_flight.pop(source, None)
+            if sent is not None:
+                replies.append((source, received - sent[0]))
+
+    def tcp_stream(self, addresses: Iterable[str], stop: Optional[threading.Event] = None
+                   ) -> Iterator[Tuple[str, float]]:
+        """
+        Generator of (address, round-trip seconds) for hosts that accepted or
+        refused a connection, probed chunk_hosts addresses at a time until
+        stop is set
+        """
+        addresses = iter(addresses)
+        while stop is None or not stop.is_set():
+            chunk = list(itertools.islice(addresses, self.chunk_hosts))
+            if not chunk:
+                return
+            result = self.probe_engine.scan(chunk, self.tcp_ports, deadline=self.tcp_deadline)
+            for address in chunk:
+                rtt_ms = result["rtt_ms"].get(address)
+                if rtt_ms is not None:
+                    yield address, rtt_ms / 1000
+
+    def iter_alive(self, addresses: Iterable[str], stop: Optional[threading.Event] = None
+                   ) -> Tuple[Iterator[Tuple[str, float]], str]:
+        """
+        (generator of (address, round-trip seconds) for answering hosts, method
+        used); probing stops between send batches once stop is set
+        """
+        addresses = iter(addresses)
+        stream = self.icmp_stream(addresses, stop)
+        if stream is not None:
+            return stream, "icmp"
+        return self.tcp_stream(addresses, stop), "tcp"
+
+    def iter_discover(self, network_range: str, stop: Optional[threading.Event] = None
+                      ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Yield (ip, {"method", "rtt_ms", "mac"}) for live hosts as they answer.
+        Addresses are generated lazily, so /8-sized ranges use constant memory.
+        Hosts only known from the ARP cache are yielded at the end.
+        """
+        network = ipaddress.IPv4Network(network_range, strict=False)
+        addresses = (str(ip) for ip in network.hosts())
+        arp = {ip: mac for ip, mac in read_arp_table().items() if ipaddress.IPv4Address(ip) in network}
+
+        stream, method = self.iter_alive(addresses, stop)
+
+        try:
+            for address, rtt in stream:
+                if stop is not None and stop.is_set():
+                    return
+                yield address, {"method": method, "rtt_ms": round(rtt * 1000, 3), "mac": arp.pop(address, None)}
+        finally:
+            stream.close()
+
+        for address, mac in sorted(arp.items(), key=lambda item: ipaddress.IPv4Address(item[0])):
+            if stop is not None and stop.is_set():
+                return
+            yield address, {"method": "arp", "rtt_ms": None, "mac": mac}
+
+    def discover(self, network_range: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Live hosts in the range, in address order:
+        {ip: {"method": "icmp" | "tcp" | "arp", "rtt_ms": float | None, "mac": str | None}}
+        """
+        hosts = dict(self.iter_discover(network_range))
+        return {ip: hosts[ip] for ip in sorted(hosts, key=lambda ip: ipaddress.IPv4Address(ip))}
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+MOBICURE Lookup Cache
+TTL cache for DNS answers and WHOIS records that collapses concurrent
+lookups of the same key into a single network request
+"""
+
+import time
+import threading
+import concurrent.futures
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Hashable, Optional, Tuple
+
+from scan_profiler import stage
+
+
+class TTLCache:
+    """
+    Bounded LRU of values that each carry their own time to live. Failed
+    lookups are remembered for negative_ttl seconds and re-raised. While a key
+    is being fetched, other callers asking for it wait for that fetch instead
+    of starting their own.
+    """
+
+    def __init__(self, max_entries: int = 4096, negative_ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl
+        # key -> (expires_at, value, error)
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, concurrent.futures.Future] = {}
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+    def get_or_fetch(self, key: Hashable, fetch: Callable[[], Tuple[Any, float]]) -> Any:
+        """Return the cached value for key, or call fetch() -> (value, ttl_seconds)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value, error = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.counters["hits"] += 1
+                    if error is not None:
+                        raise error
+                    return value
+                del self._entries[key]
+
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = concurrent.futures.Future()
+                self.counters["misses"] += 1
+            else:
+                self.counters["coalesced"] += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            value, ttl = fetch()
+        except Exception as e:
+            self._store(key, None, e, self.negative_ttl)
+            self.counters["errors"] += 1
+            future.set_exception(e)
+            raise
+        else:
+            self._store(key, value, None, ttl)
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Cached value for key without fetching, or default if absent, expired or failed"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic() or entry[2] is not None:
+                self.counters["misses"] += 1
+                return default
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any, ttl: float):
+        """Store a value fetched outside get_or_fetch, e.g. by an async resolver"""
+        self._store(key, value, None, ttl)
+
+    def _store(self, key: Hashable, value: Any, error: Any, ttl: float):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value, error)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.counters)
+            stats["entries"] = len(self._entries)
+            stats["inflight"] = len(self._inflight)
+            return stats
+
+
+class DomainLookupCache:
+    """
+    DNS answers cached for their record TTL (clamped to [min_ttl, max_ttl]) and
+    WHOIS records cached for whois_ttl seconds.
+    """
+
+    def __init__(self, min_ttl: float = 30.0, max_ttl: float = 24 * 3600, whois_ttl: float = 6 * 3600,
+                 negative_ttl: float = 60.0, max_entries: int = 4096):
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.whois_ttl = whois_ttl
+        self.cache = TTLCache(max_entries=max_entries, negative_ttl=negative_ttl)
+
+    @staticmethod
+    def _normalize(domain: str) -> str:
+        return (domain or "").strip().rstrip(".").lower()
+
+    def resolve(self, domain: str, rdtype: str = "A", timeout: Optional[float] = None) -> Tuple[str, ...]:
+        """
+        Record strings for a DNS query, as dns.resolver.resolve would return
+        them. timeout bounds the whole query, retries included.
+        """
+        domain = self._normalize(domain)
+
+        def fetch():
+            # Imported here so the cache itself has no hard dependency on dnspython
+            import dns.resolver
+            with stage("dns"):
+                answer = dns.resolver.resolve(domain, rdtype, lifetime=timeout)
+            ttl = answer.rrset.ttl if answer.rrset is not None else self.cache.negative_ttl
+            return tuple(str(record) for record in answer), min(self.max_ttl, max(self.min_ttl, ttl))
+
+        return self.cache.get_or_fetch(("dns", domain, rdtype.upper()), fetch)
+
+    def whois(self, domain: str, timeout: float = 10):
+        """WHOIS record for a domain, as returned by whois.whois"""
+        domain = self._normalize(domain)
+
+        def fetch():
+            import whois
+            with stage("whois"):
+                # Socket errors and timeouts raise, so they are cached briefly
+                # as failures instead of as an empty record for whois_ttl
+                return whois.whois(domain, timeout=timeout, ignore_socket_errors=False), self.whois_ttl
+
+        return self.cache.get_or_fetch(("whois", domain), fetch)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
+
+
+# Process-wide instance so scanners running in the same worker share lookups
+default_lookup_cache = DomainLookupCache()
@@ -6,17 +6,23 @@ Advanced malware detection using multiple analysis techniques
 
 import sys
 import json
-import hashlib
 import os
 import time
 import re
 import zipfile
 import tempfile
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterable, Tuple
+
+from content_matcher import ContentMatcher, StreamingScan, BASE64_PATTERN, URL_PATTERN
+from file_hasher import MultiDigest, default_hasher
+from result_cache import ruleset_fingerprint
+from signature_db import SignatureDatabase, default_directory
+from scan_profiler import profiled, stage
 
 class MalwareScanner:
     def __init__(self):
+        # Built-in fallback signatures; the indexed database is layered on top
         self.threat_signatures = {
             # Known malware hashes (MD5)
             "d41d8cd98f00b204e9800998ecf8427e": {"name": "Empty File", "severity": "low"},
@@ -24,6 +30,9 @@ class MalwareScanner:
             "098f6bcd4621d373cade4e832627b4f6": {"name": "Suspicious Script", "severity": "medium"},
         }
         
+        # Memory-mapped MD5/SHA1/SHA256 index (built with signature_db.py)
+        self.signature_db = SignatureDatabase(default_directory(), builtin=self.threat_signatures)
+        
         self.suspicious_patterns = [
             (r'eval\s*\(', "Code Injection", "high"),
             (r'exec\s*\(', "Code Execution", "high"),
@@ -37,6 +46,22 @@ class MalwareScanner:
             (r'download|wget|curl', "Network Download", "medium"),
         ]
         
+        self.suspicious_url_markers = ['bit.ly', 'tinyurl', 'pastebin', 'discord', 'telegram']
+        
+        # One compiled engine for every content pattern, keyed by the pattern itself.
+        # Only suspicious URLs are kept so memory does not grow with the file.
+        self.content_matcher = ContentMatcher(
+            [(pattern, pattern, re.IGNORECASE) for pattern, _, _ in self.suspicious_patterns] +
+            [("base64", BASE64_PATTERN, 0), ("url", URL_PATTERN, 0)],
+            capture=["url"],
+            capture_filter=lambda key, url: any(sus in url.lower() for sus in self.suspicious_url_markers)
+        )
+        
+        self._pattern_fingerprint = ruleset_fingerprint(self.suspicious_patterns, self.suspicious_url_markers)
+        
+        # Overlap carried between streamed chunks (chunk size comes from the shared hasher)
+        self.chunk_overlap = 64 * 1024
+        
         self.engines = [
             {"name": "MOBICURE Engine", "version": "2.1.0"},
             {"name": "Signature Scanner", "version": "1.8.3"},
@@ -47,17 +72,32 @@ class MalwareScanner:
 
     def calculate_file_hash(self, file_path: str) -> Dict[str, str]:
         """Calculate multiple hashes for the file"""
-        hashes = {}
+        return default_hasher.hash_file(file_path)
+
+    def stream_file(self, file_path: str, hash_names: Iterable[str] = ('md5', 'sha1', 'sha256'),
+                    match_content: bool = True) -> Tuple[Dict[str, str], Dict[str, Any]]:
+        """Feed the file chunk by chunk to the hashers and the pattern matcher together"""
+        hash_names = tuple(hash_names)
+        hashes = default_hasher.cached(file_path, hash_names) if hash_names else {}
+        if not match_content:
+            return hashes if hashes is not None else default_hasher.hash_file(file_path, hash_names), {}
         
-        with open(file_path, 'rb') as f:
-            content = f.read()
-            hashes['md5'] = hashlib.md5(content).hexdigest()
-            hashes['sha1'] = hashlib.sha1(content).hexdigest()
-            hashes['sha256'] = hashlib.sha256(content).hexdigest()
+        stat = os.stat(file_path)
+        digest = MultiDigest(hash_names) if hashes is None else None
+        stream = StreamingScan(self.content_matcher, overlap=self.chunk_overlap)
+        for chunk in default_hasher.iter_chunks(file_path):
+            if digest is not None:
+                with stage("hashing", chunk.nbytes):
+                    digest.update(chunk)
+            with stage("pattern_matching", chunk.nbytes):
+                stream.feed(chunk)
         
-        return hashes
+        if digest is not None:
+            hashes = digest.hexdigests()
+            default_hasher.store(file_path, hashes, stat)
+        return hashes, stream.finish()
 
-    def analyze_file_content(self, file_path: str) -> Dict[str, Any]:
+    def analyze_file_content(self, file_path: str, report: Dict[str, Any] = None) -> Dict[str, Any]:
         """Analyze file content for suspicious patterns"""
         threats = []
         suspicious_processes = []
@@ -66,54 +106,52 @@ class MalwareScanner:
         registry_changes = []
         
         try:
-            # Try to read as text first
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-                
-                # Check for suspicious patterns
-                for pattern, threat_name, severity in self.suspicious_patterns:
-                    matches = re.findall(pattern, content, re.IGNORECASE)
-                    if matches:
-                        threats.append({
-                            "name": threat_name,
-                            "type": "Pattern Detection",
-                            "severity": severity,
-                            "description": f"Detected {len(matches)} instances of {threat_name.lower()}",
-                            "location": f"File content (pattern: {pattern})"
-                        })
-                        
-                        # Add to behavior analysis
-                        if "command" in threat_name.lower() or "shell" in threat_name.lower():
-                            suspicious_processes.append(f"Potential command execution: {threat_name}")
-                        if "download" in threat_name.lower() or "network" in threat_name.lower():
-                            network_activity.append(f"Network activity detected: {threat_name}")
-                        if "registry" in threat_name.lower():
-                            registry_changes.append(f"Registry access: {threat_name}")
-                
-                # Check for encoded content
-                if len(re.findall(r'[A-Za-z0-9+/]{50,}={0,2}', content)) > 5:
+            # Single streaming pass over the raw bytes for every pattern
+            if report is None:
+                _, report = self.stream_file(file_path, hash_names=())
+            
+            # Check for suspicious patterns
+            for pattern, threat_name, severity in self.suspicious_patterns:
+                hits = report[pattern]
+                if hits["count"]:
                     threats.append({
-                        "name": "Base64 Encoded Content",
-                        "type": "Encoding Detection",
-                        "severity": "medium",
-                        "description": "File contains large amounts of base64 encoded data",
-                        "location": "File content"
+                        "name": threat_name,
+                        "type": "Pattern Detection",
+                        "severity": severity,
+                        "description": f"Detected {hits['count']} instances of {threat_name.lower()}",
+                        "location": f"File content (pattern: {pattern})",
+                        "offsets": hits["offsets"][:10]
                     })
-                
-                # Check for suspicious URLs
-                url_pattern = r'https?://[^\s<>"\']+|www\.[^\s<>"\']+|[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}[^\s<>"\']*'
-                urls = re.findall(url_pattern, content)
-                if urls:
-                    suspicious_urls = [url for url in urls if any(sus in url.lower() for sus in ['bit.ly', 'tinyurl', 'pastebin', 'discord', 'telegram'])]
-                    if suspicious_urls:
-                        threats.append({
-                            "name": "Suspicious URLs",
-                            "type": "Network Threat",
-                            "severity": "high",
-                            "description": f"Found {len(suspicious_urls)} suspicious URLs",
-                            "location": "Embedded URLs"
-                        })
-                        network_activity.extend([f"Suspicious URL: {url}" for url in suspicious_urls[:3]])
+                    
+                    # Add to behavior analysis
+                    if "command" in threat_name.lower() or "shell" in threat_name.lower():
+                        suspicious_processes.append(f"Potential command execution: {threat_name}")
+                    if "download" in threat_name.lower() or "network" in threat_name.lower():
+                        network_activity.append(f"Network activity detected: {threat_name}")
+                    if "registry" in threat_name.lower():
+                        registry_changes.append(f"Registry access: {threat_name}")
+            
+            # Check for encoded content
+            if report["base64"]["count"] > 5:
+                threats.append({
+                    "name": "Base64 Encoded Content",
+                    "type": "Encoding Detection",
+                    "severity": "medium",
+                    "description": "File contains large amounts of base64 encoded data",
+                    "location": "File content"
+                })
+            
+            # Check for suspicious URLs
+            suspicious_urls = report["url"]["matches"]
+            if suspicious_urls:
+                threats.append({
+                    "name": "Suspicious URLs",
+                    "type": "Network Threat",
+                    "severity": "high",
+                    "description": f"Found {len(suspicious_urls)} suspicious URLs",
+                    "location": "Embedded URLs"
+                })
+                network_activity.extend([f"Suspicious URL: {url}" for url in suspicious_urls[:3]])
         
         except Exception as e:
             # Binary file or read error
@@ -149,6 +187,13 @@ class MalwareScanner:
             }
         }
 
+    @property
+    def ruleset_version(self) -> str:
+        """Changes whenever signatures or patterns change, invalidating cached results"""
+        self.signature_db.refresh()
+        return ruleset_fingerprint(self.signature_db.version, self._pattern_fingerprint)
+
+    @profiled("malware_scanner")
     def scan_file(self, file_path: str) -> Dict[str, Any]:
         """Perform comprehensive malware scan"""
         start_time = time.time()
@@ -159,24 +204,26 @@ class MalwareScanner:
         file_size = file_stat.st_size
         file_type = self.get_file_type(file_path)
         
-        # Calculate hashes
-        hashes = self.calculate_file_hash(file_path)
+        # Calculate hashes and match content in one streaming read
+        hashes, content_report = self.stream_file(file_path)
         
         # Analyze content
-        analysis = self.analyze_file_content(file_path)
+        with stage("content_analysis"):
+            analysis = self.analyze_file_content(file_path, content_report)
         
         # Check against known malware hashes
         hash_threats = []
-        for hash_type, hash_value in hashes.items():
-            if hash_value in self.threat_signatures:
-                sig = self.threat_signatures[hash_value]
-                hash_threats.append({
-                    "name": f"Known Malware: {sig['name']}",
-                    "type": "Hash Detection",
-                    "severity": sig['severity'],
-                    "description": f"File matches known malware signature ({hash_type.upper()})",
-                    "location": f"{hash_type.upper()} hash"
-                })
+        with stage("signature_lookup"):
+            for hash_type, hash_value in hashes.items():
+                sig = self.signature_db.lookup(hash_type, hash_value)
+                if sig is not None:
+                    hash_threats.append({
+                        "name": f"Known Malware: {sig['name']}",
+                        "type": "Hash Detection",
+                        "severity": sig['severity'],
+                        "description": f"File matches known malware signature ({hash_type.upper()})",
+                        "location": f"{hash_type.upper()} hash"
+                    })
         
         # Combine all threats
         all_threats = hash_threats + analysis["threats"]
@@ -222,6 +269,24 @@ class MalwareScanner:
             "service": "MOBICURE Malware Scanner v2.1.0"
         }
 
+    def refresh_cached_result(self, result: Dict[str, Any], file_path: str) -> Dict[str, Any]:
+        """
+        Update a cached scan_file() result of identical content for this
+        path: the file type and the risk it adds come from the extension,
+        and the timestamps from this request
+        """
+        file_type = self.get_file_type(file_path)
+        risk_score = self.calculate_risk_score(result["threats"], result["fileSize"], file_type)
+        result.update({
+            "fileName": os.path.basename(file_path),
+            "fileType": file_type,
+            "riskScore": risk_score,
+            "threatLevel": self.determine_threat_level(risk_score, len(result["threats"])),
+            "scanTime": 0.0,
+            "timestamp": datetime.now().isoformat()
+        })
+        return result
+
     def get_file_type(self, file_path: str) -> str:
         """Determine file type"""
         _, ext = os.path.splitext(file_path)
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+MOBICURE Network Inventory
+Persistent device inventory with adaptive re-probing that reports only
+what changed between checks
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import sqlite3
+import argparse
+import ipaddress
+import threading
+from datetime import datetime
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Set
+
+from host_discovery import read_arp_table
+
+
+class DeviceInventory:
+    """
+    Known devices keyed by IP, kept in memory and written through to SQLite
+    when db_path is set so monitoring resumes where it stopped after a restart
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.devices: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._db = None
+
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS devices (
+                    ip TEXT PRIMARY KEY,
+                    network TEXT NOT NULL,
+                    record TEXT NOT NULL
+                )
+            """)
+            self._db.commit()
+
+    def load(self, network_range: str):
+        """Read the devices previously seen in a range"""
+        if self._db is None:
+            return
+        with self._lock:
+            for ip, record in self._db.execute("SELECT ip, record FROM devices WHERE network = ?", (network_range,)):
+                self.devices[ip] = json.loads(record)
+
+    def save(self, network_range: str, ips: Iterable[str]):
+        """Write the given devices back to disk in one transaction"""
+        if self._db is None:
+            return
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO devices VALUES (?, ?, ?)",
+                [(ip, network_range, json.dumps(self.devices[ip])) for ip in set(ips) if ip in self.devices]
+            )
+            self._db.commit()
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(self.devices[ip]) for ip in sorted(self.devices, key=ipaddress.ip_address)]
+
+
+class NetworkMonitor:
+    """
+    Continuous monitoring of one range. Every known device has its own check
+    interval: it starts at min_interval, doubles after each check that finds
+    nothing new (up to max_interval) and drops back to min_interval whenever
+    the device changes or fails to answer. A check is a liveness probe plus a
+    port probe of only the devices that are due, and a full discovery sweep
+    (cheap with ICMP) runs every sweep_interval to pick up new devices, so a
+    stable network costs a small fraction of repeated full scans. A device
+    that misses missing_after checks in a row is reported gone.
+    """
+
+    def __init__(self, scanner, network_range: str, db_path: Optional[str] = None,
+                 min_interval: float = 60.0, max_interval: float = 3600.0,
+                 sweep_interval: float = 900.0, missing_after: int = 2):
+        self.scanner = scanner
+        self.network_range = str(ipaddress.IPv4Network(network_range, strict=False))
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.sweep_interval = sweep_interval
+        self.missing_after = missing_after
+        self.inventory = DeviceInventory(db_path)
+        self.inventory.load(self.network_range)
+        self.next_sweep = 0.0
+        self.stats = {"sweeps": 0, "checks": 0, "port_probes": 0, "events": 0}
+
+    @staticmethod
+    def _event(event: str, record: Dict[str, Any], **details) -> Dict[str, Any]:
+        diff = {"event": event, "ip": record["ip"], "timestamp": datetime.now().isoformat()}
+        diff.update(details)
+        return diff
+
+    def _schedule(self, device: Dict[str, Any], now: float, changed: bool):
+        if changed:
+            device["interval"] = self.min_interval
+        else:
+            device["interval"] = min(self.max_interval, device["interval"] * 2)
+        device["next_check"] = now + device["interval"]
+
+    def _probe(self, ips: List[str]) -> Dict[str, Any]:
+        """Open ports and hostnames for a batch of live hosts"""
+        port_scan = self.scanner.probe_engine.scan(ips, self.scanner.ports, deadline=self.scanner.port_scan_deadline)
+        hostnames = asyncio.run(self.scanner.reverse_dns.resolve_many(ips))
+        self.stats["port_probes"] += port_scan["probes"]
+        return {"open_ports": port_scan["open_ports"], "complete": port_scan["complete"], "hostnames": hostnames}
+
+    def _sweep(self, now: float, stop: Optional[threading.Event] = None) -> List[Dict[str, Any]]:
+        """Discover the whole range; only hosts not currently online are probed"""
+        self.stats["sweeps"] += 1
+        devices = self.inventory.devices
+        found = {}
+        for ip, discovery in self.scanner.discovery.iter_discover(self.network_range, stop):
+            device = devices.get(ip)
+            if device is not None and device["status"] == "online":
+                device["last_seen"] = now
+                device["missed"] = 0
+                if discovery["mac"]:
+                    device["mac"] = discovery["mac"]
+            else:
+                found[ip] = discovery
+        if not found:
+            return []
+
+        probe = self._probe(list(found))
+        events = []
+        for ip, discovery in found.items():
+            device = devices.get(ip)
+            event = "device_returned" if device is not None else "device_new"
+            device = devices[ip] = {
+                "ip": ip,
+                "hostname": probe["hostnames"].get(ip),
+                "open_ports": probe["open_ports"].get(ip, []),
+                "mac": discovery["mac"],
+                "status": "online",
+                "first_seen": device["first_seen"] if device is not None else now,
+                "last_seen": now,
+                "missed": 0,
+                "interval": self.min_interval,
+                "next_check": now + self.min_interval,
+            }
+            events.append(self._event(event, device, device=dict(device)))
+        return events
+
+    def _answering(self, silent: List[Dict[str, Any]]) -> Set[str]:
+        """
+        Devices among those that ignored the liveness probe that are still up
+        by the other means a sweep accepts: a complete ARP entry (the probe
+        just made the kernel re-resolve the address, so a departed device's
+        entry fails) with the MAC last seen, or a TCP answer on a known port
+        """
+        arp = read_arp_table()
+        alive = {
+            device["ip"] for device in silent
+            if device["ip"] in arp and device["mac"] in (None, arp[device["ip"]])
+        }
+        tcp = [device for device in silent if device["ip"] not in alive and device["open_ports"]]
+        if tcp:
+            result = self.scanner.probe_engine.scan(
+                [device["ip"] for device in tcp], sorted({port for device in tcp for port in device["open_ports"]}),
+                deadline=self.scanner.port_scan_deadline
+            )
+            alive.update(ip for ip, rtt_ms in result["rtt_ms"].items() if rtt_ms is not None)
+        return alive
+
+    def _check(self, due: List[Dict[str, Any]], now: float) -> List[Dict[str, Any]]:
+        """Liveness and port re-probe of the devices whose check is due"""
+        self.stats["checks"] += len(due)
+        stream, _ = self.scanner.discovery.iter_alive(device["ip"] for device in due)
+        alive = {ip for ip, _ in stream}
+        silent = [device for device in due if device["ip"] not in alive]
+        if silent:
+            alive |= self._answering(silent)
+
+        events = []
+        live = [device for device in due if device["ip"] in alive]
+        for device in due:
+            if device["ip"] in alive:
+                continue
+            device["missed"] += 1
+            if device["missed"] >= self.missing_after:
+                device["status"] = "gone"
+                device["next_check"] = None
+                events.append(self._event("device_gone", device, last_seen=device["last_seen"]))
+            else:
+                self._schedule(device, now, changed=True)
+        if not live:
+            return events
+
+        probe = self._probe([device["ip"] for device in live])
+        for device in live:
+            ip = device["ip"]
+            changed = False
+            device["last_seen"] = now
+            device["missed"] = 0
+
+            ports = probe["open_ports"].get(ip, [])
+            previous = set(device["open_ports"])
+            for port in sorted(set(ports) - previous):
+                events.append(self._event("port_opened", device, port=port))
+                changed = True
+            # A probe cut short by the deadline cannot prove a port closed
+            if probe["complete"]:
+                for port in sorted(previous - set(ports)):
+                    events.append(self._event("port_closed", device, port=port))
+                    changed = True
+                device["open_ports"] = sorted(ports)
+            else:
+                device["open_ports"] = sorted(previous | set(ports))
+
+            hostname = probe["hostnames"].get(ip)
+            if hostname != device["hostname"]:
+                events.append(self._event("hostname_changed", device, previous=device["hostname"], hostname=hostname))
+                device["hostname"] = hostname
+                changed = True
+
+            self._schedule(device, now, changed)
+        return events
+
+    def poll(self, now: Optional[float] = None, stop: Optional[threading.Event] = None) -> List[Dict[str, Any]]:
+        """Run whatever is due now and return the resulting change events; stop cuts a sweep short"""
+        now = time.time() if now is None else now
+        events = []
+        touched = []
+        if now >= self.next_sweep:
+            events += self._sweep(now, stop)
+            self.next_sweep = now + self.sweep_interval
+            touched += list(self.inventory.devices)
+
+        due = [
+            device for device in self.inventory.devices.values()
+            if device["status"] == "online" and device["next_check"] is not None and device["next_check"] <= now
+        ]
+        if due:
+            events += self._check(due, now)
+            touched += [device["ip"] for device in due]
+
+        self.inventory.save(self.network_range, touched)
+        self.stats["events"] += len(events)
+        return events
+
+    def next_due(self) -> float:
+        """Time of the next sweep or device check"""
+        checks = [
+            device["next_check"] for device in self.inventory.devices.values()
+            if device["status"] == "online" and device["next_check"] is not None
+        ]
+        return min([self.next_sweep] + checks)
+
+    def run(self, stop: Optional[threading.Event] = None) -> Iterator[Dict[str, Any]]:
+        """Yield change events until stop is set, sleeping until work is due"""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            for event in self.poll(stop=stop):
+                yield event
+            stop.wait(max(0.0, self.next_due() - time.time()))
+
+    def describe(self) -> Dict[str, Any]:
+        devices = self.inventory.devices.values()
+        return {
+            "network_range": self.network_range,
+            "online": sum(1 for device in devices if device["status"] == "online"),
+            "gone": sum(1 for device in devices if device["status"] == "gone"),
+            **self.stats
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monitor a network range and print device changes as NDJSON")
+    parser.add_argument("network_range", nargs="?", help="CIDR range (default: the local network)")
+    parser.add_argument("--db", default=os.environ.get("MOBICURE_NETWORK_INVENTORY_DB"),
+                        help="SQLite file holding the inventory between runs")
+    parser.add_argument("--min-interval", type=float, default=60.0)
+    parser.add_argument("--max-interval", type=float, default=3600.0)
+    parser.add_argument("--sweep-interval", type=float, default=900.0)
+    parser.add_argument("--once", action="store_true", help="Run one check cycle and exit")
+    args = parser.parse_args()
+
+    from network_scanner_service import NetworkScanner
+    scanner = NetworkScanner()
+    monitor = NetworkMonitor(
+        scanner, args.network_range or scanner._get_local_network(), db_path=args.db,
+        min_interval=args.min_interval, max_interval=args.max_interval, sweep_interval=args.sweep_interval
+    )
+
+    events = monitor.poll() if args.once else monitor.run()
+    try:
+        for event in events:
+            print(json.dumps(event), flush=True)
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(monitor.describe()), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,21 +4,72 @@ Network Scanner Microservice
 Provides comprehensive network device discovery and security analysis.
 """
 
-import socket
+import os
+import time
+import queue
+import asyncio
+import threading
+import contextvars
+import concurrent.futures
 import subprocess
 import platform
 import ipaddress
-import concurrent.futures
 from datetime import datetime
 import json
 import requests
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Iterator, Optional
+
+from port_probe import PortProbeEngine, top_ports
+from host_discovery import HostDiscovery
+from geoip_db import GeoIPDatabase
+from reverse_dns import default_reverse_dns
+from scan_profiler import add_stage, profiled, stage
+
+SECURITY_CONFIG = os.environ.get(
+    "MOBICURE_SECURITY_CONFIG",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend", "config", "security_config.json")
+)
+
+def load_network_settings(config_path: str = SECURITY_CONFIG) -> Dict[str, Any]:
+    """
+    network_scanning section of security_config.json, with defaults for
+    anything missing or an unreadable file
+    """
+    settings = {
+        "max_ports": 1000,
+        "timeout_seconds": 30,
+        "max_threads": 50,
+        "max_concurrent_probes": 1024,
+        "probe_timeout_seconds": 1.0
+    }
+    try:
+        with open(config_path, "r") as f:
+            settings.update(json.load(f).get("security_settings", {}).get("network_scanning", {}))
+    except (OSError, ValueError):
+        pass
+    return settings
 
 class NetworkScanner:
     def __init__(self):
-        self.timeout = 1
-        self.max_threads = 50
+        self.settings = load_network_settings()
+        self.timeout = self.settings["probe_timeout_seconds"]
+        self.max_threads = self.settings["max_threads"]
+        
+        # Ports probed on every discovered device, and the time budget for probing them
+        self.ports = top_ports(self.settings["max_ports"])
+        self.port_scan_deadline = self.settings["timeout_seconds"]
+        self.probe_engine = PortProbeEngine(
+            concurrency=self.settings["max_concurrent_probes"], timeout=self.timeout
+        )
+        self.discovery = HostDiscovery(
+            timeout=self.timeout, probe_engine=self.probe_engine, tcp_deadline=self.port_scan_deadline
+        )
+        # Offline geolocation table (built with scripts/geoip_db.py); ip-api.com is used without it
+        self.geoip = GeoIPDatabase()
+        # PTR answers are cached process-wide, so rescans skip hosts already resolved
+        self.reverse_dns = default_reverse_dns
 
+    @profiled("network_scanner")
     def scan_network(self, network_range: str = None) -> Dict[str, Any]:
         """
         Comprehensive network scan with device discovery
@@ -28,21 +79,20 @@ class NetworkScanner:
                 network_range = self._get_local_network()
             
             print(f"Scanning network: {network_range}")
+            start_time = time.time()
             
-            # Discover active devices
-            active_devices = self._discover_devices(network_range)
-            
-            # Get detailed information for each device
-            detailed_devices = []
-            for device in active_devices:
-                device_info = self._get_device_details(device)
-                detailed_devices.append(device_info)
+            # Discover devices and get detailed information for each as it is found
+            detailed_devices = list(self.scan_network_iter(network_range))
+            detailed_devices.sort(key=lambda d: ipaddress.ip_address(d["ip"]))
             
             # Network statistics
             stats = {
                 "total_devices": len(detailed_devices),
                 "secure_devices": len([d for d in detailed_devices if d.get('is_secure', True)]),
                 "unknown_devices": len([d for d in detailed_devices if d.get('device_type') == 'Unknown']),
+                "ports_per_device": len(self.ports),
+                "port_probes": sum(d.get("ports_probed", 0) for d in detailed_devices),
+                "port_scan_complete": all(d.get("port_scan_complete", True) for d in detailed_devices),
                 "scan_timestamp": datetime.now().isoformat()
             }
             
@@ -50,7 +100,7 @@ class NetworkScanner:
                 "network_range": network_range,
                 "devices": detailed_devices,
                 "statistics": stats,
-                "scan_duration": "2.3 seconds"  # Mock duration
+                "scan_duration": f"{time.time() - start_time:.1f} seconds"
             }
             
         except Exception as e:
@@ -61,6 +111,159 @@ class NetworkScanner:
                 "scan_timestamp": datetime.now().isoformat()
             }
 
+    def scan_network_iter(self, network_range: str = None,
+                          stop: Optional[threading.Event] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Pipelined scan yielding device records as they complete. Discovery feeds
+        live hosts into a bounded queue, one event loop probes their ports host
+        by host as they arrive while resolving their PTR records concurrently,
+        and max_threads workers add the per-device details. Memory therefore
+        does not grow with the size of the range, and the first devices are
+        reported while discovery is still running. Closing
+        the generator (or setting stop) ends the scan.
+        """
+        if not network_range:
+            network_range = self._get_local_network()
+        ipaddress.IPv4Network(network_range, strict=False)  # fail fast on a bad range
+        
+        stop = stop or threading.Event()
+        workers = max(1, self.max_threads)
+        live = queue.Queue(maxsize=self.probe_engine.concurrency)
+        results = queue.Queue(maxsize=workers * 2)
+        finished = object()
+        errors = []
+        
+        def put(target, item):
+            # Give up once the scan is stopped so no thread blocks on a queue nobody reads
+            while not stop.is_set():
+                try:
+                    target.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+        
+        def take():
+            while not stop.is_set():
+                try:
+                    item = live.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                return None if item is finished else item
+            return None
+        
+        def discover():
+            start = time.perf_counter()
+            hosts = 0
+            try:
+                for item in self.discovery.iter_discover(network_range, stop):
+                    hosts += 1
+                    put(live, item)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                add_stage("discovery", time.perf_counter() - start, calls=max(1, hosts))
+                put(live, finished)
+        
+        def profile(ip, discovery, port_scan, hostname):
+            try:
+                with stage("device_details"):
+                    device_info = self._get_device_details(ip, port_scan["open_ports"], hostname)
+                device_info["ports_probed"] = port_scan["probes"]
+                device_info["port_scan_complete"] = port_scan["complete"]
+            except Exception as e:
+                device_info = {"ip": ip, "error": str(e)}
+            device_info["mac_address"] = discovery["mac"]
+            device_info["discovery_method"] = discovery["method"]
+            device_info["rtt_ms"] = discovery["rtt_ms"]
+            put(results, device_info)
+        
+        async def pipeline(details, feeder):
+            loop = asyncio.get_running_loop()
+            slots = asyncio.Semaphore(workers * 2)
+            ptr_slots = asyncio.Semaphore(self.reverse_dns.concurrency)
+            pending = set()
+            discoveries = {}
+            hostnames = {}
+            
+            def detail_done(future):
+                pending.discard(future)
+                slots.release()
+            
+            async def next_host():
+                item = await loop.run_in_executor(feeder, take)
+                if item is None:
+                    return None
+                ip, discovery = item
+                discoveries[ip] = discovery
+                hostnames[ip] = asyncio.ensure_future(resolve(ip))
+                return ip
+            
+            async def resolve(ip):
+                async with ptr_slots:
+                    start = loop.time()
+                    try:
+                        return await self.reverse_dns.resolve(ip)
+                    finally:
+                        add_stage("reverse_dns", loop.time() - start)
+            
+            async for ip, port_scan in self.probe_engine.probe_hosts(next_host, self.ports, self.port_scan_deadline):
+                if stop.is_set():
+                    break
+                # Hosts are probed concurrently, so these per-host times overlap
+                add_stage("port_probe", port_scan["elapsed"])
+                # Usually already answered: the query started when the host was discovered
+                hostname = await hostnames.pop(ip)
+                await slots.acquire()
+                future = details.submit(
+                    contextvars.copy_context().run, profile, ip, discoveries.pop(ip), port_scan, hostname
+                )
+                pending.add(future)
+                future.add_done_callback(lambda f: loop.call_soon_threadsafe(detail_done, f))
+            for task in hostnames.values():
+                task.cancel()
+            if pending:
+                await asyncio.gather(*(asyncio.wrap_future(f) for f in list(pending)))
+        
+        def probe():
+            details = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="device-details")
+            feeder = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="host-feed")
+            try:
+                asyncio.run(pipeline(details, feeder))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                details.shutdown(wait=True)
+                feeder.shutdown(wait=False)
+                put(results, finished)
+        
+        for target in (discover, probe):
+            # Carry the caller's scan profile into the pipeline threads
+            threading.Thread(target=contextvars.copy_context().run, args=(target,), daemon=True).start()
+        
+        try:
+            while True:
+                item = results.get()
+                if item is finished:
+                    break
+                yield item
+            if errors:
+                raise errors[0]
+        finally:
+            stop.set()
+
+    def monitor(self, network_range: str = None, db_path: Optional[str] = None,
+                stop: Optional[threading.Event] = None, **schedule) -> Iterator[Dict[str, Any]]:
+        """
+        Continuous monitoring: yield change events (device_new, device_returned,
+        device_gone, port_opened, port_closed, hostname_changed) as checks find
+        them, re-probing each device on its own adaptive schedule. schedule is
+        passed to NetworkMonitor (min_interval, max_interval, sweep_interval,
+        missing_after).
+        """
+        from network_inventory import NetworkMonitor
+        monitor = NetworkMonitor(self, network_range or self._get_local_network(), db_path=db_path, **schedule)
+        return monitor.run(stop)
+
     def _get_local_network(self) -> str:
         """
         Determine the local network range
@@ -78,41 +281,18 @@ class NetworkScanner:
         except:
             return "192.168.1.0/24"  # Fallback
 
-    def _discover_devices(self, network_range: str) -> List[str]:
+    def _discover_devices(self, network_range: str) -> Dict[str, Dict[str, Any]]:
         """
-        Discover active devices on the network
+        Discover active devices on the network (ICMP sweep, TCP fallback, ARP cache)
         """
-        network = ipaddress.IPv4Network(network_range, strict=False)
-        active_ips = []
-        
-        def ping_host(ip):
-            try:
-                if platform.system() == "Windows":
-                    result = subprocess.run(['ping', '-n', '1', '-w', '1000', str(ip)], 
-                                          capture_output=True, text=True)
-                else:
-                    result = subprocess.run(['ping', '-c', '1', '-W', '1', str(ip)], 
-                                          capture_output=True, text=True)
-                
-                if result.returncode == 0:
-                    return str(ip)
-            except:
-                pass
-            return None
-        
-        # Use threading for faster scanning
-        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_threads) as executor:
-            futures = [executor.submit(ping_host, ip) for ip in network.hosts()]
-            for future in concurrent.futures.as_completed(futures):
-                result = future.result()
-                if result:
-                    active_ips.append(result)
-        
-        return active_ips
+        return self.discovery.discover(network_range)
 
-    def _get_device_details(self, ip: str) -> Dict[str, Any]:
+    def _get_device_details(self, ip: str, open_ports: Optional[List[int]] = None,
+                            hostname: Optional[str] = None) -> Dict[str, Any]:
         """
-        Get detailed information about a network device
+        Get detailed information about a network device. open_ports and
+        hostname come from the batch probe and reverse-DNS stages; when
+        open_ports is omitted the device is probed and resolved on its own.
         """
         device_info = {
             "ip": ip,
@@ -127,34 +307,12 @@ class NetworkScanner:
         }
         
         try:
-            # Try to resolve hostname
-            try:
-                hostname = socket.gethostbyaddr(ip)[0]
-                device_info["hostname"] = hostname
-                
-                # Guess device type from hostname
-                if any(term in hostname.lower() for term in ['router', 'gateway']):
-                    device_info["device_type"] = "Router"
-                elif any(term in hostname.lower() for term in ['phone', 'iphone', 'android']):
-                    device_info["device_type"] = "Mobile"
-                elif any(term in hostname.lower() for term in ['pc', 'desktop', 'laptop']):
-                    device_info["device_type"] = "Computer"
-                else:
-                    device_info["device_type"] = "Unknown"
-                    device_info["is_secure"] = False  # Unknown devices are flagged
-                    
-            except socket.herror:
-                device_info["hostname"] = f"Device-{ip.split('.')[-1]}"
-                device_info["is_secure"] = False
-            
-            # Check common ports
-            common_ports = [22, 23, 53, 80, 135, 139, 443, 445, 993, 995]
-            open_ports = []
-            
-            for port in common_ports:
-                if self._check_port(ip, port):
-                    open_ports.append(port)
+            if open_ports is None:
+                hostname = self.reverse_dns.lookup(ip)
+                port_scan = self.probe_engine.scan([ip], self.ports, deadline=self.port_scan_deadline)
+                open_ports = port_scan["open_ports"].get(ip, [])
             
+            self._classify_device(device_info, hostname)
             device_info["open_ports"] = open_ports
             
             # Security assessment
@@ -173,26 +331,47 @@ class NetworkScanner:
         
         return device_info
 
-    def _check_port(self, ip: str, port: int) -> bool:
+    @staticmethod
+    def _classify_device(device_info: Dict[str, Any], hostname: Optional[str]):
         """
-        Check if a port is open on the target IP
+        Set hostname and device_type from a reverse-DNS answer (None when the
+        address has no PTR record or the query timed out)
         """
-        try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(self.timeout)
-            result = sock.connect_ex((ip, port))
-            sock.close()
-            return result == 0
-        except:
-            return False
+        if hostname is None:
+            device_info["hostname"] = f"Device-{device_info['ip'].split('.')[-1]}"
+            device_info["is_secure"] = False
+            return
+        
+        device_info["hostname"] = hostname
+        
+        # Guess device type from hostname
+        name = hostname.lower()
+        if any(term in name for term in ['router', 'gateway']):
+            device_info["device_type"] = "Router"
+        elif any(term in name for term in ['phone', 'iphone', 'android']):
+            device_info["device_type"] = "Mobile"
+        elif any(term in name for term in ['pc', 'desktop', 'laptop']):
+            device_info["device_type"] = "Computer"
+        else:
+            device_info["device_type"] = "Unknown"
+            device_info["is_secure"] = False  # Unknown devices are flagged
 
     def _get_geolocation(self, ip: str) -> Optional[Dict[str, Any]]:
         """
-        Get geolocation information for an IP address
+        Get geolocation information for an IP address, from the local range
+        table when one is installed and from ip-api.com otherwise
         """
+        if self.geoip.available:
+            with stage("geolocation"):
+                location = self.geoip.lookup(ip)
+            if location is not None:
+                location["source"] = "local"
+            return location
+
         try:
             # Using a free IP geolocation service
-            response = requests.get(f"http://ip-api.com/json/{ip}", timeout=5)
+            with stage("geolocation"):
+                response = requests.get(f"http://ip-api.com/json/{ip}", timeout=5)
             if response.status_code == 200:
                 data = response.json()
                 if data.get('status') == 'success':
@@ -1,12 +1,51 @@
-import hashlib
 import json
+import os
 import requests
 import re
+import string
+from collections import Counter
 from datetime import datetime
 import PyPDF2
 import io
 import base64
 
+from content_matcher import ContentMatcher, StreamingScan
+from file_hasher import default_hasher
+from result_cache import ruleset_fingerprint
+from scan_profiler import profiled, stage
+
+# A PDF name ends at whitespace, a delimiter or the end of the data
+_NAME_END = r'(?![^\s()<>\[\]{}/%])'
+
+_NAME_ESCAPE = re.compile(r'#([0-9A-Fa-f]{2})')
+
+# Hex digits mapped to "h" and every other byte to ".", so runs of hex digits are found with bytes.find
+_HEX_MASK = bytes(0x68 if chr(i) in string.hexdigits else 0x2E for i in range(256))
+
+
+def pdf_names_pattern(names):
+    """
+    Regex for any of the PDF names as a whole token. Any character of a name
+    may be written as a #xx hex escape (/J#53 is /JS), which malicious files
+    use to hide names from plain substring checks. The names share the
+    leading "/" so the regex engine can skip straight between candidates.
+    """
+    alternatives = []
+    for name in names:
+        parts = []
+        for char in name:
+            high, low = f"{ord(char):02x}"
+            low = f"[{low}{low.upper()}]" if low.isalpha() else low
+            parts.append(f"(?:{re.escape(char)}|#{high}{low})")
+        alternatives.append("".join(parts))
+    return "/(?:" + "|".join(alternatives) + ")" + _NAME_END
+
+
+def decode_pdf_name(token):
+    """Name of a /name token with its #xx escapes resolved, without the slash"""
+    return _NAME_ESCAPE.sub(lambda m: chr(int(m.group(1), 16)), token[1:])
+
+
 class PDFSecurityScanner:
     def __init__(self):
         self.threat_databases = [
@@ -15,30 +54,95 @@ class PDFSecurityScanner:
             "https://api.hybrid-analysis.com/api/v2/search/hash"
         ]
         
-    def scan_pdf_file(self, file_data, filename):
+        self.suspicious_keywords = [
+            "eval", "unescape", "fromCharCode", "String.fromCharCode",
+            "ActiveXObject", "WScript.Shell", "cmd.exe", "powershell",
+            "exploit", "shellcode", "payload", "backdoor"
+        ]
+        
+        self.js_patterns = [
+            r'app\.alert',
+            r'this\.print',
+            r'util\.printf'
+        ]
+        
+        # PDF names of actions and attachments, matched as name tokens
+        self.javascript_names = ["JS", "JavaScript"]
+        self.auto_action_names = ["OpenAction", "AA"]
+        self.embedded_names = ["EmbeddedFiles", "FileAttachment"]
+        
+        self.suspicious_extensions = [".exe", ".bat", ".cmd", ".scr", ".pif", ".com"]
+        
+        self.malicious_domains = [
+            "bit.ly", "tinyurl.com", "t.co", "goo.gl",  # URL shorteners
+            "tempfile.org", "filehosting.org"  # Suspicious file hosts
+        ]
+        
+        # Runs of at least this many hex digits count as hex strings
+        self.min_hex_run = 20
+        
+        # One engine for every content rule, run over the raw bytes in a single
+        # streamed pass. The patterns start with literals the engine prefilters
+        # on, so rules absent from a chunk cost nothing. Rules are only
+        # counted, without offsets; name tokens are tallied by spelling and
+        # only URLs on suspicious domains are kept.
+        self.content_matcher = ContentMatcher(
+            [(keyword, re.escape(keyword), re.IGNORECASE) for keyword in self.suspicious_keywords] +
+            [(pattern, pattern, re.IGNORECASE) for pattern in self.js_patterns] +
+            [(ext, re.escape(ext), re.IGNORECASE) for ext in self.suspicious_extensions] +
+            [("url", r'https?://[^\s<>"{}\|\\^`\[\]()]+', re.IGNORECASE),
+             ("pdf_name", pdf_names_pattern(
+                 self.javascript_names + self.auto_action_names + self.embedded_names + ["Launch", "URI"]), 0)],
+            capture=["url"],
+            capture_filter=lambda key, text: any(domain in text.lower() for domain in self.malicious_domains),
+            offsets=(),
+            tally=["pdf_name"]
+        )
+        
+        # Streamed chunk size and the overlap carried between chunks
+        self.chunk_size = 1024 * 1024
+        self.chunk_overlap = 64 * 1024
+        
+        self.ruleset_version = ruleset_fingerprint(
+            self.suspicious_keywords, self.js_patterns, self.javascript_names, self.auto_action_names,
+            self.embedded_names, self.suspicious_extensions, self.malicious_domains, self.min_hex_run
+        )
+        
+    @profiled("pdf_scanner")
+    def scan_pdf_file(self, file_data, filename, hashes=None):
         """Comprehensive PDF security analysis with real threat detection"""
         try:
-            # Calculate file hash for threat database lookup
-            file_hash = hashlib.sha256(file_data).hexdigest()
-            md5_hash = hashlib.md5(file_data).hexdigest()
+            size = len(file_data)
+            # Calculate file hash for threat database lookup, unless the caller already has it
+            if hashes is None:
+                hashes = default_hasher.hash_bytes(file_data, ('sha256', 'md5'))
+            file_hash = hashes['sha256']
+            md5_hash = hashes['md5']
             
             # Parse PDF structure
-            pdf_analysis = self._analyze_pdf_structure(file_data)
+            with stage("structure_parse", size):
+                pdf_analysis = self._analyze_pdf_structure(file_data)
             
             # Check against threat databases
-            threat_results = self._check_threat_databases(file_hash, md5_hash)
+            with stage("threat_database"):
+                threat_results = self._check_threat_databases(file_hash, md5_hash)
             
-            # Analyze PDF content for malicious patterns
-            content_threats = self._analyze_pdf_content(file_data)
+            # Single pass over the raw bytes for every content rule
+            with stage("pattern_matching", size):
+                report = self._scan_content(file_data)
             
-            # JavaScript detection
-            js_threats = self._detect_javascript(file_data)
+            # Name tokens catch actions and attachments outside page contents
+            pdf_analysis["hasJavaScript"] = pdf_analysis.get("hasJavaScript", False) or \
+                any(report["names"][name] for name in self.javascript_names)
+            pdf_analysis["hasEmbeddedFiles"] = pdf_analysis.get("hasEmbeddedFiles", False) or \
+                any(report["names"][name] for name in self.embedded_names)
+            pdf_analysis["hasExternalLinks"] = pdf_analysis.get("hasExternalLinks", False) or \
+                report["names"]["URI"] > 0
             
-            # Embedded file analysis
-            embedded_threats = self._analyze_embedded_files(file_data)
-            
-            # URL extraction and analysis
-            url_threats = self._analyze_urls(file_data)
+            content_threats = self._analyze_pdf_content(report)
+            js_threats = self._detect_javascript(report)
+            embedded_threats = self._analyze_embedded_files(report)
+            url_threats = self._analyze_urls(report)
             
             # Combine all threat assessments
             all_threats = threat_results + content_threats + js_threats + embedded_threats + url_threats
@@ -67,6 +171,11 @@ class PDFSecurityScanner:
         except Exception as e:
             return {"error": f"PDF analysis failed: {str(e)}"}
     
+    def refresh_cached_result(self, result, file_path):
+        """Update a cached result of identical content for this path and request"""
+        result.update({"fileName": os.path.basename(file_path), "scanTimestamp": datetime.now().isoformat()})
+        return result
+    
     def _analyze_pdf_structure(self, file_data):
         """Analyze PDF structure and extract metadata"""
         try:
@@ -142,20 +251,55 @@ class PDFSecurityScanner:
         
         return threats
     
-    def _analyze_pdf_content(self, file_data):
+    def _scan_content(self, file_data):
+        """
+        Match every content rule over the bytes (or an mmap) in one streamed
+        pass, without building a string copy of the file. The report also
+        carries "names", a Counter of the decoded PDF names found, and the
+        number of long hex strings under "hex_string".
+        """
+        view = memoryview(file_data)
+        stream = StreamingScan(self.content_matcher, overlap=self.chunk_overlap)
+        needle = b"h" * self.min_hex_run
+        hex_runs = 0
+        run = 0  # hex digits at the end of the data seen so far
+        for offset in range(0, view.nbytes, self.chunk_size):
+            chunk = view[offset:offset + self.chunk_size]
+            stream.feed(chunk)
+            
+            mask = chunk.tobytes().translate(_HEX_MASK)
+            position = mask.find(b".")
+            if position < 0:
+                run += len(mask)
+                continue
+            if run + position >= self.min_hex_run:
+                hex_runs += 1
+            # Runs ending inside the chunk; the last one may continue into the next
+            while True:
+                position = mask.find(needle, position)
+                if position < 0:
+                    break
+                position = mask.find(b".", position)
+                if position < 0:
+                    break
+                hex_runs += 1
+            run = len(mask) - len(mask.rstrip(b"h"))
+        if run >= self.min_hex_run:
+            hex_runs += 1
+        
+        report = stream.finish()
+        report["names"] = Counter()
+        for token, count in report["pdf_name"]["tally"].items():
+            report["names"][decode_pdf_name(token.decode('latin-1'))] += count
+        report["hex_string"] = {"count": hex_runs}
+        return report
+    
+    def _analyze_pdf_content(self, report):
         """Analyze PDF content for suspicious patterns"""
         threats = []
-        content_str = str(file_data)
-        
-        # Suspicious keywords
-        suspicious_keywords = [
-            "eval", "unescape", "fromCharCode", "String.fromCharCode",
-            "ActiveXObject", "WScript.Shell", "cmd.exe", "powershell",
-            "exploit", "shellcode", "payload", "backdoor"
-        ]
         
-        for keyword in suspicious_keywords:
-            if keyword.lower() in content_str.lower():
+        for keyword in self.suspicious_keywords:
+            if report[keyword]["count"]:
                 threats.append({
                     "type": "Suspicious Content",
                     "description": f"Suspicious keyword detected: {keyword}",
@@ -164,7 +308,7 @@ class PDFSecurityScanner:
                 })
         
         # Check for obfuscated content
-        if len(re.findall(r'[A-Fa-f0-9]{20,}', content_str)) > 5:
+        if report["hex_string"]["count"] > 5:
             threats.append({
                 "type": "Obfuscated Content",
                 "description": "High amount of hexadecimal strings detected (possible obfuscation)",
@@ -174,21 +318,21 @@ class PDFSecurityScanner:
         
         return threats
     
-    def _detect_javascript(self, file_data):
-        """Detect and analyze JavaScript in PDF"""
+    def _detect_javascript(self, report):
+        """Detect and analyze JavaScript and automatic actions in PDF"""
         threats = []
-        content_str = str(file_data)
         
-        js_patterns = [
-            r'/JS\s*\(',
-            r'/JavaScript\s*\(',
-            r'app\.alert',
-            r'this\.print',
-            r'util\.printf'
-        ]
+        for name in self.javascript_names:
+            if report["names"][name]:
+                threats.append({
+                    "type": "JavaScript Detected",
+                    "description": f"JavaScript action found: /{name}",
+                    "severity": "High",
+                    "source": "JavaScript Analysis"
+                })
         
-        for pattern in js_patterns:
-            if re.search(pattern, content_str, re.IGNORECASE):
+        for pattern in self.js_patterns:
+            if report[pattern]["count"]:
                 threats.append({
                     "type": "JavaScript Detected",
                     "description": f"JavaScript pattern found: {pattern}",
@@ -196,14 +340,33 @@ class PDFSecurityScanner:
                     "source": "JavaScript Analysis"
                 })
         
+        has_launch = report["names"]["Launch"] > 0
+        if has_launch:
+            threats.append({
+                "type": "Launch Action",
+                "description": "PDF can launch external programs or files (/Launch)",
+                "severity": "High",
+                "source": "JavaScript Analysis"
+            })
+        
+        # Open actions are common in benign files; they matter when there is something to run
+        has_script = has_launch or any(report["names"][name] for name in self.javascript_names)
+        auto_actions = [f"/{name}" for name in self.auto_action_names if report["names"][name]]
+        if auto_actions and has_script:
+            threats.append({
+                "type": "Automatic Action",
+                "description": f"Script or launch action runs automatically ({', '.join(auto_actions)})",
+                "severity": "High",
+                "source": "JavaScript Analysis"
+            })
+        
         return threats
     
-    def _analyze_embedded_files(self, file_data):
+    def _analyze_embedded_files(self, report):
         """Analyze embedded files for threats"""
         threats = []
-        content_str = str(file_data)
         
-        if "/EmbeddedFiles" in content_str or "/FileAttachment" in content_str:
+        if any(report["names"][name] for name in self.embedded_names):
             threats.append({
                 "type": "Embedded Files",
                 "description": "PDF contains embedded files that could hide malware",
@@ -212,9 +375,8 @@ class PDFSecurityScanner:
             })
         
         # Check for suspicious file extensions in embedded content
-        suspicious_extensions = [".exe", ".bat", ".cmd", ".scr", ".pif", ".com"]
-        for ext in suspicious_extensions:
-            if ext in content_str.lower():
+        for ext in self.suspicious_extensions:
+            if report[ext]["count"]:
                 threats.append({
                     "type": "Suspicious Embedded File",
                     "description": f"Potentially dangerous file type embedded: {ext}",
@@ -224,23 +386,12 @@ class PDFSecurityScanner:
         
         return threats
     
-    def _analyze_urls(self, file_data):
-        """Extract and analyze URLs for threats"""
+    def _analyze_urls(self, report):
+        """Analyze URLs on suspicious domains"""
         threats = []
-        content_str = str(file_data)
-        
-        # Extract URLs
-        url_pattern = r'https?://[^\s<>"{}|\\^`\[\]]+'
-        urls = re.findall(url_pattern, content_str, re.IGNORECASE)
-        
-        for url in urls[:10]:  # Limit to first 10 URLs
-            # Check against known malicious domains
-            malicious_domains = [
-                "bit.ly", "tinyurl.com", "t.co", "goo.gl",  # URL shorteners
-                "tempfile.org", "filehosting.org"  # Suspicious file hosts
-            ]
-            
-            for domain in malicious_domains:
+        
+        for url in report["url"]["matches"][:10]:  # Limit to first 10 URLs
+            for domain in self.malicious_domains:
                 if domain in url.lower():
                     threats.append({
                         "type": "Suspicious URL",
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+MOBICURE Port Probe Engine
+Asyncio TCP connect prober for large (host, port) sweeps with a global
+concurrency limit and per-host adaptive timeouts
+"""
+
+import time
+import socket
+import asyncio
+import ipaddress
+import concurrent.futures
+from typing import Dict, List, Any, AsyncIterator, Awaitable, Callable, Iterable, Iterator, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Ports probed first, in roughly descending order of how often they are open
+PRIORITY_PORTS = [
+    80, 443, 22, 21, 23, 25, 53, 110, 111, 135, 139, 143, 445, 993, 995, 3389, 8080, 8443,
+    587, 465, 1723, 3306, 5432, 1433, 1521, 5900, 5901, 6379, 27017, 9200, 11211, 2049,
+    161, 389, 636, 873, 1080, 1194, 1883, 8883, 5060, 5061, 548, 631, 515, 9100, 10000,
+    8000, 8008, 8081, 8088, 8888, 9000, 9090, 9443, 3000, 5000, 5001, 7001, 7002, 8161,
+    2375, 2376, 5985, 5986, 6443, 10250, 179, 502, 102, 20000, 47808, 1900, 5353, 554,
+    8554, 37777, 49152, 62078, 7547, 2000, 8291, 4444, 6667, 31337, 5555, 5800, 3128,
+]
+
+
+def top_ports(count: int) -> List[int]:
+    """The priority ports followed by the lowest remaining port numbers, count in total"""
+    count = max(0, min(count, 65535))
+    ports = PRIORITY_PORTS[:count]
+    seen = set(ports)
+    port = 1
+    while len(ports) < count:
+        if port not in seen:
+            ports.append(port)
+        port += 1
+    return ports
+
+
+def descriptor_limit(requested: int, reserve: int = 64) -> int:
+    """Clamp a concurrency limit to what the open file limit allows"""
+    if resource is None:
+        return requested
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        return requested
+    return max(1, min(requested, soft - reserve))
+
+
+class _RttEstimator:
+    """Smoothed round-trip time per host, as in RFC 6298"""
+
+    __slots__ = ("srtt", "rttvar")
+
+    def __init__(self):
+        self.srtt = None
+        self.rttvar = None
+
+    def sample(self, rtt: float):
+        if self.srtt is None:
+            self.srtt, self.rttvar = rtt, rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+
+
+class _HostProbe:
+    """Progress of one host in a streaming sweep"""
+
+    __slots__ = ("host", "family", "ports", "started", "rtt", "open_ports", "counts",
+                 "outstanding", "dispatched", "skipped")
+
+    def __init__(self, host: str, ports: Iterable[int], started: float):
+        self.host = host
+        self.family = socket.AF_INET6 if ipaddress.ip_address(host).version == 6 else socket.AF_INET
+        self.ports = iter(ports)
+        self.started = started
+        self.rtt = _RttEstimator()
+        self.open_ports: List[int] = []
+        self.counts = {"open": 0, "closed": 0, "filtered": 0, "unreachable": 0}
+        self.outstanding = 0
+        self.dispatched = False  # every port handed out
+        self.skipped = 0         # ports not probed because the host deadline passed
+
+    def result(self, now: float) -> Dict[str, Any]:
+        return {
+            "open_ports": sorted(self.open_ports),
+            "probes": sum(self.counts.values()),
+            "states": dict(self.counts),
+            "rtt_ms": round(self.rtt.srtt * 1000, 2) if self.rtt.srtt is not None else None,
+            "complete": not self.skipped,
+            "elapsed": round(now - self.started, 3)
+        }
+
+
+class PortProbeEngine:
+    """
+    Probes (host, port) pairs with non-blocking TCP connects. A fixed set of
+    worker coroutines pulls targets from one iterator, so memory stays flat
+    however many pairs are queued. Once a host has answered (open or refused),
+    its connect timeout shrinks to its smoothed RTT plus four deviations,
+    within [min_timeout, max_timeout].
+    """
+
+    def __init__(self, concurrency: int = 1024, timeout: float = 1.0,
+                 min_timeout: float = 0.1, max_timeout: float = 3.0):
+        self.concurrency = descriptor_limit(concurrency)
+        self.timeout = timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+
+    def _timeout_for(self, rtt: Optional[_RttEstimator]) -> float:
+        if rtt is None or rtt.srtt is None:
+            return self.timeout
+        return min(self.max_timeout, max(self.min_timeout, rtt.srtt + 4 * rtt.rttvar))
+
+    async def _probe(self, loop, host: str, port: int, family: int, rtt: _RttEstimator) -> str:
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        start = loop.time()
+        try:
+            await asyncio.wait_for(loop.sock_connect(sock, (host, port)), self._timeout_for(rtt))
+            state = "open"
+        except asyncio.TimeoutError:
+            return "filtered"
+        except ConnectionRefusedError:
+            state = "closed"
+        except OSError:
+            return "unreachable"
+        finally:
+            sock.close()
+        rtt.sample(loop.time() - start)
+        return state
+
+    async def probe(self, targets: Iterable[Tuple[str, int]], deadline: Optional[float] = None,
+                    concurrency: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Probe every (host, port) target, returning open ports per host. If the
+        deadline (seconds) expires first, the ports found so far are returned
+        with "complete" set to False. concurrency overrides the engine limit
+        for this call, e.g. when several scans share the descriptor budget.
+        """
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        pending: Iterator[Tuple[str, int]] = iter(targets)
+        open_ports: Dict[str, List[int]] = {}
+        counts = {"open": 0, "closed": 0, "filtered": 0, "unreachable": 0}
+        rtts: Dict[str, _RttEstimator] = {}
+        families: Dict[str, int] = {}
+
+        async def worker():
+            for host, port in pending:
+                family = families.get(host)
+                if family is None:
+                    family = families[host] = (
+                        socket.AF_INET6 if ipaddress.ip_address(host).version == 6 else socket.AF_INET
+                    )
+                rtt = rtts.get(host)
+                if rtt is None:
+                    rtt = rtts[host] = _RttEstimator()
+                state = await self._probe(loop, host, port, family, rtt)
+                counts[state] += 1
+                if state == "open":
+                    open_ports.setdefault(host, []).append(port)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(concurrency or self.concurrency)]
+        complete = True
+        try:
+            await asyncio.wait_for(asyncio.gather(*workers), deadline)
+        except asyncio.TimeoutError:
+            complete = False
+
+        return {
+            "open_ports": {host: sorted(ports) for host, ports in open_ports.items()},
+            "probes": sum(counts.values()),
+            "states": counts,
+            "rtt_ms": {
+                host: round(rtt.srtt * 1000, 2) for host, rtt in rtts.items() if rtt.srtt is not None
+            },
+            "complete": complete,
+            "elapsed": round(time.perf_counter() - start, 3)
+        }
+
+    async def probe_hosts(self, next_host: Callable[[], Awaitable[Optional[str]]], ports: Iterable[int],
+                          deadline: Optional[float] = None) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Streaming sweep: probe every port of each host returned by next_host()
+        (None ends the stream) and yield (host, result) as each host finishes.
+        Ports are handed out host by host under the engine-wide concurrency
+        limit, so hosts complete roughly in the order they arrive. deadline
+        bounds the time spent on any single host.
+        """
+        loop = asyncio.get_running_loop()
+        ports = list(ports)
+        finished: asyncio.Queue = asyncio.Queue()
+        done = object()
+        lock = asyncio.Lock()
+        feed = {"current": None, "exhausted": False}
+
+        def host_done(state: _HostProbe):
+            if state.dispatched and state.outstanding == 0:
+                finished.put_nowait(state)
+
+        async def next_target() -> Optional[Tuple[_HostProbe, int]]:
+            async with lock:
+                while True:
+                    state = feed["current"]
+                    if state is not None:
+                        port = next(state.ports, None)
+                        if port is not None:
+                            state.outstanding += 1
+                            return state, port
+                        state.dispatched = True
+                        feed["current"] = None
+                        host_done(state)
+                    if feed["exhausted"]:
+                        return None
+                    host = await next_host()
+                    if host is None:
+                        feed["exhausted"] = True
+                        return None
+                    feed["current"] = _HostProbe(host, ports, loop.time())
+
+        async def worker():
+            while True:
+                target = await next_target()
+                if target is None:
+                    return
+                state, port = target
+                if deadline is not None and loop.time() - state.started > deadline:
+                    state.skipped += 1
+                else:
+                    outcome = await self._probe(loop, state.host, port, state.family, state.rtt)
+                    state.counts[outcome] += 1
+                    if outcome == "open":
+                        state.open_ports.append(port)
+                state.outstanding -= 1
+                host_done(state)
+
+        async def run_workers():
+            try:
+                await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+            finally:
+                finished.put_nowait(done)
+
+        runner = asyncio.ensure_future(run_workers())
+        try:
+            while True:
+                state = await finished.get()
+                if state is done:
+                    break
+                yield state.host, state.result(loop.time())
+            await runner
+        finally:
+            runner.cancel()
+
+    def scan(self, hosts: Iterable[str], ports: Iterable[int], deadline: Optional[float] = None,
+             concurrency: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Blocking wrapper probing every port on every host. Targets are ordered
+        port by port across hosts, so load is spread and every host gets an
+        RTT sample early.
+        """
+        hosts = list(hosts)
+        ports = list(ports)
+        targets = ((host, port) for port in ports for host in hosts)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.probe(targets, deadline, concurrency))
+        # Called from inside an event loop: run on a private loop in another thread
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, self.probe(targets, deadline, concurrency)).result()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+MOBICURE Scan Result Cache
+Content-addressed cache of scan results keyed by file SHA-256, scanner name
+and ruleset version, with an in-memory LRU tier and an optional SQLite tier
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Optional, Tuple
+
+
+def ruleset_fingerprint(*rules: Any) -> str:
+    """Short stable version string derived from a scanner's rule tables"""
+    encoded = json.dumps(rules, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+class ScanResultCache:
+    """
+    Two-tier result cache. Entries expire after ttl_seconds; the memory tier is
+    additionally bounded by entry count and total serialized size, the SQLite
+    tier by entry count. Results are stored as JSON so callers always receive
+    their own copy.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024,
+                 ttl_seconds: float = 24 * 3600, db_path: Optional[str] = None,
+                 db_max_entries: int = 100000):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.db_max_entries = db_max_entries
+
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._db = None
+        self.counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expired": 0
+        }
+
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS scan_results (
+                    cache_key TEXT PRIMARY KEY,
+                    sha256 TEXT NOT NULL,
+                    scanner TEXT NOT NULL,
+                    ruleset TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    result TEXT NOT NULL
+                )
+            """)
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_scan_results_expires ON scan_results (expires_at)")
+            self._db.commit()
+
+    @staticmethod
+    def make_key(sha256: str, scanner: str, ruleset: str) -> str:
+        return f"{scanner}:{ruleset}:{sha256.lower()}"
+
+    def get(self, sha256: str, scanner: str, ruleset: str) -> Optional[Dict[str, Any]]:
+        """Return a cached result, or None on a miss"""
+        key = self.make_key(sha256, scanner, ruleset)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, payload = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return json.loads(payload)
+                self._drop_memory(key)
+                self.counters["expired"] += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT expires_at, result FROM scan_results WHERE cache_key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    expires_at, payload = row
+                    if expires_at > now:
+                        self._put_memory(key, expires_at, payload)
+                        self.counters["disk_hits"] += 1
+                        return json.loads(payload)
+                    self._db.execute("DELETE FROM scan_results WHERE cache_key = ?", (key,))
+                    self._db.commit()
+                    self.counters["expired"] += 1
+
+            self.counters["misses"] += 1
+            return None
+
+    def put(self, sha256: str, scanner: str, ruleset: str, result: Dict[str, Any]):
+        """Store a scan result; results carrying an error are never cached"""
+        if not isinstance(result, dict) or "error" in result:
+            return
+
+        key = self.make_key(sha256, scanner, ruleset)
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        payload = json.dumps(result, default=str)
+
+        with self._lock:
+            self._put_memory(key, expires_at, payload)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO scan_results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, sha256.lower(), scanner, ruleset, now, expires_at, payload)
+                )
+                self._evict_disk(now)
+                self._db.commit()
+            self.counters["stores"] += 1
+
+    def get_or_compute(self, sha256: str, scanner: str, ruleset: str,
+                       compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Answer from the cache, or run the scan and remember its result"""
+        cached = self.get(sha256, scanner, ruleset)
+        if cached is not None:
+            return cached
+        result = compute()
+        self.put(sha256, scanner, ruleset, result)
+        return result
+
+    def invalidate(self, sha256: str, scanner: Optional[str] = None):
+        """Drop every cached result for a file, optionally for one scanner only"""
+        sha256 = sha256.lower()
+        with self._lock:
+            for key in [k for k in self._memory if k.endswith(":" + sha256)]:
+                if scanner is None or key.startswith(scanner + ":"):
+                    self._drop_memory(key)
+            if self._db is not None:
+                if scanner is None:
+                    self._db.execute("DELETE FROM scan_results WHERE sha256 = ?", (sha256,))
+                else:
+                    self._db.execute("DELETE FROM scan_results WHERE sha256 = ? AND scanner = ?", (sha256, scanner))
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and tier sizes"""
+        with self._lock:
+            lookups = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+            hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+            stats = dict(self.counters)
+            stats.update({
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes
+            })
+            if self._db is not None:
+                stats["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM scan_results").fetchone()[0]
+            return stats
+
+    def _put_memory(self, key: str, expires_at: float, payload: str):
+        if key in self._memory:
+            self._drop_memory(key)
+        if len(payload) > self.max_bytes:
+            return
+        self._memory[key] = (expires_at, payload)
+        self._memory_bytes += len(payload)
+        while len(self._memory) > self.max_entries or self._memory_bytes > self.max_bytes:
+            oldest = next(iter(self._memory))
+            self._drop_memory(oldest)
+            self.counters["evictions"] += 1
+
+    def _drop_memory(self, key: str):
+        _, payload = self._memory.pop(key)
+        self._memory_bytes -= len(payload)
+
+    def _evict_disk(self, now: float):
+        self._db.execute("DELETE FROM scan_results WHERE expires_at <= ?", (now,))
+        excess = self._db.execute("SELECT COUNT(*) FROM scan_results").fetchone()[0] - self.db_max_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM scan_results WHERE cache_key IN "
+                "(SELECT cache_key FROM scan_results ORDER BY created_at LIMIT ?)", (excess,)
+            )
+            self.counters["evictions"] += excess
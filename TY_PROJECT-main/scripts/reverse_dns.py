@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+MOBICURE Reverse DNS
+Concurrent PTR lookups with per-query timeouts and a TTL cache shared
+across scans
+"""
+
+import socket
+import asyncio
+import threading
+import concurrent.futures
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+from lookup_cache import TTLCache
+
+try:
+    import dns.asyncresolver
+    import dns.exception
+except ImportError:  # dnspython is optional; fall back to the system resolver
+    dns = None
+
+_MISSING = object()
+
+
+class ReverseDNSResolver:
+    """
+    Resolves IP addresses to hostnames on an event loop. With dnspython the
+    queries are asynchronous and cached for their record TTL (clamped to
+    [min_ttl, max_ttl]). Addresses DNS cannot name, and all addresses without
+    dnspython, go to socket.gethostbyaddr on a bounded thread pool, so names
+    from /etc/hosts, NSS and mDNS are still found (most LAN devices have no
+    upstream PTR record); those answers are cached for max_ttl. Addresses
+    nothing can name, or whose query exceeds timeout seconds, resolve to None
+    and are remembered for negative_ttl seconds so one slow server is only
+    waited on once.
+    """
+
+    def __init__(self, timeout: float = 2.0, concurrency: int = 64, min_ttl: float = 60.0,
+                 max_ttl: float = 3600.0, negative_ttl: float = 300.0, max_entries: int = 65536):
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        self.cache = TTLCache(max_entries=max_entries, negative_ttl=negative_ttl)
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=self.concurrency, thread_name_prefix="reverse-dns"
+                    )
+        return self._executor
+
+    async def _query(self, ip: str) -> Tuple[Optional[str], float]:
+        """(hostname or None, seconds to cache it)"""
+        if dns is not None:
+            try:
+                answer = await dns.asyncresolver.resolve_address(ip, lifetime=self.timeout)
+            except dns.exception.DNSException:
+                pass  # NXDOMAIN, no answer or timeout: the system resolver may still know it
+            else:
+                ttl = answer.rrset.ttl if answer.rrset is not None else self.min_ttl
+                return str(answer[0].target).rstrip("."), min(self.max_ttl, max(self.min_ttl, ttl))
+
+        loop = asyncio.get_running_loop()
+        try:
+            hostname = await asyncio.wait_for(
+                loop.run_in_executor(self._get_executor(), socket.gethostbyaddr, ip), self.timeout
+            )
+        except (asyncio.TimeoutError, OSError):
+            return None, self.negative_ttl
+        return hostname[0], self.max_ttl
+
+    async def resolve(self, ip: str) -> Optional[str]:
+        """Hostname for one address, or None"""
+        hostname = self.cache.get(ip, _MISSING)
+        if hostname is not _MISSING:
+            return hostname
+        hostname, ttl = await self._query(ip)
+        self.cache.put(ip, hostname, ttl)
+        return hostname
+
+    async def resolve_many(self, ips: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Hostnames for a batch of addresses, at most concurrency queries at a time"""
+        ips = list(dict.fromkeys(ips))
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(ip):
+            async with slots:
+                return await self.resolve(ip)
+
+        hostnames = await asyncio.gather(*(bounded(ip) for ip in ips))
+        return dict(zip(ips, hostnames))
+
+    def lookup(self, ip: str) -> Optional[str]:
+        """Blocking lookup for callers outside an event loop"""
+        hostname = self.cache.get(ip, _MISSING)
+        if hostname is not _MISSING:
+            return hostname
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.resolve(ip))
+        # Called from inside an event loop: run on a private loop in another thread
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, self.resolve(ip)).result()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.cache.stats()
+        stats["backend"] = "dnspython" if dns is not None else "system"
+        return stats
+
+
+# Process-wide instance so repeated scans reuse PTR answers
+default_reverse_dns = ReverseDNSResolver()
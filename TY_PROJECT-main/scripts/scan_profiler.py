@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+MOBICURE Scan Profiler
+Per-stage wall time, CPU time, bytes processed and peak memory for each
+scan, aggregated into process-wide latency histograms per scanner stage
+"""
+
+import time
+import bisect
+import functools
+import threading
+import contextvars
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, List, Any, Callable, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Profile of the scan running in this context; copied into worker threads with
+# contextvars.copy_context() so stages run elsewhere still land in it
+_current: contextvars.ContextVar = contextvars.ContextVar("mobicure_scan_profile", default=None)
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+class _Stage:
+    """Totals for one stage name within a scan"""
+
+    __slots__ = ("wall", "cpu", "bytes", "calls", "peak_memory")
+
+    def __init__(self):
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.bytes = 0
+        self.calls = 0
+        self.peak_memory = None
+
+    def report(self) -> Dict[str, Any]:
+        report = {
+            "wall_ms": round(self.wall * 1000, 3),
+            "cpu_ms": round(self.cpu * 1000, 3),
+            "calls": self.calls,
+            "bytes": self.bytes,
+        }
+        if self.bytes and self.wall > 0:
+            report["mb_per_sec"] = round(self.bytes / self.wall / 1e6, 1)
+        if self.peak_memory is not None:
+            report["peak_memory_kb"] = round(self.peak_memory / 1024, 1)
+        return report
+
+
+class StageRecord:
+    """Handle yielded by ScanProfile.stage; set .bytes once the amount processed is known"""
+
+    __slots__ = ("bytes",)
+
+    def __init__(self, nbytes: int):
+        self.bytes = nbytes
+
+
+class ScanProfile:
+    """
+    Timings for one scan. Stages are recorded with `with profile.stage(name)`
+    or added from measurements taken elsewhere with add(). CPU time is the
+    calling thread's, so stages overlapping on other threads are counted
+    where they run. With trace_memory, tracemalloc reports the peak Python
+    allocation inside each stage; this slows the scan down and is meant for
+    requests that ask for it.
+    """
+
+    def __init__(self, scanner: str, trace_memory: bool = False):
+        self.scanner = scanner
+        self.trace_memory = trace_memory
+        self.stages: Dict[str, _Stage] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._started_tracing = False
+        self._token = None
+        self.started = time.perf_counter()
+        self._cpu_started = time.process_time()
+        self.finished = None
+
+    def __enter__(self) -> "ScanProfile":
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _current.reset(self._token)
+        self.finish()
+        return False
+
+    def _stage(self, name: str) -> _Stage:
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages.setdefault(name, _Stage())
+        return stage
+
+    def add(self, name: str, wall: float, cpu: float = 0.0, nbytes: int = 0, calls: int = 1):
+        """Add an externally measured duration (seconds) to a stage"""
+        with self._lock:
+            stage = self._stage(name)
+            stage.wall += wall
+            stage.cpu += cpu
+            stage.bytes += nbytes
+            stage.calls += calls
+
+    @contextmanager
+    def stage(self, name: str, nbytes: int = 0):
+        record = StageRecord(nbytes)
+        # Nested stages share tracemalloc's single peak counter; each stage
+        # resets it on entry and hands its own peak back to the enclosing one
+        stack = self._memory_stack() if self.trace_memory else None
+        if stack is not None:
+            if stack:
+                stack[-1] = max(stack[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            stack.append(0)
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield record
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.thread_time() - cpu_start
+            peak = None
+            if stack is not None:
+                peak = max(stack.pop(), tracemalloc.get_traced_memory()[1])
+                if stack:
+                    stack[-1] = max(stack[-1], peak)
+                tracemalloc.reset_peak()
+            with self._lock:
+                stage = self._stage(name)
+                stage.wall += wall
+                stage.cpu += cpu
+                stage.bytes += record.bytes
+                stage.calls += 1
+                if peak is not None:
+                    stage.peak_memory = max(stage.peak_memory or 0, peak)
+
+    def _memory_stack(self) -> Optional[List[int]]:
+        if not tracemalloc.is_tracing():
+            return None
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def finish(self, metrics: Optional["StageHistograms"] = None):
+        """Stop the clock and record the stage totals in the histograms (once)"""
+        if self.finished is not None:
+            return
+        self.finished = time.perf_counter()
+        self._cpu_finished = time.process_time()
+        if self._started_tracing:
+            tracemalloc.stop()
+        (metrics or default_stage_metrics).record(self)
+
+    def report(self) -> Dict[str, Any]:
+        end = self.finished if self.finished is not None else time.perf_counter()
+        cpu_end = self._cpu_finished if self.finished is not None else time.process_time()
+        with self._lock:
+            stages = {name: stage.report() for name, stage in self.stages.items()}
+        report = {
+            "scanner": self.scanner,
+            "total_ms": round((end - self.started) * 1000, 3),
+            "process_cpu_ms": round((cpu_end - self._cpu_started) * 1000, 3),
+            "stages": stages,
+        }
+        if resource is not None:
+            # Linux reports KiB, macOS bytes
+            report["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return report
+
+    def attach(self, result: Any) -> Any:
+        """Add the report to a scan result under "profile" (dict results only)"""
+        if isinstance(result, dict):
+            result["profile"] = self.report()
+        return result
+
+
+def current_profile() -> Optional[ScanProfile]:
+    return _current.get()
+
+
+@contextmanager
+def stage(name: str, nbytes: int = 0):
+    """Record a stage in the current scan's profile; a no-op outside a profiled scan"""
+    profile = _current.get()
+    if profile is None:
+        yield StageRecord(nbytes)
+        return
+    with profile.stage(name, nbytes) as record:
+        yield record
+
+
+def add_stage(name: str, wall: float, cpu: float = 0.0, nbytes: int = 0, calls: int = 1):
+    """ScanProfile.add on the current profile, if any"""
+    profile = _current.get()
+    if profile is not None:
+        profile.add(name, wall, cpu, nbytes, calls)
+
+
+def profiled(scanner: str) -> Callable:
+    """
+    Decorator for a scanner's entry point: opens a profile for the call
+    unless the caller already opened one, so every scan reaches the
+    histograms and callers that want the report can wrap the call themselves
+    """
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            if _current.get() is not None:
+                return method(*args, **kwargs)
+            with ScanProfile(scanner):
+                return method(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class _Histogram:
+    __slots__ = ("counts", "count", "total")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value_ms: float):
+        self.counts[bisect.bisect_left(BUCKETS_MS, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th observation (None past the last bound)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else None
+        return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum_ms": round(self.total, 3),
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "buckets": {
+                (f"le_{bound}" if i < len(BUCKETS_MS) else "inf"): count
+                for i, (bound, count) in enumerate(zip(BUCKETS_MS + (None,), self.counts)) if count
+            },
+        }
+
+
+class StageHistograms:
+    """
+    Process-wide latency histograms: one per (scanner, stage) for wall time
+    per scan, plus running CPU time and byte totals, and one per scanner for
+    the whole scan
+    """
+
+    def __init__(self):
+        self._histograms: Dict[str, Dict[str, _Histogram]] = {}
+        self._totals: Dict[str, Dict[str, Dict[str, float]]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, profile: ScanProfile):
+        report = profile.report()
+        with self._lock:
+            histograms = self._histograms.setdefault(profile.scanner, {})
+            totals = self._totals.setdefault(profile.scanner, {})
+            histograms.setdefault("total", _Histogram()).observe(report["total_ms"])
+            for name, stage in report["stages"].items():
+                histograms.setdefault(name, _Histogram()).observe(stage["wall_ms"])
+                stage_totals = totals.setdefault(name, {"cpu_ms": 0.0, "bytes": 0, "calls": 0})
+                stage_totals["cpu_ms"] += stage["cpu_ms"]
+                stage_totals["bytes"] += stage["bytes"]
+                stage_totals["calls"] += stage["calls"]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = {}
+            for scanner, histograms in self._histograms.items():
+                stages = {}
+                for name, histogram in histograms.items():
+                    stages[name] = histogram.snapshot()
+                    totals = self._totals[scanner].get(name)
+                    if totals is not None:
+                        stages[name].update(
+                            cpu_ms=round(totals["cpu_ms"], 3), bytes=totals["bytes"], calls=totals["calls"]
+                        )
+                snapshot[scanner] = stages
+            return snapshot
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._totals.clear()
+
+
+# Process-wide instance shared by every scanner in this process
+default_stage_metrics = StageHistograms()
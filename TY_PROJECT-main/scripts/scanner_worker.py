@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+MOBICURE Scanner Worker
+Long-lived worker that keeps pre-initialized scanners warm and serves
+line-delimited JSON requests over stdin/stdout or a Unix socket
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import importlib
+import threading
+import socketserver
+import concurrent.futures
+from contextlib import contextmanager
+from typing import Dict, List, Any, Callable, Optional, Tuple
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+from file_hasher import default_hasher
+from result_cache import ScanResultCache
+from lookup_cache import default_lookup_cache
+from scan_profiler import ScanProfile, default_stage_metrics
+
+
+def _read_payload(path: str) -> Tuple[bytes, Dict[str, str]]:
+    """Read a file for the bytes-based scanners, reusing cached digests"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    hashes = default_hasher.cached(path)
+    if hashes is None:
+        hashes = default_hasher.hash_bytes(data)
+        default_hasher.store(path, hashes)
+    return data, hashes
+
+
+def _scan_payload(method, params: Dict[str, Any]) -> Any:
+    data, hashes = _read_payload(params["path"])
+    return method(data, params.get("filename", os.path.basename(params["path"])), hashes=hashes)
+
+
+# tool name -> (module, class, call adapter taking (instance, params))
+SCANNER_REGISTRY: Dict[str, Tuple[str, str, Callable[[Any, Dict[str, Any]], Any]]] = {
+    "malware_scanner": (
+        "malware_scanner_service", "MalwareScanner",
+        lambda scanner, params: scanner.scan_file(params["path"])
+    ),
+    "file_scanner": (
+        "file_scanner_service", "FileScanner",
+        lambda scanner, params: scanner.analyze_file(params["path"])
+    ),
+    "apk_analyzer": (
+        "apk_analyzer_service", "APKAnalyzer",
+        lambda scanner, params: scanner.analyze_apk(params["path"])
+    ),
+    "pdf_scanner": (
+        "pdf_security_scanner", "PDFSecurityScanner",
+        lambda scanner, params: _scan_payload(scanner.scan_pdf_file, params)
+    ),
+    "zip_scanner": (
+        "zip_security_scanner", "ZipSecurityScanner",
+        lambda scanner, params: _scan_payload(scanner.scan_zip_file, params)
+    ),
+    "url_threat_scanner": (
+        "url_threat_scanner_service", "URLThreatScanner",
+        lambda scanner, params: scanner.comprehensive_scan(params["url"])
+    ),
+    "url_scanner": (
+        "url_scanner_service", "URLSecurityScanner",
+        lambda scanner, params: scanner.scan_url(params["url"])
+    ),
+    "network_scanner": (
+        "network_scanner_service", "NetworkScanner",
+        lambda scanner, params: scanner.scan_network(params.get("network_range"))
+    ),
+    "breach_checker": (
+        "breach_checker_service", "BreachChecker",
+        lambda scanner, params: scanner.check_email_breaches(params["email"])
+    ),
+}
+
+
+# File tools whose results are cached by content hash -> result key holding the file name
+RESULT_CACHE_TOOLS = {
+    "malware_scanner": "fileName",
+    "apk_analyzer": "filename",
+    "pdf_scanner": "fileName",
+    "zip_scanner": "fileName",
+}
+
+
+class ScannerPool:
+    """Pool of pre-initialized scanner instances, one queue per tool"""
+
+    def __init__(self, pool_size: int = 1, result_cache: Optional[ScanResultCache] = None):
+        self.pool_size = max(1, pool_size)
+        self.result_cache = result_cache
+        self._pools: Dict[str, queue.Queue] = {}
+        self._unavailable: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0, "started": time.time()}
+
+    def warm(self, tools: Optional[List[str]] = None) -> Dict[str, str]:
+        """Import and instantiate scanners up front, returning their status"""
+        status = {}
+        for tool in tools or list(SCANNER_REGISTRY):
+            try:
+                self._get_pool(tool)
+                status[tool] = "ready"
+            except Exception as e:
+                status[tool] = f"unavailable: {str(e)}"
+        return status
+
+    def _get_pool(self, tool: str) -> queue.Queue:
+        pool = self._pools.get(tool)
+        if pool is not None:
+            return pool
+
+        with self._lock:
+            if tool in self._pools:
+                return self._pools[tool]
+            if tool in self._unavailable:
+                raise RuntimeError(self._unavailable[tool])
+            if tool not in SCANNER_REGISTRY:
+                raise KeyError(f"Unknown tool: {tool}")
+
+            module_name, class_name, _ = SCANNER_REGISTRY[tool]
+            try:
+                module = importlib.import_module(module_name)
+                scanner_class = getattr(module, class_name)
+                pool = queue.Queue()
+                for _ in range(self.pool_size):
+                    pool.put(scanner_class())
+            except Exception as e:
+                self._unavailable[tool] = f"{tool} failed to initialize: {str(e)}"
+                raise RuntimeError(self._unavailable[tool])
+
+            self._pools[tool] = pool
+            return pool
+
+    @contextmanager
+    def acquire(self, tool: str):
+        """Borrow a warm scanner instance for the duration of one request"""
+        pool = self._get_pool(tool)
+        scanner = pool.get()
+        try:
+            yield scanner
+        finally:
+            pool.put(scanner)
+
+    def run(self, tool: str, params: Dict[str, Any]) -> Any:
+        """Run one scan on a pooled scanner instance"""
+        with self.acquire(tool) as scanner:
+            _, _, call = SCANNER_REGISTRY[tool]
+            if self.result_cache is None or tool not in RESULT_CACHE_TOOLS or "path" not in params:
+                return call(scanner, params)
+
+            path = params["path"]
+            sha256 = default_hasher.hash_file(path)["sha256"]
+            ruleset = getattr(scanner, "ruleset_version", "unversioned")
+            result = self.result_cache.get(sha256, tool, ruleset)
+            if result is None:
+                result = call(scanner, params)
+                self.result_cache.put(sha256, tool, ruleset, result)
+                return result
+
+            # Identical content may arrive under a different name or extension
+            refresh = getattr(scanner, "refresh_cached_result", None)
+            if refresh is not None:
+                result = refresh(result, path)
+            name_key = RESULT_CACHE_TOOLS[tool]
+            if isinstance(result, dict) and name_key in result:
+                result[name_key] = params.get("filename", os.path.basename(path))
+            return result
+
+    def describe(self) -> Dict[str, Any]:
+        """Report pool state and request counters"""
+        return {
+            "ready": sorted(self._pools),
+            "unavailable": dict(self._unavailable),
+            "pool_size": self.pool_size,
+            "requests": self.stats["requests"],
+            "errors": self.stats["errors"],
+            "hash_cache": {"hits": default_hasher.hits, "misses": default_hasher.misses},
+            "result_cache": self.result_cache.stats() if self.result_cache is not None else None,
+            "lookup_cache": default_lookup_cache.stats(),
+            "stages": default_stage_metrics.snapshot(),
+            "uptime": round(time.time() - self.stats["started"], 3)
+        }
+
+
+class ScannerWorker:
+    """Line-delimited JSON request dispatcher on top of a ScannerPool"""
+
+    def __init__(self, pool: ScannerPool):
+        self.pool = pool
+        self.shutdown_requested = threading.Event()
+
+    def handle_line(self, line: str) -> Optional[Dict[str, Any]]:
+        """Handle one request line and return the response object"""
+        line = line.strip()
+        if not line:
+            return None
+
+        start = time.perf_counter()
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            op = request.get("op", "scan")
+
+            if op == "ping":
+                result = {"pong": True}
+            elif op == "stats":
+                result = self.pool.describe()
+            elif op == "warm":
+                result = self.pool.warm(request.get("tools"))
+            elif op == "shutdown":
+                self.shutdown_requested.set()
+                result = {"shutdown": True}
+            elif op == "scan":
+                self.pool.stats["requests"] += 1
+                # "profile": true attaches per-stage timings; "trace_memory" adds per-stage peaks
+                with ScanProfile(request["tool"], trace_memory=bool(request.get("trace_memory"))) as profile:
+                    result = self.pool.run(request["tool"], request.get("params", {}))
+                if request.get("profile"):
+                    profile.attach(result)
+            else:
+                raise ValueError(f"Unknown op: {op}")
+
+            return {
+                "id": request_id,
+                "ok": True,
+                "result": result,
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 3)
+            }
+        except Exception as e:
+            self.pool.stats["errors"] += 1
+            return {
+                "id": request_id,
+                "ok": False,
+                "error": f"{type(e).__name__}: {str(e)}",
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 3)
+            }
+
+    def serve_stdio(self, concurrency: int = 1):
+        """Serve requests from stdin, writing one response line per request to stdout"""
+        # Scanners print progress messages; keep them off the protocol channel
+        out = sys.stdout
+        sys.stdout = sys.stderr
+        write_lock = threading.Lock()
+
+        def respond(response):
+            if response is None:
+                return
+            with write_lock:
+                out.write(json.dumps(response, default=str) + "\n")
+                out.flush()
+
+        if concurrency <= 1:
+            for line in sys.stdin:
+                respond(self.handle_line(line))
+                if self.shutdown_requested.is_set():
+                    break
+            return
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for line in sys.stdin:
+                future = executor.submit(self.handle_line, line)
+                future.add_done_callback(lambda f: respond(f.result()))
+                if self.shutdown_requested.is_set():
+                    break
+
+    def serve_unix_socket(self, socket_path: str):
+        """Serve requests over a Unix socket, one thread per connection"""
+        sys.stdout = sys.stderr
+        worker = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for raw in self.rfile:
+                    response = worker.handle_line(raw.decode('utf-8', errors='replace'))
+                    if response is not None:
+                        self.wfile.write((json.dumps(response, default=str) + "\n").encode())
+                        self.wfile.flush()
+                    if worker.shutdown_requested.is_set():
+                        threading.Thread(target=self.server.shutdown, daemon=True).start()
+                        break
+
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+        socketserver.ThreadingUnixStreamServer.daemon_threads = True
+        with socketserver.ThreadingUnixStreamServer(socket_path, Handler) as server:
+            try:
+                server.serve_forever()
+            finally:
+                if os.path.exists(socket_path):
+                    os.unlink(socket_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MOBICURE long-lived scanner worker")
+    parser.add_argument("--socket", help="Serve on this Unix socket path instead of stdin/stdout")
+    parser.add_argument("--pool-size", type=int, default=None,
+                        help="Pre-initialized instances per scanner (default: concurrency)")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Concurrent requests handled in stdio mode")
+    parser.add_argument("--preload", default="all",
+                        help="Comma-separated tools to warm at startup, 'all' or 'none'")
+    parser.add_argument("--no-result-cache", action="store_true",
+                        help="Always rescan files instead of reusing results for identical content")
+    parser.add_argument("--result-cache-db", default=os.environ.get("MOBICURE_RESULT_CACHE_DB"),
+                        help="SQLite file that keeps cached results across restarts")
+    parser.add_argument("--result-cache-ttl", type=float, default=24 * 3600,
+                        help="Seconds a cached result stays valid")
+    args = parser.parse_args()
+
+    result_cache = None
+    if not args.no_result_cache:
+        result_cache = ScanResultCache(ttl_seconds=args.result_cache_ttl, db_path=args.result_cache_db)
+
+    pool = ScannerPool(pool_size=args.pool_size or args.concurrency, result_cache=result_cache)
+    if args.preload == "all":
+        status = pool.warm()
+    elif args.preload != "none":
+        status = pool.warm([t.strip() for t in args.preload.split(',') if t.strip()])
+    else:
+        status = {}
+    print(json.dumps({"worker": "ready", "tools": status}), file=sys.stderr, flush=True)
+
+    worker = ScannerWorker(pool)
+    if args.socket:
+        worker.serve_unix_socket(args.socket)
+    else:
+        worker.serve_stdio(concurrency=args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
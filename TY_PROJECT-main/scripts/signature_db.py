@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+"""
+MOBICURE Signature Database
+Memory-mapped index of known-bad MD5/SHA1/SHA256 digests with a Bloom filter
+in front, layered base + delta files and a builder CLI
+"""
+
+import os
+import sys
+import json
+import mmap
+import time
+import heapq
+import struct
+import hashlib
+import argparse
+import threading
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Tuple
+
+MAGIC = b"MCSIGDB1"
+FORMAT_VERSION = 1
+
+DIGEST_SIZES = {"md5": 16, "sha1": 20, "sha256": 32}
+ALGORITHMS = tuple(DIGEST_SIZES)
+ALGORITHM_BY_HEX_LENGTH = {size * 2: name for name, size in DIGEST_SIZES.items()}
+
+# magic, version, section count, build id, created at, string table offset, string count
+HEADER = struct.Struct("<8sHH16sdQQ")
+# algorithm, digest size, bloom hash count, record count, fanout offset,
+# records offset, bloom offset, bloom size in bits
+SECTION = struct.Struct("<8sHHQQQQQ")
+NAME_ID = struct.Struct("<I")
+FANOUT = struct.Struct("<257Q")
+
+# Name id marking a digest removed by a delta
+TOMBSTONE = 0xFFFFFFFF
+
+BLOOM_BITS_PER_ENTRY = 10
+BLOOM_HASHES = 7  # ~0.8% false positives at 10 bits per entry
+
+BASE_FILE = "base.sigdb"
+DELTA_PREFIX = "delta-"
+SUFFIX = ".sigdb"
+
+
+def _bloom_positions(digest: bytes, bits: int, hashes: int) -> Iterator[int]:
+    # Digests are already uniformly distributed, so two slices of the digest
+    # serve as the two base hashes for double hashing
+    h1 = int.from_bytes(digest[:8], "little")
+    h2 = int.from_bytes(digest[8:16], "little") | 1
+    for i in range(hashes):
+        yield (h1 + i * h2) % bits
+
+
+class SignatureIndexWriter:
+    """
+    Writes one index file. Sections are streamed to disk one algorithm at a
+    time from records already sorted by digest, so building or compacting does
+    not need the whole database in memory at once.
+    """
+
+    def __init__(self, path: str, bits_per_entry: int = BLOOM_BITS_PER_ENTRY):
+        self.path = path
+        self.bits_per_entry = bits_per_entry
+        self._tmp_path = path + ".tmp"
+        self._file = open(self._tmp_path, "wb")
+        self._file.write(b"\0" * (HEADER.size + SECTION.size * len(ALGORITHMS)))
+        self._sections: List[bytes] = []
+        self._strings: List[bytes] = []
+        self._string_ids: Dict[Tuple[str, str], int] = {}
+
+    def intern(self, name: str, severity: str) -> int:
+        """Id of a (name, severity) entry in the string table"""
+        key = (name, severity)
+        name_id = self._string_ids.get(key)
+        if name_id is None:
+            name_id = len(self._strings)
+            self._strings.append(f"{name}\0{severity}".encode("utf-8"))
+            self._string_ids[key] = name_id
+        return name_id
+
+    def add_section(self, algorithm: str, records: Iterable[Tuple[bytes, int]], expected_count: int) -> int:
+        """Write (digest, name id) records, sorted by digest and unique, returning how many were written"""
+        digest_size = DIGEST_SIZES[algorithm]
+        bloom_bits = max(64, expected_count * self.bits_per_entry)
+        bloom_bits += -bloom_bits % 8
+        bloom = bytearray(bloom_bits // 8)
+        counts = [0] * 257
+
+        f = self._file
+        records_offset = f.tell()
+        batch = bytearray()
+        previous = None
+        count = 0
+        for digest, name_id in records:
+            if len(digest) != digest_size:
+                raise ValueError(f"{algorithm} digest must be {digest_size} bytes")
+            if previous is not None and digest <= previous:
+                raise ValueError(f"{algorithm} records are not sorted and unique")
+            previous = digest
+
+            batch += digest
+            batch += NAME_ID.pack(name_id)
+            counts[digest[0] + 1] += 1
+            for bit in _bloom_positions(digest, bloom_bits, BLOOM_HASHES):
+                bloom[bit >> 3] |= 1 << (bit & 7)
+            count += 1
+            if len(batch) >= 1024 * 1024:
+                f.write(batch)
+                batch.clear()
+        f.write(batch)
+
+        # fanout[b] = number of records whose first byte is below b
+        for i in range(1, 257):
+            counts[i] += counts[i - 1]
+        fanout_offset = f.tell()
+        f.write(FANOUT.pack(*counts))
+        bloom_offset = f.tell()
+        f.write(bloom)
+
+        self._sections.append(SECTION.pack(
+            algorithm.encode("ascii"), digest_size, BLOOM_HASHES, count,
+            fanout_offset, records_offset, bloom_offset, bloom_bits
+        ))
+        return count
+
+    def close(self, build_id: Optional[bytes] = None):
+        """Write the string table and header, then atomically move the file into place"""
+        f = self._file
+        strings_offset = f.tell()
+        offsets = [0]
+        for entry in self._strings:
+            offsets.append(offsets[-1] + len(entry))
+        f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        f.write(b"".join(self._strings))
+
+        f.seek(0)
+        f.write(HEADER.pack(
+            MAGIC, FORMAT_VERSION, len(self._sections), build_id or os.urandom(16),
+            time.time(), strings_offset, len(self._strings)
+        ))
+        for section in self._sections:
+            f.write(section)
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.unlink(self._tmp_path)
+
+
+class SignatureIndex:
+    """
+    Read-only view of one index file. Lookups check the Bloom filter, narrow
+    the range with a 256-way fanout table on the first digest byte and binary
+    search the fixed-width records in the memory map.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, section_count, build_id, created_at, strings_offset, strings_count = \
+            HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a signature index")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} has unsupported format version {version}")
+
+        self.build_id = build_id.hex()
+        self.created_at = created_at
+        self._strings_offset = strings_offset
+        self._strings_count = strings_count
+        self._names: Dict[int, Dict[str, str]] = {}
+
+        # algorithm -> (digest size, hashes, count, fanout offset, records offset, bloom offset, bloom bits)
+        self._sections: Dict[str, Tuple[int, ...]] = {}
+        for i in range(section_count):
+            algorithm, *fields = SECTION.unpack_from(self._mm, HEADER.size + i * SECTION.size)
+            self._sections[algorithm.rstrip(b"\0").decode("ascii")] = tuple(fields)
+
+    def counts(self) -> Dict[str, int]:
+        return {algorithm: section[2] for algorithm, section in self._sections.items()}
+
+    def find(self, algorithm: str, digest: bytes) -> Optional[int]:
+        """Name id for the digest (possibly TOMBSTONE), or None if it is not in this index"""
+        section = self._sections.get(algorithm)
+        if section is None:
+            return None
+        digest_size, hashes, count, fanout_offset, records_offset, bloom_offset, bloom_bits = section
+        if len(digest) != digest_size or not count:
+            return None
+
+        mm = self._mm
+        for bit in _bloom_positions(digest, bloom_bits, hashes):
+            if not mm[bloom_offset + (bit >> 3)] & (1 << (bit & 7)):
+                return None
+
+        lo, hi = struct.unpack_from("<QQ", mm, fanout_offset + digest[0] * 8)
+        width = digest_size + NAME_ID.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = records_offset + mid * width
+            probe = mm[offset:offset + digest_size]
+            if probe < digest:
+                lo = mid + 1
+            elif probe > digest:
+                hi = mid
+            else:
+                return NAME_ID.unpack_from(mm, offset + digest_size)[0]
+        return None
+
+    def entry(self, name_id: int) -> Dict[str, str]:
+        """Decode a string table entry into {"name", "severity"}"""
+        entry = self._names.get(name_id)
+        if entry is None:
+            if not 0 <= name_id < self._strings_count:
+                raise ValueError(f"Invalid name id {name_id} in {self.path}")
+            start, end = struct.unpack_from("<II", self._mm, self._strings_offset + name_id * 4)
+            blob_offset = self._strings_offset + (self._strings_count + 1) * 4
+            name, severity = self._mm[blob_offset + start:blob_offset + end].decode("utf-8").split("\0", 1)
+            entry = self._names[name_id] = {"name": name, "severity": severity}
+        return dict(entry)
+
+    def iter_records(self, algorithm: str) -> Iterator[Tuple[bytes, int]]:
+        """Yield (digest, name id) in digest order"""
+        section = self._sections.get(algorithm)
+        if section is None:
+            return
+        digest_size, _, count, _, records_offset, _, _ = section
+        width = digest_size + NAME_ID.size
+        mm = self._mm
+        for i in range(count):
+            offset = records_offset + i * width
+            yield mm[offset:offset + digest_size], NAME_ID.unpack_from(mm, offset + digest_size)[0]
+
+
+def _layer_files(directory: str) -> List[str]:
+    """Index files in lookup order: base first, then deltas oldest to newest"""
+    try:
+        names = [n for n in os.listdir(directory) if n.endswith(SUFFIX)]
+    except FileNotFoundError:
+        return []
+    deltas = sorted(n for n in names if n.startswith(DELTA_PREFIX))
+    ordered = ([BASE_FILE] if BASE_FILE in names else []) + deltas
+    return [os.path.join(directory, n) for n in ordered]
+
+
+class SignatureDatabase:
+    """
+    Base index plus delta indexes in one directory, newest delta first, over an
+    optional built-in {hex digest: {"name", "severity"}} table. New deltas are
+    picked up without restarting: the directory is rechecked at most once per
+    refresh_interval seconds.
+    """
+
+    def __init__(self, directory: Optional[str] = None, builtin: Optional[Dict[str, Dict[str, str]]] = None,
+                 refresh_interval: float = 5.0):
+        self.directory = directory
+        self.builtin = {k.lower(): v for k, v in (builtin or {}).items()}
+        self.refresh_interval = refresh_interval
+        self._layers: Tuple[SignatureIndex, ...] = ()
+        self._listing: Tuple = ()
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.refresh(force=True)
+
+    def refresh(self, force: bool = False) -> bool:
+        """Reopen the layer files if any were added, replaced or removed"""
+        if not self.directory:
+            return False
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.refresh_interval:
+            return False
+
+        with self._lock:
+            self._checked_at = now
+            listing = []
+            for path in _layer_files(self.directory):
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                listing.append((path, stat.st_ino, stat.st_mtime_ns, stat.st_size))
+            listing = tuple(listing)
+            if listing == self._listing:
+                return False
+
+            opened = {layer.path: layer for layer in self._layers}
+            previous = dict((entry[0], entry) for entry in self._listing)
+            layers = []
+            for entry in listing:
+                path = entry[0]
+                if path in opened and previous.get(path) == entry:
+                    layers.append(opened[path])
+                else:
+                    layers.append(SignatureIndex(path))
+            # Old maps are left to the garbage collector; a concurrent lookup may still use them
+            self._layers = tuple(reversed(layers))
+            self._listing = listing
+            return True
+
+    def lookup(self, algorithm: str, digest_hex: str) -> Optional[Dict[str, str]]:
+        """Signature entry for a hex digest, or None if it is not known to be malicious"""
+        try:
+            digest = bytes.fromhex(digest_hex)
+        except ValueError:
+            return None
+        for layer in self._layers:
+            name_id = layer.find(algorithm, digest)
+            if name_id is not None:
+                return None if name_id == TOMBSTONE else layer.entry(name_id)
+        entry = self.builtin.get(digest_hex.lower())
+        return dict(entry) if entry is not None else None
+
+    @property
+    def version(self) -> str:
+        """Changes whenever any layer or the built-in table changes"""
+        parts = [layer.build_id for layer in self._layers]
+        parts.append(json.dumps(self.builtin, sort_keys=True))
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "directory": self.directory,
+            "layers": [
+                {"path": layer.path, "build_id": layer.build_id, "counts": layer.counts()}
+                for layer in reversed(self._layers)
+            ],
+            "builtin": len(self.builtin),
+            "version": self.version
+        }
+
+
+def default_directory() -> str:
+    return os.environ.get(
+        "MOBICURE_SIGNATURE_DB",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "signatures")
+    )
+
+
+def read_signature_source(path: str, default_name: str, default_severity: str) -> Iterator[Tuple[str, bytes, str, str]]:
+    """
+    Parse a signature list: one `digest[,name[,severity]]` per line, '#' comments.
+    The hash type is inferred from the digest length.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            fields = [field.strip() for field in line.split(",", 2)]
+            algorithm = ALGORITHM_BY_HEX_LENGTH.get(len(fields[0]))
+            if algorithm is None:
+                raise ValueError(f"{path}:{line_number}: not an MD5/SHA1/SHA256 digest")
+            try:
+                digest = bytes.fromhex(fields[0])
+            except ValueError:
+                raise ValueError(f"{path}:{line_number}: invalid hex digest")
+            name = fields[1] if len(fields) > 1 and fields[1] else default_name
+            severity = fields[2] if len(fields) > 2 and fields[2] else default_severity
+            yield algorithm, digest, name, severity
+
+
+def write_index(path: str, additions: Iterable[Tuple[str, bytes, str, str]],
+                removals: Iterable[Tuple[str, bytes]] = ()) -> Dict[str, int]:
+    """Build one index file from (algorithm, digest, name, severity) entries and tombstones"""
+    writer = SignatureIndexWriter(path)
+    try:
+        by_algorithm: Dict[str, Dict[bytes, int]] = {algorithm: {} for algorithm in ALGORITHMS}
+        for algorithm, digest, name, severity in additions:
+            by_algorithm[algorithm][digest] = writer.intern(name, severity)
+        for algorithm, digest in removals:
+            by_algorithm[algorithm][digest] = TOMBSTONE
+
+        counts = {}
+        for algorithm, records in by_algorithm.items():
+            counts[algorithm] = writer.add_section(algorithm, sorted(records.items()), len(records))
+            records.clear()
+        writer.close()
+        return counts
+    except BaseException:
+        writer.abort()
+        raise
+
+
+def _tagged_records(layer: SignatureIndex, algorithm: str, priority: int) -> Iterator[Tuple[bytes, int, int]]:
+    for digest, name_id in layer.iter_records(algorithm):
+        yield digest, priority, name_id
+
+
+def compact(directory: str) -> Dict[str, int]:
+    """Fold every delta into a new base index and remove the deltas"""
+    paths = _layer_files(directory)
+    layers = [SignatureIndex(path) for path in reversed(paths)]  # newest first
+    writer = SignatureIndexWriter(os.path.join(directory, BASE_FILE))
+    counts = {}
+    try:
+        for algorithm in ALGORITHMS:
+            expected = sum(layer.counts().get(algorithm, 0) for layer in layers)
+            streams = [_tagged_records(layer, algorithm, priority) for priority, layer in enumerate(layers)]
+
+            def merged():
+                previous = None
+                for digest, priority, name_id in heapq.merge(*streams):
+                    if digest == previous:
+                        continue  # an entry from a newer layer already won
+                    previous = digest
+                    if name_id != TOMBSTONE:
+                        entry = layers[priority].entry(name_id)
+                        yield digest, writer.intern(entry["name"], entry["severity"])
+
+            counts[algorithm] = writer.add_section(algorithm, merged(), expected)
+        writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+
+    for path in paths:
+        if os.path.basename(path) != BASE_FILE:
+            os.unlink(path)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and maintain the MOBICURE signature database")
+    parser.add_argument("--directory", default=default_directory(),
+                        help="Signature database directory (default: $MOBICURE_SIGNATURE_DB or scripts/signatures)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Write a new base index from signature lists")
+    build.add_argument("sources", nargs="+")
+    build.add_argument("--name", default="Known Malware")
+    build.add_argument("--severity", default="high")
+
+    delta = commands.add_parser("delta", help="Add a delta index with new and removed signatures")
+    delta.add_argument("sources", nargs="*")
+    delta.add_argument("--remove", action="append", default=[], help="List of digests to remove")
+    delta.add_argument("--name", default="Known Malware")
+    delta.add_argument("--severity", default="high")
+
+    commands.add_parser("compact", help="Merge all deltas into the base index")
+    commands.add_parser("info", help="Show layers and record counts")
+
+    lookup = commands.add_parser("lookup", help="Look up hex digests")
+    lookup.add_argument("digests", nargs="+")
+
+    args = parser.parse_args()
+
+    try:
+        if args.command in ("build", "delta"):
+            os.makedirs(args.directory, exist_ok=True)
+            additions = (
+                entry for source in args.sources
+                for entry in read_signature_source(source, args.name, args.severity)
+            )
+            if args.command == "build":
+                path = os.path.join(args.directory, BASE_FILE)
+                removals = []
+            else:
+                path = os.path.join(args.directory, f"{DELTA_PREFIX}{time.time_ns()}{SUFFIX}")
+                removals = [
+                    (algorithm, digest) for source in args.remove
+                    for algorithm, digest, _, _ in read_signature_source(source, "", "")
+                ]
+            start = time.perf_counter()
+            counts = write_index(path, additions, removals)
+            result = {"path": path, "counts": counts, "build_seconds": round(time.perf_counter() - start, 3)}
+        elif args.command == "compact":
+            start = time.perf_counter()
+            counts = compact(args.directory)
+            result = {"path": os.path.join(args.directory, BASE_FILE), "counts": counts,
+                      "build_seconds": round(time.perf_counter() - start, 3)}
+        elif args.command == "info":
+            result = SignatureDatabase(args.directory).describe()
+        else:
+            db = SignatureDatabase(args.directory)
+            result = {
+                digest: db.lookup(ALGORITHM_BY_HEX_LENGTH.get(len(digest), ""), digest)
+                for digest in args.digests
+            }
+        print(json.dumps(result, indent=2))
+    except Exception as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
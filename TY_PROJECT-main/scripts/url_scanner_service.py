@@ -14,6 +14,8 @@ import hashlib
 import re
 from typing import Dict, List, Any
 
+from scan_profiler import profiled, stage
+
 class URLSecurityScanner:
     def __init__(self):
         self.malicious_patterns = [
@@ -28,6 +30,7 @@ class URLSecurityScanner:
             'stackoverflow.com', 'wikipedia.org', 'mozilla.org'
         ]
 
+    @profiled("url_scanner")
     def scan_url(self, url: str) -> Dict[str, Any]:
         """
         Comprehensive URL security scan
@@ -60,7 +63,8 @@ class URLSecurityScanner:
             # SSL Certificate check
             if parsed_url.scheme == 'https':
                 try:
-                    ssl_info = self._check_ssl_certificate(domain, 443)
+                    with stage("ssl"):
+                        ssl_info = self._check_ssl_certificate(domain, 443)
                     if ssl_info['valid']:
                         security_score += 10
                     else:
@@ -1,45 +1,221 @@
 import requests
 import ssl
 import socket
-import dns.resolver
-import whois
 import hashlib
 import json
 from urllib.parse import urlparse
 from datetime import datetime
 import subprocess
 import re
+import time
+import threading
+import contextvars
+import concurrent.futures
+from collections import OrderedDict, deque
+
+import scan_profiler
+from lookup_cache import default_lookup_cache
+
+# perf_counter time by which the network calls of the running scan must finish
+_scan_deadline = contextvars.ContextVar("url_scan_deadline", default=None)
 
 class URLThreatScanner:
-    def __init__(self):
+    def __init__(self, max_workers=6, deadline=12.0, per_host_connections=4, max_sessions=256):
         self.malware_databases = [
             "https://www.malwaredomainlist.com/hostslist/hosts.txt",
             "https://someonewhocares.org/hosts/zero/hosts"
         ]
         
-    def comprehensive_scan(self, url):
-        """Perform comprehensive URL threat analysis"""
+        # DNS answers and WHOIS records shared across scans and stages
+        self.lookups = default_lookup_cache
+        
+        # Overall time budget for one scan; individual network calls time out after
+        # network_timeout seconds, or sooner when the scan deadline is closer
+        self.deadline = deadline
+        self.network_timeout = 10.0
+        self.max_workers = max_workers
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        
+        # Keep-alive HTTP sessions, one per host, least recently used closed first
+        self.per_host_connections = per_host_connections
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._sessions_lock = threading.Lock()
+        
+        # Result key -> stage, in report order. Network-bound stages run concurrently.
+        self.stages = [
+            ("ssl_analysis", self.analyze_ssl_certificate, True),
+            ("domain_reputation", self.check_domain_reputation, True),
+            ("malware_check", self.check_malware_databases, False),
+            ("phishing_analysis", self.analyze_phishing_patterns, False),
+            ("dns_analysis", self.analyze_dns_records, True),
+            ("whois_data", self.get_whois_information, True),
+            ("redirect_chain", self.trace_redirect_chain, True),
+            ("content_analysis", self.analyze_page_content, True),
+        ]
+    
+    def _get_executor(self):
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="url-stage"
+                    )
+        return self._executor
+    
+    def _session_for(self, url):
+        """Pooled keep-alive session for the URL's host"""
+        parsed = urlparse(url)
+        key = (parsed.scheme, parsed.hostname, parsed.port)
+        with self._sessions_lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=1, pool_maxsize=self.per_host_connections
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[key] = session
+                while len(self._sessions) > self.max_sessions:
+                    _, evicted = self._sessions.popitem(last=False)
+                    evicted.close()
+            else:
+                self._sessions.move_to_end(key)
+            return session
+    
+    def _timeout(self):
+        """Timeout for the next network call of the running scan"""
+        deadline = _scan_deadline.get()
+        if deadline is None:
+            return self.network_timeout
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            raise TimeoutError("Scan deadline passed")
+        return min(self.network_timeout, remaining)
+    
+    @staticmethod
+    def _timed(key, stage, url):
+        start = time.perf_counter()
+        with scan_profiler.stage(key):
+            result = stage(url)
+        return result, round((time.perf_counter() - start) * 1000, 1)
+        
+    @scan_profiler.profiled("url_threat_scanner")
+    def comprehensive_scan(self, url, parallel=True, deadline=None):
+        """
+        Perform comprehensive URL threat analysis. In parallel mode the network
+        stages run concurrently under one deadline; stages still running when it
+        expires are reported as timed out and left out of the threat score.
+        Their network calls are given timeouts that end at the deadline, so
+        the stage threads are free again by then.
+        """
+        deadline = self.deadline if deadline is None else deadline
+        scan_start = time.perf_counter()
         results = {
             "url": url,
-            "timestamp": datetime.now().isoformat(),
-            "ssl_analysis": self.analyze_ssl_certificate(url),
-            "domain_reputation": self.check_domain_reputation(url),
-            "malware_check": self.check_malware_databases(url),
-            "phishing_analysis": self.analyze_phishing_patterns(url),
-            "dns_analysis": self.analyze_dns_records(url),
-            "whois_data": self.get_whois_information(url),
-            "redirect_chain": self.trace_redirect_chain(url),
-            "content_analysis": self.analyze_page_content(url),
-            "threat_score": 0,
-            "risk_level": "unknown"
+            "timestamp": datetime.now().isoformat()
         }
+        stage_results = {}
+        stage_timings = {}
+        
+        futures = {}
+        if parallel:
+            executor = self._get_executor()
+            token = _scan_deadline.set(scan_start + deadline)
+            try:
+                for key, stage, network in self.stages:
+                    if network:
+                        # Each stage thread records into this scan's profile and sees its deadline
+                        context = contextvars.copy_context()
+                        futures[executor.submit(context.run, self._timed, key, stage, url)] = key
+            finally:
+                _scan_deadline.reset(token)
+        
+        for key, stage, network in self.stages:
+            if not (parallel and network):
+                stage_results[key], stage_timings[key] = self._timed(key, stage, url)
+        
+        if futures:
+            remaining = max(0.0, deadline - (time.perf_counter() - scan_start))
+            done, pending = concurrent.futures.wait(futures, timeout=remaining)
+            for future in done:
+                key = futures[future]
+                try:
+                    stage_results[key], stage_timings[key] = future.result()
+                except Exception as e:
+                    stage_results[key] = {"error": str(e)}
+                    stage_timings[key] = None
+            for future in pending:
+                # A running stage cannot be cancelled, but its network calls end at the deadline
+                future.cancel()
+                key = futures[future]
+                stage_results[key] = {"error": f"Timed out after {deadline}s", "timed_out": True}
+                stage_timings[key] = None
+        
+        for key, _, _ in self.stages:
+            results[key] = stage_results[key]
+        results["threat_score"] = 0
+        results["risk_level"] = "unknown"
         
         # Calculate comprehensive threat score
         results["threat_score"] = self.calculate_threat_score(results)
         results["risk_level"] = self.determine_risk_level(results["threat_score"])
         
+        results["stage_timings_ms"] = {key: stage_timings[key] for key, _, _ in self.stages}
+        results["timed_out_stages"] = [key for key, result in stage_results.items() if result.get("timed_out")]
+        results["scan_time_ms"] = round((time.perf_counter() - scan_start) * 1000, 1)
+        
         return results
     
+    def scan_many(self, urls, per_host_concurrency=2, max_concurrency=16, parallel_stages=False):
+        """
+        Scan a batch of URLs, yielding each result as soon as it finishes.
+        Hosts are served round-robin so one busy host cannot starve the rest,
+        and at most per_host_concurrency scans of the same host run at once.
+        """
+        host_queues = OrderedDict()
+        for url in urls:
+            host = (urlparse(url).hostname or "").lower()
+            host_queues.setdefault(host, deque()).append(url)
+        
+        active = dict.fromkeys(host_queues, 0)
+        ready = deque(host_queues)
+        queued = set(ready)
+        in_flight = {}
+        
+        def scan(url):
+            try:
+                return self.comprehensive_scan(url, parallel=parallel_stages)
+            except Exception as e:
+                return {"url": url, "error": str(e)}
+        
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="url-batch"
+        )
+        try:
+            while ready or in_flight:
+                while ready and len(in_flight) < max_concurrency:
+                    host = ready.popleft()
+                    queued.discard(host)
+                    in_flight[executor.submit(scan, host_queues[host].popleft())] = host
+                    active[host] += 1
+                    if host_queues[host] and active[host] < per_host_concurrency:
+                        ready.append(host)
+                        queued.add(host)
+                
+                done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    host = in_flight.pop(future)
+                    active[host] -= 1
+                    if host_queues[host] and host not in queued:
+                        ready.append(host)
+                        queued.add(host)
+                    yield future.result()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
     def analyze_ssl_certificate(self, url):
         """Analyze SSL certificate details"""
         try:
@@ -48,7 +224,7 @@ class URLThreatScanner:
             port = parsed_url.port or (443 if parsed_url.scheme == 'https' else 80)
             
             context = ssl.create_default_context()
-            with socket.create_connection((hostname, port), timeout=10) as sock:
+            with socket.create_connection((hostname, port), timeout=self._timeout()) as sock:
                 with context.wrap_socket(sock, server_hostname=hostname) as ssock:
                     cert = ssock.getpeercert()
                     
@@ -91,7 +267,7 @@ class URLThreatScanner:
             
             # Check domain age via WHOIS
             try:
-                w = whois.whois(domain)
+                w = self.lookups.whois(domain, timeout=self._timeout())
                 creation_date = w.creation_date
                 if isinstance(creation_date, list):
                     creation_date = creation_date[0]
@@ -167,22 +343,19 @@ class URLThreatScanner:
             
             # Get A records
             try:
-                a_records = dns.resolver.resolve(domain, 'A')
-                dns_info['A'] = [str(record) for record in a_records]
+                dns_info['A'] = list(self.lookups.resolve(domain, 'A', timeout=self._timeout()))
             except:
                 dns_info['A'] = []
             
             # Get MX records
             try:
-                mx_records = dns.resolver.resolve(domain, 'MX')
-                dns_info['MX'] = [str(record) for record in mx_records]
+                dns_info['MX'] = list(self.lookups.resolve(domain, 'MX', timeout=self._timeout()))
             except:
                 dns_info['MX'] = []
             
             # Get NS records
             try:
-                ns_records = dns.resolver.resolve(domain, 'NS')
-                dns_info['NS'] = [str(record) for record in ns_records]
+                dns_info['NS'] = list(self.lookups.resolve(domain, 'NS', timeout=self._timeout()))
             except:
                 dns_info['NS'] = []
             
@@ -200,7 +373,7 @@ class URLThreatScanner:
             parsed_url = urlparse(url)
             domain = parsed_url.hostname
             
-            w = whois.whois(domain)
+            w = self.lookups.whois(domain, timeout=self._timeout())
             
             return {
                 "registrar": w.registrar,
@@ -221,7 +394,7 @@ class URLThreatScanner:
             max_redirects = 10
             
             for _ in range(max_redirects):
-                response = requests.head(current_url, allow_redirects=False, timeout=10)
+                response = self._session_for(current_url).head(current_url, allow_redirects=False, timeout=self._timeout())
                 chain.append({
                     "url": current_url,
                     "status_code": response.status_code,
@@ -244,11 +417,18 @@ class URLThreatScanner:
     def analyze_page_content(self, url):
         """Analyze page content for suspicious elements"""
         try:
-            response = requests.get(url, timeout=10, headers={
+            with self._session_for(url).get(url, timeout=self._timeout(), stream=True, headers={
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            })
+            }) as response:
+                # The timeout only bounds each read, so a slowly trickled body is
+                # read in chunks and abandoned once the scan deadline has passed
+                body = bytearray()
+                for chunk in response.iter_content(64 * 1024):
+                    body += chunk
+                    self._timeout()
+            text = bytes(body).decode(response.encoding or 'utf-8', errors='replace')
             
-            content = response.text.lower()
+            content = text.lower()
             
             suspicious_content = [
                 "click here to verify", "account suspended", "urgent action required",
@@ -260,7 +440,7 @@ class URLThreatScanner:
             
             return {
                 "suspicious_phrases": detected_content,
-                "content_length": len(response.text),
+                "content_length": len(text),
                 "status_code": response.status_code,
                 "content_type": response.headers.get('content-type', ''),
                 "suspicious": len(detected_content) > 0
@@ -273,12 +453,13 @@ class URLThreatScanner:
         score = 100
         
         # SSL Certificate
-        if not results["ssl_analysis"].get("valid", False):
+        if not results["ssl_analysis"].get("valid", False) and not results["ssl_analysis"].get("timed_out"):
             score -= 25
         
         # Domain Reputation
-        domain_score = results["domain_reputation"].get("score", 0)
-        score = score * (domain_score / 100)
+        if not results["domain_reputation"].get("timed_out"):
+            domain_score = results["domain_reputation"].get("score", 0)
+            score = score * (domain_score / 100)
         
         # Malware Detection
         if results["malware_check"].get("detected", False):
@@ -316,10 +497,17 @@ class URLThreatScanner:
 if __name__ == "__main__":
     import sys
     
-    if len(sys.argv) > 1:
+    if len(sys.argv) > 2 and sys.argv[1] == "--batch":
+        # One URL per line; results are printed as NDJSON in completion order
+        scanner = URLThreatScanner()
+        with open(sys.argv[2], "r", encoding="utf-8") as f:
+            urls = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        for results in scanner.scan_many(urls):
+            print(json.dumps(results), flush=True)
+    elif len(sys.argv) > 1:
         scanner = URLThreatScanner()
         url = sys.argv[1]
         results = scanner.comprehensive_scan(url)
         print(json.dumps(results, indent=2))
     else:
-        print("Usage: python url_threat_scanner_service.py <url>")
+        print("Usage: python url_threat_scanner_service.py <url> | --batch <url_file>")
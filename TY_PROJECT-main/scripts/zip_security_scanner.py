@@ -1,11 +1,16 @@
 import zipfile
-import hashlib
 import json
+import os
 import requests
 import re
 from datetime import datetime
 import io
 
+from content_matcher import ContentMatcher
+from file_hasher import default_hasher
+from scan_profiler import profiled, stage
+from result_cache import ruleset_fingerprint
+
 class ZipSecurityScanner:
     def __init__(self):
         self.dangerous_extensions = [
@@ -18,28 +23,51 @@ class ZipSecurityScanner:
             r'[A-Za-z]:\\',  # Windows paths
             r'/etc/', r'/bin/', r'/usr/',  # Unix system paths
         ]
+        
+        self.suspicious_keywords = [
+            'eval(', 'exec(', 'system(', 'shell_exec',
+            'cmd.exe', 'powershell', 'wget', 'curl',
+            'backdoor', 'trojan', 'keylogger'
+        ]
+        
+        self.content_matcher = ContentMatcher(
+            [(keyword, re.escape(keyword), re.IGNORECASE) for keyword in self.suspicious_keywords]
+        )
+        
+        self.ruleset_version = ruleset_fingerprint(
+            self.dangerous_extensions, self.suspicious_patterns, self.suspicious_keywords
+        )
     
-    def scan_zip_file(self, file_data, filename):
+    @profiled("zip_scanner")
+    def scan_zip_file(self, file_data, filename, hashes=None):
         """Comprehensive ZIP security analysis with real threat detection"""
         try:
-            # Calculate file hash
-            file_hash = hashlib.sha256(file_data).hexdigest()
-            md5_hash = hashlib.md5(file_data).hexdigest()
+            size = len(file_data)
+            # Calculate file hash, unless the caller already has it
+            if hashes is None:
+                hashes = default_hasher.hash_bytes(file_data, ('sha256', 'md5'))
+            file_hash = hashes['sha256']
+            md5_hash = hashes['md5']
             
             # Analyze ZIP structure
-            zip_analysis = self._analyze_zip_structure(file_data)
+            with stage("structure_parse", size):
+                zip_analysis = self._analyze_zip_structure(file_data)
             
             # Check against threat databases
-            threat_results = self._check_threat_databases(file_hash, md5_hash)
+            with stage("threat_database"):
+                threat_results = self._check_threat_databases(file_hash, md5_hash)
             
             # Analyze file contents for threats
-            content_threats = self._analyze_zip_contents(file_data)
+            with stage("content_analysis", size):
+                content_threats = self._analyze_zip_contents(file_data)
             
             # Check for zip bombs
-            bomb_threats = self._check_zip_bomb(file_data)
+            with stage("zip_bomb_check", size):
+                bomb_threats = self._check_zip_bomb(file_data)
             
             # Analyze file names for suspicious patterns
-            filename_threats = self._analyze_filenames(file_data)
+            with stage("filename_analysis"):
+                filename_threats = self._analyze_filenames(file_data)
             
             # Combine all threats
             all_threats = threat_results + content_threats + bomb_threats + filename_threats
@@ -66,6 +94,11 @@ class ZipSecurityScanner:
         except Exception as e:
             return {"error": f"ZIP analysis failed: {str(e)}"}
     
+    def refresh_cached_result(self, result, file_path):
+        """Update a cached result of identical content for this path and request"""
+        result.update({"fileName": os.path.basename(file_path), "scanTimestamp": datetime.now().isoformat()})
+        return result
+    
     def _analyze_zip_structure(self, file_data):
         """Analyze ZIP file structure and contents"""
         try:
@@ -178,17 +211,11 @@ class ZipSecurityScanner:
                         if file_info.file_size < 1024 * 100:  # Files smaller than 100KB
                             try:
                                 content = zip_file.read(file_info.filename)
-                                content_str = content.decode('utf-8', errors='ignore')
+                                report = self.content_matcher.scan(content)
                                 
                                 # Check for suspicious content
-                                suspicious_keywords = [
-                                    'eval(', 'exec(', 'system(', 'shell_exec',
-                                    'cmd.exe', 'powershell', 'wget', 'curl',
-                                    'backdoor', 'trojan', 'keylogger'
-                                ]
-                                
-                                for keyword in suspicious_keywords:
-                                    if keyword.lower() in content_str.lower():
+                                for keyword in self.suspicious_keywords:
+                                    if report[keyword]["count"]:
                                         threats.append({
                                             "type": "Suspicious Content",
                                             "description": f"Suspicious code pattern in {file_info.filename}: {keyword}",